@@ -0,0 +1,66 @@
+"""
+Throughput benchmark for the /query endpoint.
+
+Run the service with the offline mock provider so no API keys or network are needed:
+
+    LLM_PROVIDER=mock MOCK_LLM_LATENCY_MS=500 uvicorn main:app --port 5000
+    python benchmarks/benchmark_query.py --requests 200 --concurrency 50
+
+With the shared async client, total wall time should approach
+requests / concurrency * (2 * MOCK_LLM_LATENCY_MS) rather than growing with
+the request count.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def run(url: str, total: int, concurrency: int, question: str, path: str):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async with httpx.AsyncClient(timeout=httpx.Timeout(600.0)) as client:
+        async def one(i: int):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    r = await client.post(f"{url}{path}", json={"question": f"{question} #{i}"})
+                    r.raise_for_status()
+                    latencies.append((time.perf_counter() - started) * 1000)
+                except Exception as e:
+                    errors += 1
+                    print(f"request {i} failed: {e}")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+
+    print(f"requests={total} concurrency={concurrency} errors={errors} wall={elapsed:.2f}s")
+    if latencies:
+        print(f"throughput={len(latencies) / elapsed:.1f} req/s")
+        print(f"latency ms: mean={statistics.mean(latencies):.0f} p50={percentile(latencies, 0.5):.0f} "
+              f"p95={percentile(latencies, 0.95):.0f} max={max(latencies):.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--path", default="/query")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--question", default="How can I improve the login page?")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.requests, args.concurrency, args.question, args.path))
+
+
+if __name__ == "__main__":
+    main()
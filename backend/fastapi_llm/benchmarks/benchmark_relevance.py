@@ -0,0 +1,91 @@
+"""
+Offline retrieval quality and latency: vector vs BM25 vs hybrid (RRF) vs hybrid + re-rank.
+
+Embeds the heuristics corpus into a temporary NumPy index (no Chroma, no LLM)
+and scores labelled queries from relevance_queries.json:
+
+    python benchmarks/benchmark_relevance.py [--k 3] [--reranker cross-encoder/ms-marco-MiniLM-L-6-v2]
+
+Reports recall@k, MRR and mean/p95 retrieval latency (query embedding excluded,
+it is the same for every mode).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(__file__)
+sys.path.append(os.path.join(BENCHMARK_DIR, ".."))
+from embeddings import build_backend, normalize_question  # noqa: E402
+from index_heuristics import iter_documents  # noqa: E402
+from retrievers import CrossEncoderReranker, HybridRetriever, NumpyRetriever  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(BENCHMARK_DIR, "..", "..", "..", "datasets", "heuristics")
+DEFAULT_QUERIES = os.path.join(BENCHMARK_DIR, "relevance_queries.json")
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def evaluate(search, queries, k):
+    recalls, reciprocal_ranks, latencies = [], [], []
+    for query in queries:
+        started = time.perf_counter()
+        ids = search(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+        relevant = set(query["relevant"])
+        recalls.append(len(relevant & set(ids[:k])) / len(relevant))
+        rank = next((i for i, doc_id in enumerate(ids[:k], start=1) if doc_id in relevant), None)
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+    return statistics.mean(recalls), statistics.mean(reciprocal_ranks), statistics.mean(latencies), percentile(latencies, 0.95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", nargs="+", default=[DEFAULT_CORPUS])
+    parser.add_argument("--queries", default=DEFAULT_QUERIES)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--reranker", help="cross-encoder model for the hybrid + re-rank row")
+    args = parser.parse_args()
+
+    documents = list(iter_documents(args.corpus))
+    with open(args.queries, "r", encoding="utf-8") as f:
+        queries = json.load(f)
+
+    embedder = build_backend()
+    index_dir = tempfile.mkdtemp()
+    NumpyRetriever.write_index(
+        index_dir, [d["id"] for d in documents], [d["text"] for d in documents],
+        [d["metadata"] for d in documents], embedder.encode([d["text"] for d in documents]),
+    )
+    vector = NumpyRetriever(index_dir)
+    hybrid = HybridRetriever(vector)
+    id_of = {text: doc_id for doc_id, text in zip(vector.ids, vector.documents)}
+    for query in queries:
+        query["embedding"] = embedder.encode([normalize_question(query["query"])])[0]
+
+    def hybrid_search(retriever):
+        return lambda q: [id_of[text] for text in retriever.search(q["query"], q["embedding"], args.k)[0]]
+
+    modes = [
+        ("vector", lambda q: vector.query_ids(q["embedding"], args.k)),
+        ("bm25", lambda q: [vector.ids[row] for row, _ in hybrid.bm25.query(q["query"], args.k)]),
+        ("hybrid", hybrid_search(hybrid)),
+    ]
+    if args.reranker:
+        modes.append(("hybrid+rerank", hybrid_search(HybridRetriever(vector, reranker=CrossEncoderReranker(args.reranker)))))
+
+    print(f"{len(documents)} documents, {len(queries)} queries, k={args.k}")
+    print(f"{'mode':<15}{'recall@k':>10}{'MRR':>8}{'mean ms':>10}{'p95 ms':>10}")
+    for name, search in modes:
+        recall, mrr, mean_ms, p95_ms = evaluate(search, queries, args.k)
+        print(f"{name:<15}{recall:>10.3f}{mrr:>8.3f}{mean_ms:>10.2f}{p95_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
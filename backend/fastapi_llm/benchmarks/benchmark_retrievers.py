@@ -0,0 +1,104 @@
+"""
+Query latency of the Chroma and NumPy retriever backends.
+
+Builds both indexes from the same synthetic, L2-normalized embeddings (384
+dimensions, like bge-small-en-v1.5) and measures top-k latency for each corpus
+size. Nothing is downloaded; everything lives in a temporary directory.
+
+    python benchmarks/benchmark_retrievers.py --sizes 10,10000,1000000
+
+Inserting 1M documents into Chroma takes a long time; pass
+--chroma-max-docs to skip Chroma above a given size.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from retrievers import ChromaRetriever, NumpyRetriever  # noqa: E402
+
+DIM = 384
+CHROMA_BATCH = 5000
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def synthetic_corpus(n_docs: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    embeddings = rng.standard_normal((n_docs, DIM), dtype=np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    ids = [f"doc-{i}" for i in range(n_docs)]
+    documents = [f"Heuristic {i}" for i in range(n_docs)]
+    metadatas = [{"source": "synthetic", "index": i} for i in range(n_docs)]
+    return ids, documents, metadatas, embeddings
+
+
+def build_chroma(path, ids, documents, metadatas, embeddings):
+    import chromadb
+
+    client = chromadb.PersistentClient(path=path)
+    collection = client.create_collection("ux_heuristics")
+    for start in range(0, len(ids), CHROMA_BATCH):
+        end = start + CHROMA_BATCH
+        collection.add(
+            ids=ids[start:end],
+            documents=documents[start:end],
+            metadatas=metadatas[start:end],
+            embeddings=embeddings[start:end].tolist(),
+        )
+    return ChromaRetriever(collection)
+
+
+def measure(retriever, queries, k):
+    retriever.query(queries[0], k)  # warm-up (page in the memory map / open SQLite)
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        retriever.query(query, k)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,10000,1000000")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--chroma-max-docs", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    queries = synthetic_corpus(args.queries, seed=1)[3]
+    print(f"{'docs':>10}  {'backend':<8}{'build s':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for n_docs in (int(size) for size in args.sizes.split(",") if size):
+        ids, documents, metadatas, embeddings = synthetic_corpus(n_docs)
+        with tempfile.TemporaryDirectory() as tmp:
+            backends = []
+
+            started = time.perf_counter()
+            NumpyRetriever.write_index(os.path.join(tmp, "numpy"), ids, documents, metadatas, embeddings)
+            backends.append((NumpyRetriever(os.path.join(tmp, "numpy")), time.perf_counter() - started))
+
+            if n_docs <= args.chroma_max_docs:
+                started = time.perf_counter()
+                chroma = build_chroma(os.path.join(tmp, "chroma"), ids, documents, metadatas, embeddings)
+                backends.append((chroma, time.perf_counter() - started))
+
+            for retriever, build_seconds in backends:
+                latencies = measure(retriever, queries, args.k)
+                print(
+                    f"{n_docs:>10}  {retriever.name:<8}{build_seconds:>10.1f}{statistics.mean(latencies):>10.2f}"
+                    f"{percentile(latencies, 0.5):>10.2f}{percentile(latencies, 0.95):>10.2f}"
+                )
+            del backends
+
+
+if __name__ == "__main__":
+    main()
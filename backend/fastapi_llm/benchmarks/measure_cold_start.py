@@ -0,0 +1,56 @@
+"""
+Cold-start time of the LLM service: process launch -> /health -> /ready.
+
+    python benchmarks/measure_cold_start.py [--port 5055]
+
+Run from backend/fastapi_llm with the same env as production (EMBEDDING_MODEL_DIR,
+RETRIEVER_BACKEND, ...). The per-component load times reported by /ready are
+printed as well.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+def wait_for(url: str, process, timeout: float) -> float:
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            sys.exit(f"Service exited with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return time.perf_counter()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    sys.exit(f"Timed out waiting for {url}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    url = f"http://127.0.0.1:{args.port}"
+    launched = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port)])
+    try:
+        healthy = wait_for(f"{url}/health", process, args.timeout)
+        ready = wait_for(f"{url}/ready", process, args.timeout)
+        report = httpx.get(f"{url}/ready").json()
+    finally:
+        process.terminate()
+        process.wait()
+
+    print(f"/health after {healthy - launched:.2f}s")
+    print(f"/ready  after {ready - launched:.2f}s")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
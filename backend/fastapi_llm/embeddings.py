@@ -0,0 +1,254 @@
+"""
+Query embedding service.
+
+Questions are normalized (whitespace collapsed) and looked up in an LRU cache
+keyed on the lowercased text; the model still encodes the original casing, so
+cased models see what the user typed, and questions differing only in case
+share the first one's embedding. Misses are coalesced: identical in-flight questions share one
+future, and distinct questions arriving within a short window are encoded as
+one batch on a dedicated worker thread so the event loop never runs the
+forward pass.
+
+Configuration (env):
+    EMBEDDING_MODEL              SentenceTransformer model name (default BAAI/bge-small-en-v1.5)
+    EMBEDDING_MODEL_DIR          pre-fetched model directory (prefetch_models.py); when set, nothing is downloaded
+    EMBEDDER_BACKEND             sentence-transformers (default) or onnx
+    EMBEDDER_ONNX_DIR            directory written by export_embedder_onnx.py (default DATA_DIR/embedder_onnx)
+    EMBEDDER_ONNX_FILE           model file inside it: model.onnx or model.int8.onnx (default model.int8.onnx)
+    EMBED_CACHE_SIZE             cached question embeddings (default 1024, 0 disables)
+    EMBED_MAX_BATCH_SIZE         questions per encode call (default 32)
+    EMBED_BATCH_WINDOW_MS        how long the first queued question waits for company (default 5)
+"""
+import asyncio
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    return _WHITESPACE_RE.sub(" ", question).strip()
+
+
+def cache_key(question: str) -> str:
+    return normalize_question(question).lower()
+
+
+def path_identity(path: str) -> str:
+    """Identify a model file or directory by path, file names, sizes and modification times (no full read)."""
+    path = os.path.abspath(path)
+    if os.path.isfile(path):
+        files = [path]
+    else:
+        files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    entries = []
+    for file_path in files:
+        stat = os.stat(file_path)
+        entries.append(f"{os.path.relpath(file_path, path)}:{stat.st_size}:{int(stat.st_mtime)}")
+    return f"{path}@{hashlib.sha256('|'.join(entries).encode('utf-8')).hexdigest()[:16]}"
+
+
+class SentenceTransformerBackend:
+    name = "sentence-transformers"
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+        # What was actually loaded: a hub name, or a local directory by its contents
+        self.model_id = path_identity(model_name) if os.path.isdir(model_name) else model_name
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, batch_size=len(texts), normalize_embeddings=True), dtype=np.float32)
+
+
+class OnnxBackend:
+    """ONNX Runtime export of the embedder (CLS pooling + L2 normalization, as bge expects)."""
+
+    name = "onnx"
+
+    def __init__(self, model_dir: str, model_file: str = "model.int8.onnx"):
+        try:
+            import onnxruntime
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise RuntimeError("EMBEDDER_BACKEND=onnx requires the onnxruntime package") from e
+
+        path = os.path.join(model_dir, model_file)
+        if not os.path.exists(path):
+            raise RuntimeError(f"ONNX embedder not found at {path}; run export_embedder_onnx.py first")
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.model_id = path_identity(path)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        tokens = self.tokenizer(texts, padding=True, truncation=True, max_length=512, return_tensors="np")
+        feeds = {name: tokens[name].astype(np.int64) for name in self.input_names if name in tokens}
+        hidden = self.session.run(None, feeds)[0]
+        cls = hidden[:, 0].astype(np.float32)
+        return cls / np.linalg.norm(cls, axis=1, keepdims=True)
+
+
+def build_backend():
+    backend = os.getenv("EMBEDDER_BACKEND", "sentence-transformers").lower()
+    if backend == "onnx":
+        model_dir = os.getenv("EMBEDDER_ONNX_DIR", os.path.join(os.getenv("DATA_DIR", "data"), "embedder_onnx"))
+        return OnnxBackend(model_dir, os.getenv("EMBEDDER_ONNX_FILE", "model.int8.onnx"))
+    if backend == "sentence-transformers":
+        model_dir = os.getenv("EMBEDDING_MODEL_DIR")
+        if model_dir:
+            if not os.path.isdir(model_dir):
+                raise RuntimeError(f"EMBEDDING_MODEL_DIR {model_dir} does not exist; run prefetch_models.py")
+            return SentenceTransformerBackend(model_dir)
+        return SentenceTransformerBackend(os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL))
+    raise ValueError(f"Unsupported EMBEDDER_BACKEND: {backend}")
+
+
+class EmbeddingService:
+    def __init__(self, backend, cache_size: int = 1024, max_batch_size: int = 32, batch_window_ms: float = 5.0):
+        self.backend = backend
+        self.cache_size = cache_size
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_window = max(0.0, batch_window_ms) / 1000.0
+        # One thread: encode calls are already batched, and the model isn't shared across threads
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedder")
+
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.encoded = 0
+
+    @classmethod
+    def from_env(cls) -> "EmbeddingService":
+        return cls(
+            build_backend(),
+            cache_size=int(os.getenv("EMBED_CACHE_SIZE", "1024")),
+            max_batch_size=int(os.getenv("EMBED_MAX_BATCH_SIZE", "32")),
+            batch_window_ms=float(os.getenv("EMBED_BATCH_WINDOW_MS", "5")),
+        )
+
+    def _cache_get(self, key: str) -> Optional[List[float]]:
+        with self._cache_lock:
+            embedding = self._cache.get(key)
+            if embedding is not None:
+                self._cache.move_to_end(key)
+            return embedding
+
+    def _cache_put(self, key: str, embedding: List[float]):
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = embedding
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def encode_sync(self, texts: List[str]) -> List[List[float]]:
+        """Encode directly on the calling thread (warm-up, scripts)."""
+        return self.backend.encode([normalize_question(t) for t in texts]).tolist()
+
+    async def embed(self, question: str) -> List[float]:
+        key = cache_key(question)
+        cached = self._cache_get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+
+        # Same question already queued or encoding: share its result
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        await self._queue.put((key, normalize_question(question), future))
+        return await asyncio.shield(future)
+
+    def start(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self.executor.shutdown(wait=False)
+
+    async def _collect_batch(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect_batch()
+            texts = [text for _, text, _ in batch]
+            try:
+                vectors = await loop.run_in_executor(self.executor, self.backend.encode, texts)
+            except Exception as e:
+                for key, _, future in batch:
+                    self._inflight.pop(key, None)
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.encoded += len(batch)
+            for (key, _, future), vector in zip(batch, vectors.tolist()):
+                self._cache_put(key, vector)
+                self._inflight.pop(key, None)
+                if not future.done():
+                    future.set_result(vector)
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "cache_entries": len(self._cache),
+            "cache_size": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+            "mean_batch_size": self.encoded / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "batch_window_ms": self.batch_window * 1000,
+        }
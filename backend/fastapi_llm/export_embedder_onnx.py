@@ -0,0 +1,68 @@
+"""
+Export the query embedder to ONNX (fp32 + dynamically quantized int8) for EMBEDDER_BACKEND=onnx.
+
+Requirements:
+    pip install onnxruntime onnx
+
+Usage:
+    python export_embedder_onnx.py [--model BAAI/bge-small-en-v1.5] [--out data/embedder_onnx]
+
+The output directory holds model.onnx, model.int8.onnx and the tokenizer files.
+The int8 model is what the service loads by default (EMBEDDER_ONNX_FILE); check
+its agreement with the fp32 model below before switching production to it.
+"""
+import argparse
+import os
+
+import numpy as np
+import torch
+from transformers import AutoModel, AutoTokenizer
+
+from embeddings import DEFAULT_EMBEDDING_MODEL, OnnxBackend
+
+SAMPLE_QUESTIONS = [
+    "What are the main usability issues on the checkout screen?",
+    "How do users navigate between the login and dashboard screens?",
+    "Summarize the interaction patterns",
+]
+
+
+def export(model_name: str, out_dir: str):
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    tokenizer.save_pretrained(out_dir)
+
+    dummy = tokenizer(SAMPLE_QUESTIONS, padding=True, return_tensors="pt")
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    with torch.inference_mode():
+        torch.onnx.export(
+            model,
+            (dummy["input_ids"], dummy["attention_mask"], dummy["token_type_ids"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in ("input_ids", "attention_mask", "token_type_ids", "last_hidden_state")},
+            opset_version=17,
+        )
+    print(f"✅ Exported {fp32_path}")
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    int8_path = os.path.join(out_dir, "model.int8.onnx")
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    print(f"✅ Quantized {int8_path}")
+
+    # Agreement check against the fp32 export
+    reference = OnnxBackend(out_dir, "model.onnx").encode(SAMPLE_QUESTIONS)
+    quantized = OnnxBackend(out_dir, "model.int8.onnx").encode(SAMPLE_QUESTIONS)
+    similarity = np.sum(reference * quantized, axis=1)
+    print(f"📊 int8 vs fp32 cosine similarity: min {similarity.min():.4f}, mean {similarity.mean():.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_EMBEDDING_MODEL)
+    parser.add_argument("--out", default=os.path.join(os.getenv("DATA_DIR", "data"), "embedder_onnx"))
+    args = parser.parse_args()
+    export(args.model, args.out)
@@ -0,0 +1,250 @@
+"""
+Incrementally index UX heuristics into the Chroma collection used by the LLM service.
+
+Sources can be files or directories (searched recursively) of:
+    .json    array of {"id", "text", "source", ...} objects (streamed with ijson when installed)
+    .jsonl   one such object per line
+    .md      one document per "#"/"##" section; id = "<file>#<section-slug>"
+
+Each document is hashed together with the embedding model and backend; only new or
+changed documents are embedded (in batches) and upserted, and documents that
+no longer appear in any source are deleted. Re-running with unchanged sources
+is a no-op, and switching the embedding model re-embeds everything.
+
+Usage:
+    python index_heuristics.py ../../datasets/heuristics/ [more sources ...] [--batch-size 64] [--dry-run]
+
+The collection lives in DATA_DIR/chroma_db, like the service. If a NumPy index
+(RETRIEVER_BACKEND=numpy) exists in DATA_DIR/heuristics_index it is re-exported
+after a change so both backends stay in sync.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from embeddings import build_backend
+
+try:
+    from tqdm import tqdm
+except ImportError:  # progress bar is cosmetic
+    tqdm = None
+
+CHROMA_COLLECTION = "ux_heuristics"
+SUPPORTED_SUFFIXES = (".json", ".jsonl", ".md", ".markdown")
+HASH_KEY = "content_hash"
+PAGE_SIZE = 5000
+
+_HEADING_RE = re.compile(r"^(#{1,2})\s+(.+?)\s*#*\s*$")
+_SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+
+def iter_source_files(sources: Iterable[str]) -> Iterator[Path]:
+    for source in sources:
+        path = Path(source)
+        if path.is_dir():
+            yield from sorted(p for p in path.rglob("*") if p.suffix.lower() in SUPPORTED_SUFFIXES)
+        elif path.is_file():
+            yield path
+        else:
+            sys.exit(f"Source not found: {source}")
+
+
+def _record_to_document(record: Dict[str, Any], fallback_id: str, default_source: str) -> Optional[Dict[str, Any]]:
+    text = record.get("text")
+    if not isinstance(text, str) or not text.strip():
+        return None
+    # Chroma metadata values must be scalars
+    metadata = {
+        key: value for key, value in record.items()
+        if key not in ("id", "text") and isinstance(value, (str, int, float, bool))
+    }
+    metadata.setdefault("source", default_source)
+    return {"id": str(record.get("id") or fallback_id), "text": text, "metadata": metadata}
+
+
+def _iter_json_array(path: Path) -> Iterator[Dict[str, Any]]:
+    try:
+        import ijson
+    except ImportError:
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+        return
+    with open(path, "rb") as f:
+        yield from ijson.items(f, "item", use_float=True)
+
+
+def _iter_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _iter_markdown(path: Path) -> Iterator[Dict[str, Any]]:
+    title, lines = path.stem, []
+
+    def flush():
+        text = "\n".join(lines).strip()
+        if text:
+            slug = _SLUG_RE.sub("-", title.lower()).strip("-") or "section"
+            return {"id": f"{path.name}#{slug}", "text": text, "source": title}
+        return None
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            match = _HEADING_RE.match(line.rstrip())
+            if match:
+                document = flush()
+                if document:
+                    yield document
+                title, lines = match.group(2), []
+            else:
+                lines.append(line.rstrip())
+    document = flush()
+    if document:
+        yield document
+
+
+def iter_documents(sources: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Stream {"id", "text", "metadata"} documents from every source, one at a time."""
+    for path in iter_source_files(sources):
+        suffix = path.suffix.lower()
+        if suffix == ".json":
+            records = _iter_json_array(path)
+        elif suffix == ".jsonl":
+            records = _iter_jsonl(path)
+        else:
+            records = _iter_markdown(path)
+        for i, record in enumerate(records):
+            document = _record_to_document(record, f"{path.name}:{i}", path.stem) if isinstance(record, dict) else None
+            if document is not None:
+                yield document
+
+
+def document_hash(document: Dict[str, Any], model_name: str) -> str:
+    payload = json.dumps([model_name, document["text"], document["metadata"]], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def existing_hashes(collection) -> Dict[str, str]:
+    """id -> content hash of every indexed document, fetched page by page."""
+    hashes, offset = {}, 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=PAGE_SIZE, offset=offset)
+        for doc_id, metadata in zip(page["ids"], page["metadatas"]):
+            hashes[doc_id] = (metadata or {}).get(HASH_KEY, "")
+        if len(page["ids"]) < PAGE_SIZE:
+            return hashes
+        offset += PAGE_SIZE
+
+
+def progress(iterable, description: str):
+    if tqdm is None:
+        return iterable
+    return tqdm(iterable, desc=description, unit="doc")
+
+
+class Indexer:
+    def __init__(self, collection, embedder, model_name: str, batch_size: int, dry_run: bool = False):
+        self.collection = collection
+        self.embedder = embedder
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.indexed = existing_hashes(collection)
+        self.seen = set()
+        self.pending: List[Dict[str, Any]] = []
+        self.stats = {"added": 0, "updated": 0, "unchanged": 0, "deleted": 0, "duplicates": 0}
+
+    def add(self, document: Dict[str, Any]):
+        if document["id"] in self.seen:
+            self.stats["duplicates"] += 1
+            print(f"⚠️ Duplicate id {document['id']!r}; keeping the first occurrence")
+            return
+        self.seen.add(document["id"])
+        content_hash = document_hash(document, self.model_name)
+        previous = self.indexed.get(document["id"])
+        if previous == content_hash:
+            self.stats["unchanged"] += 1
+            return
+        self.stats["updated" if previous is not None else "added"] += 1
+        document["metadata"] = {**document["metadata"], HASH_KEY: content_hash}
+        self.pending.append(document)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        if self.dry_run:
+            return
+        embeddings = self.embedder.encode([d["text"] for d in batch])
+        self.collection.upsert(
+            ids=[d["id"] for d in batch],
+            documents=[d["text"] for d in batch],
+            metadatas=[d["metadata"] for d in batch],
+            embeddings=embeddings.tolist(),
+        )
+
+    def delete_missing(self):
+        stale = [doc_id for doc_id in self.indexed if doc_id not in self.seen]
+        self.stats["deleted"] = len(stale)
+        if self.dry_run:
+            return
+        for start in range(0, len(stale), PAGE_SIZE):
+            self.collection.delete(ids=stale[start:start + PAGE_SIZE])
+
+    @property
+    def changed(self) -> bool:
+        return any(self.stats[key] for key in ("added", "updated", "deleted"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="+", help="heuristics files or directories")
+    parser.add_argument("--data-dir", default=os.getenv("DATA_DIR", "data"))
+    parser.add_argument("--collection", default=CHROMA_COLLECTION)
+    parser.add_argument("--batch-size", type=int, default=64, help="documents per embedding call / upsert")
+    parser.add_argument("--keep-missing", action="store_true", help="don't delete documents absent from the sources")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without embedding or writing")
+    args = parser.parse_args()
+
+    import chromadb
+
+    chroma_path = os.path.join(args.data_dir, "chroma_db")
+    Path(chroma_path).mkdir(parents=True, exist_ok=True)
+    collection = chromadb.PersistentClient(path=chroma_path).get_or_create_collection(args.collection)
+
+    print("Loading embedding model...")
+    embedder = build_backend()
+    print(f"Embedding model: {embedder.model_id} ({embedder.name})")
+    # Hash with the loaded model + backend so switching either (including EMBEDDING_MODEL_DIR) re-embeds the corpus
+    indexer = Indexer(collection, embedder, f"{embedder.model_id}:{embedder.name}", max(1, args.batch_size), args.dry_run)
+    print(f"📊 Collection '{args.collection}' holds {len(indexer.indexed)} documents")
+
+    for document in progress(iter_documents(args.sources), "Indexing"):
+        indexer.add(document)
+    indexer.flush()
+    if not args.keep_missing:
+        indexer.delete_missing()
+
+    prefix = "[dry run] " if args.dry_run else ""
+    print(f"✅ {prefix}" + ", ".join(f"{key}: {value}" for key, value in indexer.stats.items()))
+
+    numpy_index_dir = os.path.join(args.data_dir, "heuristics_index")
+    if indexer.changed and not args.dry_run:
+        from retrievers import NumpyRetriever
+
+        if NumpyRetriever.exists(numpy_index_dir):
+            NumpyRetriever.from_chroma(collection, numpy_index_dir)
+            print(f"📦 Re-exported NumPy index at {numpy_index_dir}")
+
+
+if __name__ == "__main__":
+    main()
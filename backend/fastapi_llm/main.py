@@ -1,14 +1,31 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
-import chromadb
-from sentence_transformers import SentenceTransformer
-import requests
+import asyncio
 import json
 import os
 from pathlib import Path
+from providers import get_provider, close_http_client
+from markdown_format import format_markdown
+from response_cache import SemanticResponseCache, payload_fingerprint
+from retrievers import Retriever, ChromaRetriever, NumpyRetriever, HybridRetriever, CrossEncoderReranker
+from embeddings import EmbeddingService
+import prompt_builder
+import time
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Initialize in the background so /health answers while the index and embedder load
+    init_task = asyncio.get_running_loop().create_task(initialize_services())
+    yield
+    init_task.cancel()
+    await close_http_client()
+    if embedder is not None:
+        await embedder.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 def get_descriptive_screen_type(screen_type: str, confidence: float) -> str:
     """Transform generic screen types into descriptive, meaningful descriptions with confidence"""
@@ -38,35 +55,134 @@ def get_descriptive_screen_type(screen_type: str, confidence: float) -> str:
     descriptive_type = screen_mappings.get(screen_type.lower(), f"{screen_type} interface")
     return f"{descriptive_type} (detected with {confidence_percentage}% confidence)"
 
-# Initialize ChromaDB
-print("🔍 Initializing ChromaDB...")
+# Heuristics retriever (RETRIEVER_BACKEND=chroma|numpy) and query embedder, created by the lifespan
 # Use DATA_DIR env (default to ./data) to avoid hardcoded personal paths
 data_dir = os.getenv("DATA_DIR", "data")
-chroma_path = os.path.join(data_dir, "chroma_db")
-Path(chroma_path).mkdir(parents=True, exist_ok=True)
-client = chromadb.PersistentClient(path=chroma_path)
-print("✅ ChromaDB client created")
-
-try:
-    collection = client.get_collection("ux_heuristics")
-    print("✅ ChromaDB collection 'ux_heuristics' loaded successfully")
-    # Test the collection
-    count = collection.count()
-    print(f"📊 ChromaDB contains {count} documents")
-except Exception as e:
-    print(f"❌ Error loading ChromaDB collection: {e}")
-    raise
-
-print("🤖 Loading embedding model...")
-embedder = SentenceTransformer('BAAI/bge-small-en-v1.5')  # Match the model used in populate_chroma.py
-print("✅ Embedding model loaded successfully")
-print("🚀 LLM Service ready with ChromaDB RAG!")
+retriever_backend = os.getenv("RETRIEVER_BACKEND", "chroma").lower()
+numpy_index_dir = os.path.join(data_dir, "heuristics_index")
+# vector = embeddings only (default); hybrid = vector + BM25 fused with RRF (optionally re-ranked by RERANKER_MODEL)
+retrieval_mode = os.getenv("RETRIEVAL_MODE", "vector").lower()
+DEFAULT_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+MAX_TOP_K = 20
+retriever: Optional[Retriever] = None
+embedder: Optional[EmbeddingService] = None
+# Semantic response cache, also created by the lifespan (None when LLM_RESPONSE_CACHE is off)
+response_cache: Optional[SemanticResponseCache] = None
+
+def load_chroma_collection():
+    import chromadb
+
+    print("🔍 Initializing ChromaDB...")
+    chroma_path = os.path.join(data_dir, "chroma_db")
+    Path(chroma_path).mkdir(parents=True, exist_ok=True)
+    client = chromadb.PersistentClient(path=chroma_path)
+    print("✅ ChromaDB client created")
+    try:
+        collection = client.get_collection("ux_heuristics")
+        print("✅ ChromaDB collection 'ux_heuristics' loaded successfully")
+        # Test the collection
+        count = collection.count()
+        print(f"📊 ChromaDB contains {count} documents")
+    except Exception as e:
+        print(f"❌ Error loading ChromaDB collection: {e}")
+        raise
+    return collection
+
+def build_vector_retriever() -> Retriever:
+    if retriever_backend == "chroma":
+        return ChromaRetriever(load_chroma_collection())
+    if retriever_backend != "numpy":
+        raise ValueError(f"Unsupported RETRIEVER_BACKEND: {retriever_backend}")
+    if not NumpyRetriever.exists(numpy_index_dir):
+        # First start: export the populated Chroma collection once, later starts skip Chroma entirely
+        print(f"📦 Exporting ChromaDB collection to NumPy index at {numpy_index_dir}...")
+        return NumpyRetriever.from_chroma(load_chroma_collection(), numpy_index_dir)
+    return NumpyRetriever(numpy_index_dir)
+
+def build_reranker() -> Optional[CrossEncoderReranker]:
+    """Cross-encoder named by RERANKER_MODEL (from RERANKER_MODEL_DIR when pre-fetched), or None"""
+    reranker_model = os.getenv("RERANKER_MODEL", "")  # e.g. cross-encoder/ms-marco-MiniLM-L-6-v2
+    if not reranker_model:
+        return None
+    model_dir = os.getenv("RERANKER_MODEL_DIR", "")
+    if model_dir and os.path.isdir(model_dir):
+        reranker_model = model_dir
+    try:
+        return CrossEncoderReranker(reranker_model)
+    except Exception as e:
+        # e.g. a hub name with HF_HUB_OFFLINE=1 and no pre-fetched copy: serve without re-ranking
+        print(f"⚠️ Could not load re-ranker {reranker_model}, continuing without re-ranking: {e}")
+        return None
+
+def build_retriever() -> Retriever:
+    vector = build_vector_retriever()
+    if retrieval_mode == "vector":
+        return vector
+    if retrieval_mode != "hybrid":
+        raise ValueError(f"Unsupported RETRIEVAL_MODE: {retrieval_mode}")
+    return HybridRetriever(
+        vector,
+        candidate_k=int(os.getenv("RETRIEVAL_CANDIDATES", "20")),
+        reranker=build_reranker(),
+        rerank_top_n=int(os.getenv("RERANK_TOP_N", "10")),
+    )
+
+def build_embedder() -> EmbeddingService:
+    print("🤖 Loading embedding model...")
+    service = EmbeddingService.from_env()  # Must match the model used in index_heuristics.py
+    service.encode_sync(["warm-up"])  # first forward pass allocates buffers; keep it off the first request
+    return service
+
+# Per-component load state reported by /ready
+component_status = {
+    name: {"status": "pending", "load_seconds": None, "error": None}
+    for name in ("retriever", "embedder", "response_cache")
+}
+startup_seconds: Optional[float] = None
+
+def load_component(name: str, build_fn):
+    component_status[name]["status"] = "loading"
+    started = time.perf_counter()
+    try:
+        component = build_fn()
+        component_status[name]["status"] = "ready"
+        print(f"✅ {name} ready")
+        return component
+    except Exception as e:
+        component_status[name]["status"] = "failed"
+        component_status[name]["error"] = str(e)
+        print(f"❌ Failed to load {name}: {e}")
+        return None
+    finally:
+        component_status[name]["load_seconds"] = round(time.perf_counter() - started, 3)
+
+async def initialize_services():
+    global retriever, embedder, response_cache, startup_seconds
+    started = time.perf_counter()
+    retriever, embedder, response_cache = await asyncio.gather(
+        asyncio.to_thread(load_component, "retriever", build_retriever),
+        asyncio.to_thread(load_component, "embedder", build_embedder),
+        asyncio.to_thread(load_component, "response_cache", SemanticResponseCache.from_env),
+    )
+    startup_seconds = round(time.perf_counter() - started, 3)
+    if retriever is not None and embedder is not None:
+        print(f"🚀 LLM Service ready with RAG in {startup_seconds}s ({retriever.name} retriever, {retriever.count()} documents, {embedder.backend.name} embedder)")
+
+def require_ready():
+    if retriever is None or embedder is None:
+        raise HTTPException(status_code=503, detail="Service is starting; retry once /ready returns 200")
 
 class QueryRequest(BaseModel):
     question: str
     tracked_data: Optional[List[Dict[str, Any]]] = None
     attachments: Optional[List[Dict[str, Any]]] = None
     vision: Optional[List[Dict[str, Any]]] = None
+    # Second-pass mode override: "llm", "local", "markdown" or "skip" (default: LLM_ENHANCE_MODE)
+    enhance_mode: Optional[str] = None
+    # Set to false to bypass the semantic response cache (e.g. to regenerate an answer)
+    use_cache: bool = True
+    # Number of heuristics retrieved as context (default: RETRIEVAL_TOP_K)
+    top_k: Optional[int] = None
 
 class QueryResponse(BaseModel):
     question: str
@@ -74,33 +190,180 @@ class QueryResponse(BaseModel):
     metadata: List[Dict[str, Any]]
     answer: str
     sources: List[str]
+    # Per-stage wall time in ms plus the enhancement mode actually used
+    timings: Optional[Dict[str, Any]] = None
+    # Size of the first-pass prompt (None when served from the response cache)
+    prompt_tokens: Optional[int] = None
+    prompt_stats: Optional[Dict[str, Any]] = None
+
+# How the second "enhancement" pass is done:
+#   llm      - rewrite with the primary provider (original behaviour)
+#   local    - rewrite with a cheaper provider, LLM_ENHANCE_PROVIDER (default: ollama / OLLAMA_ENHANCE_MODEL)
+#   markdown - deterministic markdown post-processing, no LLM call
+#   skip     - return the first-pass answer unchanged
+ENHANCE_MODES = ("llm", "local", "markdown", "skip")
+
+def resolve_enhance_mode(requested: Optional[str]) -> str:
+    mode = (requested or os.getenv("LLM_ENHANCE_MODE", "llm")).lower()
+    if mode not in ENHANCE_MODES:
+        raise HTTPException(status_code=400, detail=f"enhance_mode must be one of {', '.join(ENHANCE_MODES)}")
+    return mode
+
+def resolve_top_k(requested: Optional[int]) -> int:
+    top_k = requested if requested is not None else DEFAULT_TOP_K
+    if not 1 <= top_k <= MAX_TOP_K:
+        raise HTTPException(status_code=400, detail=f"top_k must be between 1 and {MAX_TOP_K}")
+    return top_k
+
+def enhance_provider_for(mode: str, primary_provider):
+    """Provider that runs the enhancement pass, or None when the mode makes no LLM call."""
+    if mode == "llm":
+        return primary_provider
+    if mode == "local":
+        return get_provider(os.getenv("LLM_ENHANCE_PROVIDER", "ollama"))
+    return None
+
+def elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+def request_fingerprint(request: QueryRequest, enhance_mode: str, top_k: int) -> str:
+    """Exact-match part of the cache key: the payload plus the config (and models) that shape the answer."""
+    provider = get_provider(os.getenv("LLM_PROVIDER", "openai"))
+    enhance_provider = enhance_provider_for(enhance_mode, provider)
+    return payload_fingerprint({
+        "vision": request.vision,
+        "tracked_data": request.tracked_data,
+        "attachments": request.attachments,
+        "provider": provider.name,
+        "models": [
+            provider.model_for_pass("primary"),
+            enhance_provider.name if enhance_provider is not None else None,
+            enhance_provider.model_for_pass("enhance") if enhance_provider is not None else None,
+        ],
+        "embedding_model": embedder.backend.model_id if embedder is not None else None,
+        "enhance_mode": enhance_mode,
+        "prompt_token_budget": prompt_builder.PROMPT_TOKEN_BUDGET,
+        "retrieval": [retrieval_mode, top_k],
+    })
+
+# SQLite reads/writes run in worker threads so they never stall the event loop
+async def cached_answer(request: QueryRequest, question_embedding: List[float], fingerprint: str) -> Optional[tuple]:
+    if response_cache is None or not request.use_cache:
+        return None
+    return await asyncio.to_thread(response_cache.lookup, question_embedding, fingerprint)
+
+async def cache_answer(request: QueryRequest, question_embedding: List[float], fingerprint: str, docs, metadata, answer: str):
+    if response_cache is None:
+        return
+    await asyncio.to_thread(response_cache.store, request.question, question_embedding, fingerprint, {
+        "relevant_context": docs,
+        "metadata": metadata,
+        "answer": answer,
+        "sources": [m.get("source", "Unknown") for m in metadata],
+    })
+
+@app.get("/cache/stats")
+async def cache_stats():
+    if response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **(await asyncio.to_thread(response_cache.stats))}
+
+@app.get("/embeddings/stats")
+async def embedding_stats():
+    if embedder is None:
+        return {"ready": False}
+    return embedder.stats()
 
 @app.get("/")
 async def root():
     return {"message": "UX LLM Service is running"}
 
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once the retriever, embedder and response cache are loaded, 503 before that"""
+    is_ready = all(status["status"] == "ready" for status in component_status.values())
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"ready": is_ready, "components": component_status, "startup_seconds": startup_seconds}
+    )
+
+async def embed_question(question: str) -> List[float]:
+    print("🤖 Generating question embedding...")
+    question_embedding = await embedder.embed(question)
+    print("✅ Question embedded successfully")
+    return question_embedding
+
+def retrieve_context(question: str, question_embedding: List[float], top_k: int) -> tuple:
+    """Return the (documents, metadatas) of the top_k heuristics most relevant to the question."""
+    print(f"🔍 Searching {retriever.name} index for relevant context...")
+    docs, metadata = retriever.search(question, question_embedding, top_k)
+
+    print(f"📚 Retriever found {len(docs)} relevant documents")
+    print(f"🔗 Sources: {[m.get('source', 'Unknown') for m in metadata]}")
+    return docs, metadata
+
+def build_analysis_prompt(request: QueryRequest, context_text: str) -> tuple:
+    """Assemble the token-budgeted first-pass prompt; returns (prompt, prompt_stats)."""
+    prompt, stats = prompt_builder.build_analysis_prompt(
+        request.question, context_text, request.vision, request.tracked_data, request.attachments
+    )
+    print(f"🧮 Prompt: {stats['prompt_tokens']} tokens (budget {stats['token_budget']}, detail level {stats['detail_level']})")
+    return prompt, stats
+
+def build_validation_prompt(answer: str) -> str:
+    """Prompt for the second pass that rewrites the analysis into dashboard-ready markdown."""
+    # Improved Mistral validation/enhancement prompt
+    validation_prompt = (
+        "You are a senior UX writing consultant. Transform this UX analysis into an engaging, dashboard-ready presentation while preserving all insights and UI element mappings.\n"
+        "- Use bullet points, bold terms, and clear subheadings\n"
+        "- Keep all screen classifications with confidence levels\n"
+        "- Preserve visual separators between different screens\n"
+        "- Maintain action-to-element connections\n"
+        "- Improve visual hierarchy and formatting\n"
+        "- **CRITICAL**: Never mention being an AI, LLM, or your role - provide analysis directly\n"
+        "- **PRESERVE ENGAGING TONE**: Keep dynamic, consultant-level language - avoid boring technical reports\n"
+        "- **ENHANCE READABILITY**: Make the content more scannable and actionable\n"
+        "- **TRANSFORM UNKNOWN ELEMENTS**: Replace 'Unknown' with descriptive terms like 'interactive elements'\n"
+        "- **USE CONSULTANT LANGUAGE**: Maintain professional but engaging tone throughout\n"
+        "- No meta-commentary, rule mentions, or capability statements\n"
+        "\n---\n\n"
+        f"{answer}\n"
+        "\n---\n\n"
+        "Provide the enhanced, dashboard-ready response:"
+    )
+    return validation_prompt
+
 @app.post("/query", response_model=QueryResponse)
 async def query_with_rag(request: QueryRequest):
+    require_ready()
+    enhance_mode = resolve_enhance_mode(request.enhance_mode)
+    top_k = resolve_top_k(request.top_k)
     try:
         print(f"🔍 Processing query: '{request.question}'")
+        request_started = time.perf_counter()
+        timings = {"enhance_mode": enhance_mode}
         
-        # Embedding
-        print("🤖 Generating question embedding...")
-        question_embedding = embedder.encode([request.question]).tolist()
-        print("✅ Question embedded successfully")
-        
-        # Vector search in ChromaDB
-        print("🔍 Searching ChromaDB for relevant context...")
-        results = collection.query(
-            query_embeddings=question_embedding,
-            n_results=3
-        )
-        docs = results["documents"][0]
-        metadata = results["metadatas"][0]
+        stage_started = time.perf_counter()
+        question_embedding = await embed_question(request.question)
+        timings["embedding_ms"] = elapsed_ms(stage_started)
+
+        fingerprint = request_fingerprint(request, enhance_mode, top_k)
+        hit = await cached_answer(request, question_embedding, fingerprint)
+        if hit is not None:
+            cached, distance = hit
+            print(f"♻️ Serving cached answer (cosine distance {distance:.4f})")
+            timings.update({"cache": "hit", "cache_distance": round(distance, 4), "total_ms": elapsed_ms(request_started)})
+            return QueryResponse(question=request.question, timings=timings, **cached)
+        timings["cache"] = "miss" if response_cache is not None and request.use_cache else "off"
+
+        stage_started = time.perf_counter()
+        docs, metadata = await asyncio.to_thread(retrieve_context, request.question, question_embedding, top_k)
+        timings["retrieval_ms"] = elapsed_ms(stage_started)
         context_text = "\n".join(f"- {d}" for d in docs)
-        
-        print(f"📚 ChromaDB found {len(docs)} relevant documents")
-        print(f"🔗 Sources: {[m.get('source', 'Unknown') for m in metadata]}")
         print(f"📄 Context preview: {context_text[:100]}...")
         
         print(f"Received query: {request.question}")
@@ -110,275 +373,169 @@ async def query_with_rag(request: QueryRequest):
         if request.vision:
             print(f"Number of images analyzed: {len(request.vision)}")
         
-        # Build a clear, LLM-friendly prompt
-        full_prompt = f"""
-You are a senior UX consultant with 15+ years of experience. Analyze the user interface and usage patterns across the provided screenshots with the expertise of a seasoned professional.
-
-**CORE REQUIREMENTS:**
-- Ground all insights in detected UI elements and tracked user interactions
-- For each screenshot, mention its classification and confidence level
-- Use visual separators (emojis/dots) to distinguish between different screens
-- Connect user actions to specific UI elements they interact with
-- Provide specific, actionable recommendations
-- Structure response: Key Findings → User Behavior → Recommendations → Summary
-- **NEVER mention being an AI, LLM, or your role - just provide the analysis directly**
-- **WRITE LIKE A SENIOR CONSULTANT** - use dynamic, engaging language that captures attention
-- **HANDLE INTERACTION DATA INTELLIGENTLY** - describe user behavior patterns naturally, don't show raw coordinates
-- **TRANSFORM UNKNOWN ELEMENTS** - if elements are "Unknown", describe them as "interactive elements" or "UI components"
-
-**MULTIPLE IMAGES:** If multiple screenshots are provided, iterate through each one mentioning its classification and what you observe, then analyze the overall user journey.
-## Analysis Request
-{request.question}
-
----
-## Relevant Context
-{context_text}
-
----
-## Screen & Visual Data
-"""
-        # Add screen classification for multiple images
-        if request.vision and len(request.vision) > 0:
-            full_prompt += f"- Number of screenshots analyzed: {len(request.vision)}\n"
-            for i, vision_result in enumerate(request.vision):
-                image_name = vision_result.get('imageName', f'Image {i+1}')
-                full_prompt += f"\n### Screenshot {i+1}: {image_name}\n"
-                
-                # Add classification
-                if 'classification' in vision_result:
-                    c = vision_result['classification']
-                    label = c.get('label', 'Unknown')
-                    conf = c.get('confidence', 0)
-                    full_prompt += f"- Screen type: {label} (confidence: {conf:.2f})\n"
-                else:
-                    full_prompt += "- Screen type: Unknown (confidence: 0.00)\n"
-                
-                # Add detected elements
-                if 'detections' in vision_result:
-                    full_prompt += "- Detected UI elements:\n"
-                    unknown_count = 0
-                    for j, det in enumerate(vision_result['detections']):
-                        if isinstance(det, dict):
-                            element_class = det.get('class', 'Unknown')
-                            if element_class == 'Unknown':
-                                unknown_count += 1
-                                full_prompt += f"  {j+1}. Interactive UI element at {det.get('bbox', [])} (confidence: {det.get('confidence', 0):.2f})\n"
-                            else:
-                                full_prompt += f"  {j+1}. {element_class} at {det.get('bbox', [])} (confidence: {det.get('confidence', 0):.2f})\n"
-                        else:
-                            continue
-                    
-                    if unknown_count > 0:
-                        full_prompt += f"\n  Note: {unknown_count} interactive elements detected but not classified. These represent user-interactive components.\n"
-                else:
-                    full_prompt += "- No UI elements detected.\n"
-        else:
-            full_prompt += "- No screenshots provided for analysis.\n"
-
-        full_prompt += "\n---\n## Tracked User Interactions\n"
-        if request.tracked_data:
-            for i, td in enumerate(request.tracked_data):
-                element_type = td.get('elementType', 'Unknown')
-                if element_type == 'Unknown':
-                    element_type = 'interactive element'
-                full_prompt += f"  {i+1}. {td.get('interactionType', 'interact')} with {element_type} at {td.get('bbox', [])} (count: {td.get('interactionCount', 1)})\n"
-        else:
-            full_prompt += "  No tracked user interactions available.\n"
-
-        if request.attachments:
-            full_prompt += "\n---\n## Attachments\n"
-            for att in request.attachments:
-                full_prompt += f"- {att.get('filename', 'Unknown')} ({att.get('fileType', 'Unknown type')})\n"
-
-        full_prompt += """
----
-## Response Guidelines
-- Start with overall screen types detected: "Analyzed X screenshots showing [type1] (confidence), [type2] (confidence)..."
-- Use bullet points and bold for key terms
-- Professional tone with minimal, effective emojis
-- If bbox coordinates unclear, focus on element type and interaction patterns
-- For multiple screenshots: describe user journey and flow between screens
-- **CRITICAL**: Never mention being an AI, LLM, or your capabilities - provide analysis directly
-- **WRITE ENGAGINGLY**: Use dynamic language, avoid robotic phrases like "The distinction between..."
-- **INTERACTION INSIGHTS**: Describe user behavior patterns naturally - "Users frequently clicked the login button" not "observed at [coordinates]"
-- **PROFESSIONAL TONE**: Write like a senior UX consultant, not a technical report
-- **ACTIONABLE LANGUAGE**: Use "Implement", "Enhance", "Optimize" instead of "Consider" or "Revise"
-- **INTERACTION HANDLING**: 
-  * If coordinates are empty [], describe the interaction type and element
-  * If interaction count > 1, mention frequency: "Users repeatedly clicked..."
-  * Focus on user intent and behavior patterns, not technical details
-  * Use natural language: "Users navigated to the profile section" not "interaction pattern observed at []"
-- **UNKNOWN ELEMENT HANDLING**:
-  * Replace "Unknown" elements with descriptive terms: "interactive buttons", "navigation elements", "content areas"
-  * Focus on user behavior around these elements, not their technical classification
-  * Describe what users likely intended when interacting with these elements
-- **ENGAGING LANGUAGE EXAMPLES**:
-  * Instead of "Most screens featured..." → "Users primarily engaged with..."
-  * Instead of "High occurrences of..." → "A significant pattern emerged where..."
-  * Instead of "Standard navigation conventions..." → "The interface follows familiar patterns..."
-  * Instead of "Suggestions for enhancement" → "Strategic UX Improvements"
-  * Instead of "Boost Navigation Clarity" → "Streamline Navigation Experience"
-
-Begin your analysis below:
-"""
+        stage_started = time.perf_counter()
+        full_prompt, prompt_stats = build_analysis_prompt(request, context_text)
+        timings["prompt_build_ms"] = elapsed_ms(stage_started)
 
         # Call LLM provider (env-driven)
-        provider = os.getenv("LLM_PROVIDER", "openai").lower()
-
-        def to_messages(prompt: str) -> List[Dict[str, str]]:
-            return [{"role": "user", "content": prompt}]
-
-        def call_openai(prompt: str) -> str:
-            api_key = os.getenv("OPENAI_API_KEY", "")
-            if not api_key:
-                raise Exception("OPENAI_API_KEY is not set")
-            url = "https://api.openai.com/v1/chat/completions"
-            model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-            payload = {
-                "model": model,
-                "messages": to_messages(prompt),
-                "temperature": 0.3,
-            }
-            headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-            r = requests.post(url, headers=headers, json=payload, timeout=120)
-            r.raise_for_status()
-            data = r.json()
-            return data["choices"][0]["message"]["content"].strip()
-
-        def call_mistral(prompt: str) -> str:
-            api_key = os.getenv("MISTRAL_API_KEY", "")
-            if not api_key:
-                raise Exception("MISTRAL_API_KEY is not set")
-            url = "https://api.mistral.ai/v1/chat/completions"
-            model = os.getenv("MISTRAL_MODEL", "mistral-small-latest")
-            payload = {
-                "model": model,
-                "messages": to_messages(prompt),
-                "temperature": 0.3,
-            }
-            headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-            r = requests.post(url, headers=headers, json=payload, timeout=120)
-            r.raise_for_status()
-            data = r.json()
-            return data["choices"][0]["message"]["content"].strip()
-
-        def call_deepseek(prompt: str) -> str:
-            api_key = os.getenv("DEEPSEEK_API_KEY", "")
-            if not api_key:
-                raise Exception("DEEPSEEK_API_KEY is not set")
-            url = "https://api.deepseek.com/chat/completions"
-            model = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
-            payload = {
-                "model": model,
-                "messages": to_messages(prompt),
-                "temperature": 0.3,
-            }
-            headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-            r = requests.post(url, headers=headers, json=payload, timeout=120)
-            r.raise_for_status()
-            data = r.json()
-            return data["choices"][0]["message"]["content"].strip()
-
-        def call_openrouter(prompt: str) -> str:
-            api_key = os.getenv("OPENROUTER_API_KEY", "")
-            if not api_key:
-                raise Exception("OPENROUTER_API_KEY is not set")
-            url = "https://openrouter.ai/api/v1/chat/completions"
-            # Default to a widely available free/credit model if possible
-            model = os.getenv("OPENROUTER_MODEL", "mistralai/mistral-7b-instruct")
-            payload = {
-                "model": model,
-                "messages": to_messages(prompt),
-                "temperature": 0.3,
-            }
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-            }
-            r = requests.post(url, headers=headers, json=payload, timeout=120)
-            r.raise_for_status()
-            data = r.json()
-            return data["choices"][0]["message"]["content"].strip()
-
-        def call_ollama(prompt: str, model_env: str) -> str:
-            endpoint = os.getenv("OLLAMA_ENDPOINT", "http://localhost:11434")
-            model = os.getenv(model_env, os.getenv("OLLAMA_MODEL", "mistral:latest"))
-            url = f"{endpoint}/api/chat"
-            payload = {"model": model, "messages": to_messages(prompt), "stream": False}
-            r = requests.post(url, json=payload, timeout=180)
-            r.raise_for_status()
-            data = r.json()
-            # Ollama returns {message: {content: ...}}
-            if isinstance(data, dict) and "message" in data:
-                return data["message"].get("content", "").strip()
-            # Some versions may return choices-like structure
-            if "choices" in data:
-                return data["choices"][0]["message"]["content"].strip()
-            return json.dumps(data)
+        provider = get_provider(os.getenv("LLM_PROVIDER", "openai"))
 
         # First pass: DeepSeek (or chosen primary model)
-        if provider == "openai":
-            deepseek_answer = call_openai(full_prompt)
-        elif provider == "mistral":
-            deepseek_answer = call_mistral(full_prompt)
-        elif provider == "deepseek":
-            deepseek_answer = call_deepseek(full_prompt)
-        elif provider == "openrouter":
-            deepseek_answer = call_openrouter(full_prompt)
-        elif provider == "ollama":
-            # allow specifying a primary model for first pass via OLLAMA_PRIMARY_MODEL
-            deepseek_answer = call_ollama(full_prompt, "OLLAMA_PRIMARY_MODEL")
-        else:
-            raise Exception(f"Unsupported LLM_PROVIDER: {provider}")
-
-        # Improved Mistral validation/enhancement prompt
-        validation_prompt = (
-            "You are a senior UX writing consultant. Transform this UX analysis into an engaging, dashboard-ready presentation while preserving all insights and UI element mappings.\n"
-            "- Use bullet points, bold terms, and clear subheadings\n"
-            "- Keep all screen classifications with confidence levels\n"
-            "- Preserve visual separators between different screens\n"
-            "- Maintain action-to-element connections\n"
-            "- Improve visual hierarchy and formatting\n"
-            "- **CRITICAL**: Never mention being an AI, LLM, or your role - provide analysis directly\n"
-            "- **PRESERVE ENGAGING TONE**: Keep dynamic, consultant-level language - avoid boring technical reports\n"
-            "- **ENHANCE READABILITY**: Make the content more scannable and actionable\n"
-            "- **TRANSFORM UNKNOWN ELEMENTS**: Replace 'Unknown' with descriptive terms like 'interactive elements'\n"
-            "- **USE CONSULTANT LANGUAGE**: Maintain professional but engaging tone throughout\n"
-            "- No meta-commentary, rule mentions, or capability statements\n"
-            "\n---\n\n"
-            f"{deepseek_answer}\n"
-            "\n---\n\n"
-            "Provide the enhanced, dashboard-ready response:"
-        )
+        stage_started = time.perf_counter()
+        deepseek_answer = await provider.complete(full_prompt, provider.model_for_pass("primary"))
+        timings["analysis_ms"] = elapsed_ms(stage_started)
 
-        # Second pass: use Mistral-like model for enhancement; fall back to provider if needed
-        try:
-            if provider == "mistral":
-                mistral_answer = call_mistral(validation_prompt)
-            elif provider == "openai":
-                mistral_answer = call_openai(validation_prompt)
-            elif provider == "deepseek":
-                mistral_answer = call_deepseek(validation_prompt)
-            elif provider == "openrouter":
-                mistral_answer = call_openrouter(validation_prompt)
-            elif provider == "ollama":
-                # allow specifying different enhancement model via OLLAMA_ENHANCE_MODEL
-                mistral_answer = call_ollama(validation_prompt, "OLLAMA_ENHANCE_MODEL")
-            else:
+        # Second pass: LLM rewrite, deterministic formatting, or nothing
+        stage_started = time.perf_counter()
+        enhance_provider = enhance_provider_for(enhance_mode, provider)
+        if enhance_provider is not None:
+            try:
+                validation_prompt = build_validation_prompt(deepseek_answer)
+                mistral_answer = await enhance_provider.complete(validation_prompt, enhance_provider.model_for_pass("enhance"))
+            except Exception as e:
+                # If enhancement call fails, return first-pass answer
+                print(f"⚠️ Enhancement pass failed: {e}")
+                timings["enhance_error"] = str(e)
                 mistral_answer = deepseek_answer
-        except Exception:
-            # If enhancement call fails, return first-pass answer
+        elif enhance_mode == "markdown":
+            mistral_answer = format_markdown(deepseek_answer)
+        else:
             mistral_answer = deepseek_answer
+        timings["enhance_ms"] = elapsed_ms(stage_started)
+        if "enhance_error" not in timings:
+            await cache_answer(request, question_embedding, fingerprint, docs, metadata, mistral_answer)
+        timings["total_ms"] = elapsed_ms(request_started)
+        print(f"⏱️ Timings: {timings}")
 
         return QueryResponse(
             question=request.question,
             relevant_context=docs,
             metadata=metadata,
             answer=mistral_answer,
-            sources=[m.get("source", "Unknown") for m in metadata]
+            sources=[m.get("source", "Unknown") for m in metadata],
+            timings=timings,
+            prompt_tokens=prompt_stats["prompt_tokens"],
+            prompt_stats=prompt_stats
         )
     except Exception as e:
         print(f"Query error: {e}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Query error: {e}")
+
+def encode_stream_event(event: Dict[str, Any], stream_format: str) -> str:
+    data = json.dumps(event, ensure_ascii=False)
+    if stream_format == "sse":
+        return f"event: {event['type']}\ndata: {data}\n\n"
+    return data + "\n"
+
+@app.post("/query/stream")
+async def query_with_rag_stream(request: QueryRequest, stream_format: str = Query("ndjson", alias="format")):
+    """Streaming variant of /query (NDJSON by default, `?format=sse` for server-sent events).
+
+    Events, in order:
+      {"type": "metadata", "question", "relevant_context", "metadata", "sources", "prompt_tokens", "prompt_stats"}
+      {"type": "token", "pass": "analysis", "content"}   ... first-pass tokens
+      {"type": "pass_complete", "pass": "analysis"}
+      {"type": "token", "pass": "enhance", "content"}    ... rewrite tokens; replace the analysis text
+      {"type": "pass_failed", "pass": "enhance", "detail"}  (only if the rewrite fails; keep the analysis)
+      {"type": "done", "answer", "timings"}               final answer and timings, as in /query
+      {"type": "error", "detail"}                         terminal, on failure after streaming started
+    """
+    if stream_format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'sse'")
+    require_ready()
+    enhance_mode = resolve_enhance_mode(request.enhance_mode)
+    top_k = resolve_top_k(request.top_k)
+    try:
+        print(f"🔍 Processing streaming query: '{request.question}'")
+        request_started = time.perf_counter()
+        timings = {"enhance_mode": enhance_mode}
+        stage_started = time.perf_counter()
+        question_embedding = await embed_question(request.question)
+        timings["embedding_ms"] = elapsed_ms(stage_started)
+        fingerprint = request_fingerprint(request, enhance_mode, top_k)
+        hit = await cached_answer(request, question_embedding, fingerprint)
+        if hit is not None:
+            cached, distance = hit
+            timings.update({"cache": "hit", "cache_distance": round(distance, 4), "total_ms": elapsed_ms(request_started)})
+            docs, metadata = cached["relevant_context"], cached["metadata"]
+        else:
+            timings["cache"] = "miss" if response_cache is not None and request.use_cache else "off"
+            stage_started = time.perf_counter()
+            docs, metadata = await asyncio.to_thread(retrieve_context, request.question, question_embedding, top_k)
+            timings["retrieval_ms"] = elapsed_ms(stage_started)
+        context_text = "\n".join(f"- {d}" for d in docs)
+        stage_started = time.perf_counter()
+        full_prompt, prompt_stats = build_analysis_prompt(request, context_text)
+        timings["prompt_build_ms"] = elapsed_ms(stage_started)
+        provider = get_provider(os.getenv("LLM_PROVIDER", "openai"))
+        enhance_provider = enhance_provider_for(enhance_mode, provider)
+    except Exception as e:
+        print(f"Query error: {e}")
+        raise HTTPException(status_code=500, detail=f"Query error: {e}")
+
+    async def events():
+        # Retrieval metadata goes out before any LLM work so the client can render it immediately
+        yield {
+            "type": "metadata",
+            "question": request.question,
+            "relevant_context": docs,
+            "metadata": metadata,
+            "sources": [m.get("source", "Unknown") for m in metadata],
+            "prompt_tokens": prompt_stats["prompt_tokens"],
+            "prompt_stats": prompt_stats,
+        }
+        if hit is not None:
+            yield {"type": "done", "answer": hit[0]["answer"], "timings": timings}
+            return
+        try:
+            parts = []
+            stage_started = time.perf_counter()
+            async for chunk in provider.stream(full_prompt, provider.model_for_pass("primary")):
+                if not parts:
+                    timings["analysis_first_token_ms"] = elapsed_ms(stage_started)
+                parts.append(chunk)
+                yield {"type": "token", "pass": "analysis", "content": chunk}
+            deepseek_answer = "".join(parts).strip()
+            timings["analysis_ms"] = elapsed_ms(stage_started)
+            yield {"type": "pass_complete", "pass": "analysis"}
+
+            stage_started = time.perf_counter()
+            if enhance_provider is not None:
+                parts = []
+                try:
+                    validation_prompt = build_validation_prompt(deepseek_answer)
+                    async for chunk in enhance_provider.stream(validation_prompt, enhance_provider.model_for_pass("enhance")):
+                        parts.append(chunk)
+                        yield {"type": "token", "pass": "enhance", "content": chunk}
+                    mistral_answer = "".join(parts).strip()
+                except Exception as e:
+                    # If enhancement call fails, return first-pass answer
+                    timings["enhance_error"] = str(e)
+                    yield {"type": "pass_failed", "pass": "enhance", "detail": str(e)}
+                    mistral_answer = deepseek_answer
+            elif enhance_mode == "markdown":
+                mistral_answer = format_markdown(deepseek_answer)
+            else:
+                mistral_answer = deepseek_answer
+            timings["enhance_ms"] = elapsed_ms(stage_started)
+            if "enhance_error" not in timings:
+                await cache_answer(request, question_embedding, fingerprint, docs, metadata, mistral_answer)
+            timings["total_ms"] = elapsed_ms(request_started)
+
+            yield {"type": "done", "answer": mistral_answer, "timings": timings}
+        except Exception as e:
+            print(f"Streaming query error: {e}")
+            yield {"type": "error", "detail": f"Query error: {e}"}
+
+    async def body():
+        async for event in events():
+            yield encode_stream_event(event, stream_format)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream" if stream_format == "sse" else "application/x-ndjson",
+        # Disable proxy buffering (nginx) so tokens reach the client as they are produced
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
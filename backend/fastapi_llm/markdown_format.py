@@ -0,0 +1,63 @@
+"""
+Deterministic markdown post-processor.
+
+A zero-cost alternative to the second "enhancement" LLM pass: it normalizes the
+first-pass answer into consistent, dashboard-ready markdown (headings, bullets,
+spacing) and applies the same content rules the enhancement prompt asks for.
+"""
+import re
+
+# Section names the analysis prompt asks for; bare or bold-only lines with these names become headings
+SECTION_NAMES = (
+    "key findings", "user behavior", "user behaviour", "recommendations",
+    "strategic ux improvements", "summary", "overview", "user journey",
+)
+
+BULLET_RE = re.compile(r"^(\s*)(?:[*•·▪‣]|-(?!-))\s+")
+ORDERED_RE = re.compile(r"^(\s*)(\d+)[.)]\s+")
+HEADING_RE = re.compile(r"^(#{1,6})\s*(.+?)\s*#*\s*$")
+PSEUDO_HEADING_RE = re.compile(r"^\s*(?:\*\*|__)?\s*([A-Za-z][A-Za-z &/-]{2,60}?)\s*:?\s*(?:\*\*|__)?\s*:?\s*$")
+AI_MENTION_RE = re.compile(r"^\s*(?:as an ai|as a language model|i am an ai|as an llm)\b.*$", re.IGNORECASE)
+UNKNOWN_ELEMENTS_RE = re.compile(r"\bUnknown elements\b")
+UNKNOWN_ELEMENT_RE = re.compile(r"\bUnknown element\b")
+
+
+def _heading_for(line: str):
+    """Return a '## Title' heading if the line is a section title, else None."""
+    match = HEADING_RE.match(line)
+    if match:
+        level = min(max(len(match.group(1)), 2), 4)
+        return f"{'#' * level} {match.group(2).strip('*_ ').strip()}"
+    match = PSEUDO_HEADING_RE.match(line)
+    if match and match.group(1).strip().lower() in SECTION_NAMES:
+        return f"## {match.group(1).strip().title()}"
+    return None
+
+
+def format_markdown(text: str) -> str:
+    """Normalize an LLM answer into consistent markdown."""
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    out = []
+    for raw in lines:
+        line = raw.rstrip()
+        if AI_MENTION_RE.match(line):
+            continue
+
+        heading = _heading_for(line)
+        if heading:
+            if out and out[-1] != "":
+                out.append("")
+            out.append(heading)
+            out.append("")
+            continue
+
+        line = BULLET_RE.sub(lambda m: f"{m.group(1)}- ", line)
+        line = ORDERED_RE.sub(lambda m: f"{m.group(1)}{m.group(2)}. ", line)
+        line = UNKNOWN_ELEMENTS_RE.sub("interactive elements", line)
+        line = UNKNOWN_ELEMENT_RE.sub("interactive element", line)
+        out.append(line)
+
+    formatted = "\n".join(out)
+    # Collapse runs of blank lines and trim
+    formatted = re.sub(r"\n{3,}", "\n\n", formatted)
+    return formatted.strip() + "\n"
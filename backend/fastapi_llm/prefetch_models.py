@@ -0,0 +1,44 @@
+"""
+Download the query embedder (and the prompt tokenizer) so the service starts without network access.
+
+Usage:
+    python prefetch_models.py [--model BAAI/bge-small-en-v1.5] [--out models/embedder]
+                              [--reranker cross-encoder/ms-marco-MiniLM-L-6-v2 --reranker-out models/reranker]
+
+Then run the service with EMBEDDING_MODEL_DIR pointing at the output directory
+(and HF_HUB_OFFLINE=1 to make any accidental download fail fast), and with
+RERANKER_MODEL set and RERANKER_MODEL_DIR pointing at --reranker-out if the
+re-ranker is used. The tiktoken encoding is cached in TIKTOKEN_CACHE_DIR when
+that is set.
+"""
+import argparse
+import os
+
+from sentence_transformers import SentenceTransformer
+
+from embeddings import DEFAULT_EMBEDDING_MODEL
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_EMBEDDING_MODEL)
+    parser.add_argument("--out", default="models/embedder")
+    parser.add_argument("--reranker", help="cross-encoder model to pre-fetch as well")
+    parser.add_argument("--reranker-out", default="models/reranker")
+    args = parser.parse_args()
+
+    print(f"Downloading embedding model: {args.model}")
+    SentenceTransformer(args.model).save(args.out)
+    print(f"✅ Saved to {args.out}")
+
+    if args.reranker:
+        from sentence_transformers import CrossEncoder
+
+        print(f"Downloading re-ranker: {args.reranker}")
+        CrossEncoder(args.reranker).save(args.reranker_out)
+        print(f"✅ Saved to {args.reranker_out}")
+
+    if os.getenv("TIKTOKEN_CACHE_DIR"):
+        import tiktoken
+
+        tiktoken.get_encoding(os.getenv("PROMPT_TOKENIZER", "cl100k_base"))
+        print(f"✅ Cached tiktoken encoding in {os.getenv('TIKTOKEN_CACHE_DIR')}")
@@ -0,0 +1,314 @@
+"""
+Token-budgeted assembly of the first-pass analysis prompt.
+
+Instead of one line per detection and per tracked interaction, each screenshot
+is summarized (element counts per class, the most confident elements,
+deduplicated OCR text) and tracked interactions are reduced to counts and the
+most frequent (action, element, screen) combinations. If the prompt is still
+over budget, detail is stepped down level by level (fewer examples, then
+one-line summaries for the later screens) and, as a last resort, the payload
+and RAG context are truncated. The instructions and the question are never
+cut, so a budget smaller than they are is exceeded.
+
+Token counts use tiktoken when it is installed (the encoding of the OpenAI
+chat models, close enough for the other providers), otherwise an approximate
+4-characters-per-token estimate.
+
+Configuration (env):
+    PROMPT_TOKEN_BUDGET     max tokens of the analysis prompt (default 6000)
+    PROMPT_TOKENIZER        tiktoken encoding name (default cl100k_base)
+"""
+import math
+import os
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+
+# (top detections per screen, OCR texts per screen, frequent interactions, screens shown in detail)
+DETAIL_LEVELS = [
+    (10, 12, 10, None),
+    (5, 6, 8, None),
+    (3, 3, 5, 12),
+    (0, 0, 3, 6),
+    (0, 0, 0, 0),
+]
+
+TRUNCATION_NOTE = "\n[... truncated to fit the token budget]\n"
+
+PROMPT_HEADER = """
+You are a senior UX consultant with 15+ years of experience. Analyze the user interface and usage patterns across the provided screenshots with the expertise of a seasoned professional.
+
+**CORE REQUIREMENTS:**
+- Ground all insights in detected UI elements and tracked user interactions
+- For each screenshot, mention its classification and confidence level
+- Use visual separators (emojis/dots) to distinguish between different screens
+- Connect user actions to specific UI elements they interact with
+- Provide specific, actionable recommendations
+- Structure response: Key Findings → User Behavior → Recommendations → Summary
+- **NEVER mention being an AI, LLM, or your role - just provide the analysis directly**
+- **WRITE LIKE A SENIOR CONSULTANT** - use dynamic, engaging language that captures attention
+- **HANDLE INTERACTION DATA INTELLIGENTLY** - describe user behavior patterns naturally, don't show raw coordinates
+- **TRANSFORM UNKNOWN ELEMENTS** - if elements are "Unknown", describe them as "interactive elements" or "UI components"
+
+**MULTIPLE IMAGES:** If multiple screenshots are provided, iterate through each one mentioning its classification and what you observe, then analyze the overall user journey.
+## Analysis Request
+{question}
+
+---
+## Relevant Context
+{context}
+
+---
+## Screen & Visual Data
+"""
+
+PROMPT_GUIDELINES = """
+---
+## Response Guidelines
+- Start with overall screen types detected: "Analyzed X screenshots showing [type1] (confidence), [type2] (confidence)..."
+- Use bullet points and bold for key terms
+- Professional tone with minimal, effective emojis
+- Element lists are aggregated per screen: reason about counts and the listed examples, not individual coordinates
+- For multiple screenshots: describe user journey and flow between screens
+- **CRITICAL**: Never mention being an AI, LLM, or your capabilities - provide analysis directly
+- **WRITE ENGAGINGLY**: Use dynamic language, avoid robotic phrases like "The distinction between..."
+- **INTERACTION INSIGHTS**: Describe user behavior patterns naturally - "Users frequently clicked the login button" not "observed at [coordinates]"
+- **PROFESSIONAL TONE**: Write like a senior UX consultant, not a technical report
+- **ACTIONABLE LANGUAGE**: Use "Implement", "Enhance", "Optimize" instead of "Consider" or "Revise"
+- **INTERACTION HANDLING**:
+  * If interaction count > 1, mention frequency: "Users repeatedly clicked..."
+  * Focus on user intent and behavior patterns, not technical details
+  * Use natural language: "Users navigated to the profile section" not "interaction pattern observed at []"
+- **UNKNOWN ELEMENT HANDLING**:
+  * Replace "Unknown" elements with descriptive terms: "interactive buttons", "navigation elements", "content areas"
+  * Focus on user behavior around these elements, not their technical classification
+  * Describe what users likely intended when interacting with these elements
+- **ENGAGING LANGUAGE EXAMPLES**:
+  * Instead of "Most screens featured..." → "Users primarily engaged with..."
+  * Instead of "High occurrences of..." → "A significant pattern emerged where..."
+  * Instead of "Standard navigation conventions..." → "The interface follows familiar patterns..."
+  * Instead of "Suggestions for enhancement" → "Strategic UX Improvements"
+  * Instead of "Boost Navigation Clarity" → "Streamline Navigation Experience"
+
+Begin your analysis below:
+"""
+
+
+class TokenCounter:
+    """Counts and truncates by tokens with tiktoken, or by a chars/4 estimate without it."""
+
+    def __init__(self, encoding_name: str = "cl100k_base"):
+        self.encoding = None
+        try:
+            import tiktoken
+
+            self.encoding = tiktoken.get_encoding(encoding_name)
+            self.name = f"tiktoken:{encoding_name}"
+        except Exception as e:
+            print(f"⚠️ tiktoken unavailable ({e}); prompt token counts are approximate")
+            self.name = "approx:chars/4"
+
+    def count(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return (len(text) + 3) // 4
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        max_tokens = max(max_tokens, 0)
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            return text if len(tokens) <= max_tokens else self.encoding.decode(tokens[:max_tokens])
+        return text[:max_tokens * 4]
+
+
+@lru_cache(maxsize=None)
+def get_token_counter() -> TokenCounter:
+    return TokenCounter(os.getenv("PROMPT_TOKENIZER", "cl100k_base"))
+
+
+def element_name(element_type: Optional[str]) -> str:
+    return "interactive element" if not element_type or element_type == "Unknown" else element_type
+
+
+def _quote(text: str, limit: int = 40) -> str:
+    text = " ".join(str(text).split())
+    return f'"{text[:limit - 1]}…"' if len(text) > limit else f'"{text}"'
+
+
+def _confidence(item: Dict[str, Any]) -> float:
+    """confidence as a float; missing, non-numeric or non-finite values count as 0.0"""
+    try:
+        value = float(item.get("confidence", 0))
+    except (TypeError, ValueError):
+        return 0.0
+    return value if math.isfinite(value) else 0.0
+
+
+def _screen_type(vision_result: Dict[str, Any]) -> str:
+    c = vision_result.get("classification")
+    if not isinstance(c, dict):
+        return "Unknown (confidence: 0.00)"
+    return f"{c.get('label', 'Unknown')} (confidence: {_confidence(c):.2f})"
+
+
+def summarize_screen(index: int, vision_result: Dict[str, Any], top_detections: int, ocr_texts: int) -> str:
+    name = vision_result.get("imageName", f"Image {index + 1}")
+    lines = [f"\n### Screenshot {index + 1}: {name}", f"- Screen type: {_screen_type(vision_result)}"]
+
+    if "detections" not in vision_result:
+        lines.append("- No UI elements detected.")
+        return "\n".join(lines) + "\n"
+
+    detections = [d for d in vision_result["detections"] or [] if isinstance(d, dict)]
+    counts = Counter(element_name(d.get("class")) for d in detections)
+    breakdown = ", ".join(f"{count}× {cls}" for cls, count in counts.most_common())
+    lines.append(f"- Detected UI elements ({len(detections)}): {breakdown or 'none'}")
+
+    if top_detections > 0 and detections:
+        top = sorted(detections, key=_confidence, reverse=True)[:top_detections]
+        examples = []
+        for d in top:
+            label = element_name(d.get("class"))
+            if d.get("extracted_text"):
+                label += f" {_quote(d['extracted_text'])}"
+            examples.append(f"{label} ({_confidence(d):.2f})")
+        lines.append(f"- Most confident: {', '.join(examples)}")
+
+    if ocr_texts > 0:
+        seen, texts = set(), []
+        for d in detections:
+            text = " ".join(str(d.get("extracted_text") or "").split())
+            if text and text.lower() not in seen:
+                seen.add(text.lower())
+                texts.append(text)
+        if texts:
+            more = f" (+{len(texts) - ocr_texts} more)" if len(texts) > ocr_texts else ""
+            lines.append(f"- Text on screen: {', '.join(_quote(t) for t in texts[:ocr_texts])}{more}")
+
+    unknown_count = sum(1 for d in detections if d.get("class", "Unknown") == "Unknown")
+    if unknown_count > 0:
+        lines.append(f"  Note: {unknown_count} interactive elements detected but not classified. These represent user-interactive components.")
+    return "\n".join(lines) + "\n"
+
+
+def summarize_screen_brief(index: int, vision_result: Dict[str, Any]) -> str:
+    name = vision_result.get("imageName", f"Image {index + 1}")
+    n_elements = len([d for d in vision_result.get("detections") or [] if isinstance(d, dict)])
+    return f"- Screenshot {index + 1}: {name} — {_screen_type(vision_result)}, {n_elements} UI elements\n"
+
+
+def iter_interactions(tracked_data: Iterable[Any]) -> Iterable[Dict[str, Any]]:
+    """Flatten tracked data, which may hold single interactions or per-session lists of them."""
+    for entry in tracked_data or []:
+        if isinstance(entry, dict):
+            yield entry
+        elif isinstance(entry, list):
+            for interaction in entry:
+                if isinstance(interaction, dict):
+                    yield interaction
+
+
+def summarize_interactions(tracked_data: List[Any], top_interactions: int) -> str:
+    by_type, by_element, by_screen, by_action = Counter(), Counter(), Counter(), Counter()
+    n_records = 0
+    for td in iter_interactions(tracked_data):
+        n_records += 1
+        try:
+            count = max(int(td.get("interactionCount", 1) or 1), 1)
+        except (TypeError, ValueError):
+            count = 1
+        interaction_type = td.get("interactionType", "interact")
+        element = element_name(td.get("elementType"))
+        screen = td.get("imageName")
+        text = td.get("elementText") or td.get("text")
+        by_type[interaction_type] += count
+        by_element[element] += count
+        if screen:
+            by_screen[screen] += count
+        by_action[(interaction_type, element, _quote(text) if text else None, screen)] += count
+
+    if n_records == 0:
+        return "  No tracked user interactions available.\n"
+
+    lines = [f"- {sum(by_type.values())} interaction events from {n_records} tracked records"]
+    lines.append("- By interaction type: " + ", ".join(f"{t} {c}" for t, c in by_type.most_common()))
+    lines.append("- By element: " + ", ".join(f"{e} {c}" for e, c in by_element.most_common(10)))
+    if by_screen:
+        lines.append("- By screen: " + ", ".join(f"{s} {c}" for s, c in by_screen.most_common(10)))
+    if top_interactions > 0:
+        lines.append("- Most frequent interactions:")
+        for (interaction_type, element, text, screen), count in by_action.most_common(top_interactions):
+            target = f"{element} {text}" if text else element
+            where = f" on {screen}" if screen else ""
+            lines.append(f"  * {count}× {interaction_type} with {target}{where}")
+    return "\n".join(lines) + "\n"
+
+
+def render_payload(vision: Optional[List[Dict[str, Any]]], tracked_data: Optional[List[Any]],
+                   attachments: Optional[List[Dict[str, Any]]], level: Tuple) -> str:
+    top_detections, ocr_texts, top_interactions, detailed_screens = level
+    parts = []
+    if vision:
+        parts.append(f"- Number of screenshots analyzed: {len(vision)}\n")
+        for i, vision_result in enumerate(vision):
+            if not isinstance(vision_result, dict):
+                continue
+            if detailed_screens is None or i < detailed_screens:
+                parts.append(summarize_screen(i, vision_result, top_detections, ocr_texts))
+            else:
+                if i == detailed_screens:
+                    parts.append("\n### Remaining screenshots\n")
+                parts.append(summarize_screen_brief(i, vision_result))
+    else:
+        parts.append("- No screenshots provided for analysis.\n")
+
+    parts.append("\n---\n## Tracked User Interactions\n")
+    parts.append(summarize_interactions(tracked_data, top_interactions) if tracked_data
+                 else "  No tracked user interactions available.\n")
+
+    if attachments:
+        parts.append("\n---\n## Attachments\n")
+        for att in attachments:
+            parts.append(f"- {att.get('filename', 'Unknown')} ({att.get('fileType', 'Unknown type')})\n")
+    return "".join(parts)
+
+
+def render_prompt(question: str, context_text: str, payload: str) -> str:
+    return PROMPT_HEADER.format(question=question, context=context_text) + payload + PROMPT_GUIDELINES
+
+
+def build_analysis_prompt(question: str, context_text: str, vision=None, tracked_data=None, attachments=None,
+                          token_budget: Optional[int] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Build the analysis prompt within the token budget.
+
+    Returns:
+        (prompt, stats) where stats holds prompt_tokens, token_budget, detail_level,
+        truncated and tokenizer
+    """
+    counter = get_token_counter()
+    budget = token_budget or PROMPT_TOKEN_BUDGET
+    stats = {"token_budget": budget, "tokenizer": counter.name, "truncated": False}
+
+    for detail_level, level in enumerate(DETAIL_LEVELS):
+        payload = render_payload(vision, tracked_data, attachments, level)
+        prompt = render_prompt(question, context_text, payload)
+        tokens = counter.count(prompt)
+        if tokens <= budget:
+            stats.update(prompt_tokens=tokens, detail_level=detail_level)
+            return prompt, stats
+
+    # Least detailed rendering is still too long: split what's left between payload and context
+    remaining = budget - counter.count(render_prompt(question, "", TRUNCATION_NOTE * 2))
+    payload_tokens, context_tokens = counter.count(payload), counter.count(context_text)
+    payload_allowance = max(remaining - context_tokens, remaining // 2)
+    if payload_tokens > payload_allowance:
+        payload = counter.truncate(payload, payload_allowance) + TRUNCATION_NOTE
+        payload_tokens = payload_allowance
+    if context_tokens > remaining - payload_tokens:
+        context_text = counter.truncate(context_text, remaining - payload_tokens) + TRUNCATION_NOTE
+    prompt = render_prompt(question, context_text, payload)
+    stats.update(prompt_tokens=counter.count(prompt), detail_level=len(DETAIL_LEVELS) - 1, truncated=True)
+    return prompt, stats
@@ -0,0 +1,256 @@
+"""
+LLM provider clients.
+
+All providers share one pooled `httpx.AsyncClient` (keep-alive connections are
+reused across requests) and each provider gets its own concurrency limit and
+timeout, so one slow upstream can't stall the worker or starve the others.
+
+Configuration (env):
+    LLM_HTTP_MAX_CONNECTIONS     total pooled connections (default 100)
+    LLM_HTTP_MAX_KEEPALIVE       idle keep-alive connections kept open (default 20)
+    LLM_HTTP_KEEPALIVE_EXPIRY    seconds an idle connection is kept (default 30)
+    LLM_<PROVIDER>_MAX_CONCURRENCY   in-flight requests per provider (default 8)
+    LLM_<PROVIDER>_TIMEOUT           read timeout in seconds (default 120, ollama 180)
+    MOCK_LLM_LATENCY_MS          simulated completion latency of the mock provider (default 200)
+"""
+import abc
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+CONNECT_TIMEOUT = 10.0
+
+_http_client: Optional[httpx.AsyncClient] = None
+_providers: Dict[str, "LLMProvider"] = {}
+
+
+class ProviderError(Exception):
+    """Raised when a provider is misconfigured or returns an unusable response."""
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared async client with a keep-alive connection pool."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100")),
+                max_keepalive_connections=int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20")),
+                keepalive_expiry=float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "30")),
+            ),
+            timeout=httpx.Timeout(120.0, connect=CONNECT_TIMEOUT),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def to_messages(prompt: str) -> List[Dict[str, str]]:
+    return [{"role": "user", "content": prompt}]
+
+
+class LLMProvider(abc.ABC):
+    """Base class: concurrency limit + timeout around a single chat completion."""
+
+    default_timeout = 120.0
+
+    def __init__(self, name: str):
+        self.name = name
+        env_name = name.upper()
+        self.timeout = httpx.Timeout(
+            float(os.getenv(f"LLM_{env_name}_TIMEOUT", str(self.default_timeout))), connect=CONNECT_TIMEOUT
+        )
+        self.max_concurrency = int(os.getenv(f"LLM_{env_name}_MAX_CONCURRENCY", "8"))
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    @abc.abstractmethod
+    def model_for_pass(self, pass_name: str) -> str:
+        """Model used for a pipeline pass ("primary" analysis or "enhance" rewrite)."""
+
+    async def complete(self, prompt: str, model: Optional[str] = None) -> str:
+        async with self._semaphore:
+            return await self._complete(prompt, model or self.model_for_pass("primary"))
+
+    @abc.abstractmethod
+    async def _complete(self, prompt: str, model: str) -> str:
+        """One chat completion, called under the provider's concurrency limit."""
+
+    async def stream(self, prompt: str, model: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield the completion as text chunks as the provider produces them."""
+        async with self._semaphore:
+            async for chunk in self._stream(prompt, model or self.model_for_pass("primary")):
+                yield chunk
+
+    async def _stream(self, prompt: str, model: str) -> AsyncIterator[str]:
+        # Providers without native streaming deliver the whole completion as one chunk
+        yield await self._complete(prompt, model)
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """Providers exposing the OpenAI `/chat/completions` API (OpenAI, Mistral, DeepSeek, OpenRouter)."""
+
+    def __init__(self, name: str, url: str, api_key_env: str, model_env: str, default_model: str):
+        super().__init__(name)
+        self.url = url
+        self.api_key_env = api_key_env
+        self.model_env = model_env
+        self.default_model = default_model
+
+    def model_for_pass(self, pass_name: str) -> str:
+        return os.getenv(self.model_env, self.default_model)
+
+    def _headers(self) -> Dict[str, str]:
+        api_key = os.getenv(self.api_key_env, "")
+        if not api_key:
+            raise ProviderError(f"{self.api_key_env} is not set")
+        return {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+
+    async def _complete(self, prompt: str, model: str) -> str:
+        payload = {
+            "model": model,
+            "messages": to_messages(prompt),
+            "temperature": 0.3,
+        }
+        r = await get_http_client().post(self.url, headers=self._headers(), json=payload, timeout=self.timeout)
+        r.raise_for_status()
+        data = r.json()
+        return data["choices"][0]["message"]["content"].strip()
+
+    async def _stream(self, prompt: str, model: str) -> AsyncIterator[str]:
+        payload = {
+            "model": model,
+            "messages": to_messages(prompt),
+            "temperature": 0.3,
+            "stream": True,
+        }
+        async with get_http_client().stream(
+            "POST", self.url, headers=self._headers(), json=payload, timeout=self.timeout
+        ) as r:
+            r.raise_for_status()
+            # Server-sent events: "data: {...}" lines terminated by "data: [DONE]"
+            async for line in r.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or []
+                if choices:
+                    content = (choices[0].get("delta") or {}).get("content")
+                    if content:
+                        yield content
+
+
+class OllamaProvider(LLMProvider):
+    """Local Ollama server via its native `/api/chat` endpoint."""
+
+    default_timeout = 180.0
+
+    def __init__(self):
+        super().__init__("ollama")
+        self.endpoint = os.getenv("OLLAMA_ENDPOINT", "http://localhost:11434")
+
+    def model_for_pass(self, pass_name: str) -> str:
+        # allow different models per pass via OLLAMA_PRIMARY_MODEL / OLLAMA_ENHANCE_MODEL
+        return os.getenv(f"OLLAMA_{pass_name.upper()}_MODEL", os.getenv("OLLAMA_MODEL", "mistral:latest"))
+
+    async def _complete(self, prompt: str, model: str) -> str:
+        payload = {"model": model, "messages": to_messages(prompt), "stream": False}
+        r = await get_http_client().post(f"{self.endpoint}/api/chat", json=payload, timeout=self.timeout)
+        r.raise_for_status()
+        data = r.json()
+        # Ollama returns {message: {content: ...}}
+        if isinstance(data, dict) and "message" in data:
+            return data["message"].get("content", "").strip()
+        # Some versions may return choices-like structure
+        if "choices" in data:
+            return data["choices"][0]["message"]["content"].strip()
+        return json.dumps(data)
+
+    async def _stream(self, prompt: str, model: str) -> AsyncIterator[str]:
+        payload = {"model": model, "messages": to_messages(prompt), "stream": True}
+        async with get_http_client().stream(
+            "POST", f"{self.endpoint}/api/chat", json=payload, timeout=self.timeout
+        ) as r:
+            r.raise_for_status()
+            # Native streaming: one JSON object per line, the last one has done=true
+            async for line in r.aiter_lines():
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                content = (data.get("message") or {}).get("content")
+                if content:
+                    yield content
+                if data.get("done"):
+                    break
+
+
+class MockProvider(LLMProvider):
+    """Offline provider for benchmarks and local development: sleeps, then returns canned markdown."""
+
+    def __init__(self):
+        super().__init__("mock")
+        self.latency = float(os.getenv("MOCK_LLM_LATENCY_MS", "200")) / 1000.0
+
+    def model_for_pass(self, pass_name: str) -> str:
+        return f"mock-{pass_name}"
+
+    def _answer(self, prompt: str, model: str) -> str:
+        return (
+            f"## Key Findings\n- **Mock analysis** from `{model}` for a {len(prompt)}-character prompt.\n\n"
+            "## Recommendations\n- **Implement** clearer primary actions.\n\n"
+            "## Summary\nThis response was generated by the mock provider."
+        )
+
+    async def _complete(self, prompt: str, model: str) -> str:
+        await asyncio.sleep(self.latency)
+        return self._answer(prompt, model)
+
+    async def _stream(self, prompt: str, model: str) -> AsyncIterator[str]:
+        # Spread the simulated latency over the tokens so time-to-first-token is measurable
+        tokens = self._answer(prompt, model).split(" ")
+        for i, token in enumerate(tokens):
+            await asyncio.sleep(self.latency / len(tokens))
+            yield token if i == 0 else f" {token}"
+
+
+def _build_provider(name: str) -> LLMProvider:
+    if name == "openai":
+        return OpenAICompatibleProvider(
+            "openai", "https://api.openai.com/v1/chat/completions", "OPENAI_API_KEY", "OPENAI_MODEL", "gpt-4o-mini"
+        )
+    if name == "mistral":
+        return OpenAICompatibleProvider(
+            "mistral", "https://api.mistral.ai/v1/chat/completions", "MISTRAL_API_KEY", "MISTRAL_MODEL", "mistral-small-latest"
+        )
+    if name == "deepseek":
+        return OpenAICompatibleProvider(
+            "deepseek", "https://api.deepseek.com/chat/completions", "DEEPSEEK_API_KEY", "DEEPSEEK_MODEL", "deepseek-chat"
+        )
+    if name == "openrouter":
+        # Default to a widely available free/credit model if possible
+        return OpenAICompatibleProvider(
+            "openrouter", "https://openrouter.ai/api/v1/chat/completions", "OPENROUTER_API_KEY", "OPENROUTER_MODEL",
+            "mistralai/mistral-7b-instruct"
+        )
+    if name == "ollama":
+        return OllamaProvider()
+    if name == "mock":
+        return MockProvider()
+    raise ProviderError(f"Unsupported LLM_PROVIDER: {name}")
+
+
+def get_provider(name: str) -> LLMProvider:
+    """Get or create the shared provider instance for `name`."""
+    name = name.lower()
+    if name not in _providers:
+        _providers[name] = _build_provider(name)
+    return _providers[name]
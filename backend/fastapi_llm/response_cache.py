@@ -0,0 +1,142 @@
+"""
+Semantic response cache for /query.
+
+An answer is reused when the new question's embedding is within a cosine
+distance of a cached question's embedding AND the canonical fingerprint of the
+request payload (vision, tracked_data, attachments plus the answer-shaping
+config) matches exactly. Entries live in SQLite under DATA_DIR so they survive
+restarts, expire after a TTL, and the least recently used entries are evicted
+beyond a size cap.
+
+Configuration (env):
+    LLM_RESPONSE_CACHE           enable the cache (default false)
+    LLM_CACHE_MAX_DISTANCE       max cosine distance for a hit (default 0.05)
+    LLM_CACHE_TTL_SECONDS        entry lifetime (default 86400)
+    LLM_CACHE_MAX_ENTRIES        entries kept before LRU eviction (default 5000)
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+
+def payload_fingerprint(payload: Dict[str, Any]) -> str:
+    """Order-insensitive (for object keys) SHA-256 of a JSON-serializable payload."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SemanticResponseCache:
+    def __init__(self, path: str, max_distance: float = 0.05, ttl_seconds: float = 86400, max_entries: int = 5000):
+        self.path = path
+        self.max_distance = max_distance
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fingerprint TEXT NOT NULL,
+                question TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_fingerprint ON responses (fingerprint)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)")
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional["SemanticResponseCache"]:
+        """Build the cache from env, or return None when disabled."""
+        if os.getenv("LLM_RESPONSE_CACHE", "false").lower() not in ("1", "true", "yes"):
+            return None
+        data_dir = os.getenv("DATA_DIR", "data")
+        return cls(
+            os.path.join(data_dir, "response_cache.sqlite3"),
+            max_distance=float(os.getenv("LLM_CACHE_MAX_DISTANCE", "0.05")),
+            ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400")),
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000")),
+        )
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(self, embedding, fingerprint: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Return (cached response, cosine distance) of the closest live entry, or None."""
+        query = self._normalize(embedding)
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, embedding, response FROM responses WHERE fingerprint = ? AND created_at >= ?",
+                (fingerprint, cutoff),
+            ).fetchall()
+            best = None
+            # Rows stored by an embedding model with another dimension can never match
+            rows = [row for row in rows if len(row[1]) == query.nbytes]
+            if rows:
+                matrix = np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+                distances = 1.0 - matrix @ query
+                i = int(np.argmin(distances))
+                if distances[i] <= self.max_distance:
+                    best = (rows[i][0], rows[i][2], float(distances[i]))
+            if best is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE id = ?", (time.time(), best[0]))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(best[1]), best[2]
+
+    def store(self, question: str, embedding, fingerprint: str, response: Dict[str, Any]):
+        now = time.time()
+        vector = self._normalize(embedding)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO responses (fingerprint, question, embedding, response, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (fingerprint, question, vector.tobytes(), json.dumps(response, ensure_ascii=False), now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._conn.execute(
+            "DELETE FROM responses WHERE id IN ("
+            "SELECT id FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "max_distance": self.max_distance,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries,
+        }
@@ -0,0 +1,314 @@
+"""
+Retriever backends for the heuristics RAG corpus.
+
+`ChromaRetriever` keeps the existing ChromaDB collection (good for large,
+frequently updated corpora). `NumpyRetriever` loads all embeddings as one
+contiguous, L2-normalized float32 matrix memory-mapped from disk and ranks by a
+single matrix-vector product, which avoids Chroma's SQLite/serialization
+overhead for small corpora like ours.
+
+NumPy index layout (one directory):
+    embeddings.npy    float32 [n_docs, dim], rows L2-normalized
+    documents.jsonl   one {"id", "document", "metadata"} object per row, same order
+
+The service exports the Chroma collection to DATA_DIR/heuristics_index on the
+first start with RETRIEVER_BACKEND=numpy; index_heuristics.py re-exports it
+whenever the collection changes.
+
+`HybridRetriever` wraps either backend with a BM25 inverted index over the
+heuristic texts, fuses the two rankings with reciprocal rank fusion (RRF) so
+exact terms ("undo", "error message", OCR'd labels) are not lost, and can
+re-rank the fused candidates with a small cross-encoder. It is opt-in
+(RETRIEVAL_MODE=hybrid); the default stays plain vector retrieval.
+"""
+import abc
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EMBEDDINGS_FILE = "embeddings.npy"
+DOCUMENTS_FILE = "documents.jsonl"
+
+
+class Retriever(abc.ABC):
+    """Top-k nearest heuristics for a query embedding."""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def query(self, embedding: Sequence[float], k: int) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Return (documents, metadatas) of the k closest entries, best first."""
+
+    @abc.abstractmethod
+    def query_ids(self, embedding: Sequence[float], k: int) -> List[str]:
+        """Ids of the k closest entries, best first."""
+
+    @abc.abstractmethod
+    def all_documents(self) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+        """(ids, documents, metadatas) of the whole corpus."""
+
+    def search(self, question: str, embedding: Sequence[float], k: int) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Retrieve for a question; plain vector backends only use the embedding."""
+        return self.query(embedding, k)
+
+    @abc.abstractmethod
+    def count(self) -> int:
+        """Number of documents in the corpus."""
+
+
+class ChromaRetriever(Retriever):
+    name = "chroma"
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def query(self, embedding: Sequence[float], k: int) -> Tuple[List[str], List[Dict[str, Any]]]:
+        results = self.collection.query(query_embeddings=[list(embedding)], n_results=k)
+        return results["documents"][0], results["metadatas"][0]
+
+    def query_ids(self, embedding: Sequence[float], k: int) -> List[str]:
+        results = self.collection.query(query_embeddings=[list(embedding)], n_results=k, include=["distances"])
+        return results["ids"][0]
+
+    def all_documents(self) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+        data = self.collection.get(include=["documents", "metadatas"])
+        return data["ids"], data["documents"], [m or {} for m in data["metadatas"]]
+
+    def count(self) -> int:
+        return self.collection.count()
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class NumpyRetriever(Retriever):
+    name = "numpy"
+
+    def __init__(self, index_dir: str, mmap: bool = True):
+        self.index_dir = index_dir
+        self.embeddings = np.load(os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode="r" if mmap else None)
+        self.ids, self.documents, self.metadatas = [], [], []
+        with open(os.path.join(index_dir, DOCUMENTS_FILE), "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    self.ids.append(row["id"])
+                    self.documents.append(row["document"])
+                    self.metadatas.append(row.get("metadata") or {})
+        if len(self.documents) != self.embeddings.shape[0]:
+            raise ValueError(
+                f"Index at {index_dir} is inconsistent: {self.embeddings.shape[0]} embeddings, {len(self.documents)} documents"
+            )
+
+    @staticmethod
+    def exists(index_dir: str) -> bool:
+        return os.path.exists(os.path.join(index_dir, EMBEDDINGS_FILE)) and os.path.exists(
+            os.path.join(index_dir, DOCUMENTS_FILE)
+        )
+
+    @staticmethod
+    def write_index(index_dir: str, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]], embeddings) -> None:
+        """Write an index atomically enough for readers: data files are replaced, not edited in place."""
+        os.makedirs(index_dir, exist_ok=True)
+        matrix = _normalize_rows(np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1))
+        tmp_embeddings = os.path.join(index_dir, f"{EMBEDDINGS_FILE}.tmp")
+        tmp_documents = os.path.join(index_dir, f"{DOCUMENTS_FILE}.tmp")
+        with open(tmp_embeddings, "wb") as f:
+            np.save(f, np.ascontiguousarray(matrix))
+        with open(tmp_documents, "w", encoding="utf-8") as f:
+            for doc_id, document, metadata in zip(ids, documents, metadatas):
+                f.write(json.dumps({"id": doc_id, "document": document, "metadata": metadata or {}}, ensure_ascii=False) + "\n")
+        os.replace(tmp_embeddings, os.path.join(index_dir, EMBEDDINGS_FILE))
+        os.replace(tmp_documents, os.path.join(index_dir, DOCUMENTS_FILE))
+
+    @classmethod
+    def from_chroma(cls, collection, index_dir: str) -> "NumpyRetriever":
+        """Export a Chroma collection (documents, metadatas, embeddings) to a NumPy index and load it."""
+        data = collection.get(include=["documents", "metadatas", "embeddings"])
+        cls.write_index(index_dir, data["ids"], data["documents"], data["metadatas"], data["embeddings"])
+        return cls(index_dir)
+
+    def _top_rows(self, embedding: Sequence[float], k: int) -> np.ndarray:
+        n_docs = self.embeddings.shape[0]
+        if n_docs == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64)
+        k = min(k, n_docs)
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        scores = self.embeddings @ query
+        # Partial sort: O(n) selection of the k best, then order just those
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+
+    def query(self, embedding: Sequence[float], k: int) -> Tuple[List[str], List[Dict[str, Any]]]:
+        top = self._top_rows(embedding, k)
+        return [self.documents[i] for i in top], [self.metadatas[i] for i in top]
+
+    def query_ids(self, embedding: Sequence[float], k: int) -> List[str]:
+        return [self.ids[i] for i in self._top_rows(embedding, k)]
+
+    def all_documents(self) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+        return self.ids, self.documents, self.metadatas
+
+    def count(self) -> int:
+        return len(self.documents)
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i in is it its of on or should so that the "
+    "their them this to use what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over an in-memory inverted index (term -> [(row, term frequency)])."""
+
+    def __init__(self, documents: Iterable[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.doc_lengths: List[int] = []
+        for row, document in enumerate(documents):
+            terms = tokenize(document)
+            self.doc_lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self.postings[term].append((row, tf))
+        n_docs = len(self.doc_lengths)
+        self.avg_length = (sum(self.doc_lengths) / n_docs) if n_docs else 0.0
+        self.idf = {
+            term: math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    def query(self, text: str, k: int) -> List[Tuple[int, float]]:
+        """(row, score) of the k best-matching documents, best first; rows without any query term are omitted."""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(text)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for row, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[row] / (self.avg_length or 1.0))
+                scores[row] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[Any]], rrf_k: int = 60) -> List[Tuple[Any, float]]:
+    """Fuse ranked lists: score(item) = sum over lists of 1 / (rrf_k + rank)."""
+    scores: Dict[Any, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] += 1.0 / (rrf_k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class CrossEncoderReranker:
+    """Scores (question, document) pairs jointly; slower than bi-encoder search, so only used on a short list."""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = model_name
+        self.model = CrossEncoder(model_name)
+
+    def rerank(self, question: str, documents: List[str]) -> List[int]:
+        """Positions of `documents` ordered best first."""
+        scores = self.model.predict([(question, document) for document in documents])
+        return [int(i) for i in np.argsort(-np.asarray(scores))]
+
+
+class HybridRetriever(Retriever):
+    """
+    Vector + BM25 retrieval fused with RRF over a snapshot of the corpus.
+
+    The snapshot (documents and BM25 index) is rebuilt when the vector
+    backend's document count changes or it returns an id the snapshot does not
+    know, so heuristics added by index_heuristics.py are picked up without a
+    restart. Documents edited in place under the same id keep their old BM25
+    text until the count changes or the service restarts.
+    """
+
+    name = "hybrid"
+
+    def __init__(self, vector: Retriever, candidate_k: int = 20, rrf_k: int = 60,
+                 reranker: Optional[CrossEncoderReranker] = None, rerank_top_n: int = 10):
+        self.vector = vector
+        self.candidate_k = candidate_k
+        self.rrf_k = rrf_k
+        self.reranker = reranker
+        self.rerank_top_n = rerank_top_n
+        self._snapshot = self._build_snapshot()
+        self.name = f"hybrid({vector.name}+bm25{'+rerank' if reranker else ''})"
+
+    def _build_snapshot(self) -> Tuple[List[str], List[str], List[Dict[str, Any]], Dict[str, int], BM25Index]:
+        ids, documents, metadatas = self.vector.all_documents()
+        return ids, documents, metadatas, {doc_id: row for row, doc_id in enumerate(ids)}, BM25Index(documents)
+
+    def refresh(self) -> None:
+        """Rebuild the document snapshot and BM25 index from the vector backend."""
+        # Swapped in as one tuple so concurrent searches see either the old or the new snapshot
+        self._snapshot = self._build_snapshot()
+
+    @property
+    def ids(self) -> List[str]:
+        return self._snapshot[0]
+
+    @property
+    def documents(self) -> List[str]:
+        return self._snapshot[1]
+
+    @property
+    def metadatas(self) -> List[Dict[str, Any]]:
+        return self._snapshot[2]
+
+    @property
+    def bm25(self) -> BM25Index:
+        return self._snapshot[4]
+
+    def search(self, question: str, embedding: Sequence[float], k: int) -> Tuple[List[str], List[Dict[str, Any]]]:
+        if self.vector.count() != len(self.ids):
+            self.refresh()
+        # Never ask for more candidates than the corpus holds (Chroma warns on every such query)
+        pool = min(max(self.candidate_k, k), len(self.ids))
+        vector_ids = self.vector.query_ids(embedding, pool) if pool > 0 else []
+        if any(doc_id not in self._snapshot[3] for doc_id in vector_ids):
+            self.refresh()
+        ids, documents, metadatas, rows, bm25 = self._snapshot
+        vector_rows = [rows[doc_id] for doc_id in vector_ids if doc_id in rows]
+        lexical_rows = [row for row, _ in bm25.query(question, pool)]
+        fused = [row for row, _ in reciprocal_rank_fusion([vector_rows, lexical_rows], self.rrf_k)]
+
+        if self.reranker is not None and fused:
+            shortlist = fused[:max(self.rerank_top_n, k)]
+            order = self.reranker.rerank(question, [documents[row] for row in shortlist])
+            fused = [shortlist[i] for i in order]
+
+        top = fused[:k]
+        return [documents[row] for row in top], [metadatas[row] for row in top]
+
+    def query(self, embedding: Sequence[float], k: int) -> Tuple[List[str], List[Dict[str, Any]]]:
+        return self.vector.query(embedding, k)
+
+    def query_ids(self, embedding: Sequence[float], k: int) -> List[str]:
+        return self.vector.query_ids(embedding, k)
+
+    def all_documents(self) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+        return self.ids, self.documents, self.metadatas
+
+    def count(self) -> int:
+        return len(self.ids)
@@ -0,0 +1,53 @@
+import asyncio
+
+import numpy as np
+
+from embeddings import EmbeddingService, cache_key, normalize_question, path_identity
+
+
+def test_path_identity_changes_with_directory_contents(tmp_path):
+    (tmp_path / "config.json").write_text("{}")
+    before = path_identity(str(tmp_path))
+    assert path_identity(str(tmp_path)) == before
+
+    (tmp_path / "model.safetensors").write_bytes(b"weights")
+    assert path_identity(str(tmp_path)) != before
+
+
+def test_path_identity_differs_between_model_directories(tmp_path):
+    for name in ("a", "b"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "config.json").write_text("{}")
+    assert path_identity(str(tmp_path / "a")) != path_identity(str(tmp_path / "b"))
+
+
+def test_normalize_question():
+    assert normalize_question("  How   do I\nUndo? ") == "How do I Undo?"
+    assert cache_key("  How   do I\nUndo? ") == "how do i undo?"
+
+
+class RecordingBackend:
+    name = "recording"
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.extend(texts)
+        return np.ones((len(texts), 2), dtype=np.float32)
+
+
+def test_embed_encodes_original_casing_and_caches_case_insensitively():
+    backend = RecordingBackend()
+    service = EmbeddingService(backend, batch_window_ms=0)
+
+    async def run():
+        try:
+            await service.embed("How do I  Undo?")
+            await service.embed("how do i undo?")
+        finally:
+            await service.stop()
+
+    asyncio.run(run())
+    assert backend.encoded == ["How do I Undo?"]
+    assert service.hits == 1
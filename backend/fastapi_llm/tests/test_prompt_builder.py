@@ -0,0 +1,17 @@
+from prompt_builder import summarize_screen
+
+
+def test_detections_with_missing_or_non_numeric_confidence_are_ranked_last():
+    vision_result = {
+        "imageName": "home.png",
+        "classification": {"label": "Home", "confidence": "high"},
+        "detections": [
+            {"class": "Button", "confidence": None},
+            {"class": "Input", "confidence": "0.7"},
+            {"class": "Text", "confidence": "n/a"},
+            {"class": "Icon", "confidence": 0.9},
+        ],
+    }
+    summary = summarize_screen(0, vision_result, top_detections=2, ocr_texts=0)
+    assert "Home (confidence: 0.00)" in summary
+    assert "Most confident: Icon (0.90), Input (0.70)" in summary
@@ -0,0 +1,29 @@
+from response_cache import SemanticResponseCache, payload_fingerprint
+
+
+def test_hit_needs_close_question_and_same_payload(tmp_path):
+    cache = SemanticResponseCache(str(tmp_path / "cache.sqlite3"), max_distance=0.05)
+    fingerprint = payload_fingerprint({"vision": {"a": 1, "b": 2}})
+    cache.store("how to undo", [1.0, 0.0], fingerprint, {"answer": "Add undo"})
+
+    response, distance = cache.lookup([0.999, 0.01], payload_fingerprint({"vision": {"b": 2, "a": 1}}))
+    assert response == {"answer": "Add undo"} and distance < 0.05
+    assert cache.lookup([0.0, 1.0], fingerprint) is None
+    assert cache.lookup([1.0, 0.0], payload_fingerprint({"vision": {"a": 2}})) is None
+    assert cache.stats()["entries"] == 1
+
+
+def test_entries_beyond_the_cap_are_evicted(tmp_path):
+    cache = SemanticResponseCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    for k in range(4):
+        cache.store(f"q{k}", [1.0, float(k)], "f", {"answer": k})
+    assert cache.stats()["entries"] == 2
+
+
+def test_rows_of_another_embedding_dimension_are_skipped(tmp_path):
+    cache = SemanticResponseCache(str(tmp_path / "cache.sqlite3"))
+    cache.store("how to undo", [1.0, 0.0, 0.0], "f", {"answer": "old model"})
+    assert cache.lookup([1.0, 0.0], "f") is None
+
+    cache.store("how to undo", [1.0, 0.0], "f", {"answer": "new model"})
+    assert cache.lookup([1.0, 0.0], "f")[0] == {"answer": "new model"}
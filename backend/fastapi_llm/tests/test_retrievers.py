@@ -0,0 +1,56 @@
+import numpy as np
+
+from retrievers import HybridRetriever, Retriever
+
+
+class ListRetriever(Retriever):
+    """In-memory vector backend that can grow, like a Chroma collection being re-indexed"""
+
+    name = "list"
+
+    def __init__(self):
+        self.ids, self.documents, self.metadatas, self.vectors = [], [], [], []
+        self.requested_k = []
+
+    def add(self, doc_id, document, vector):
+        self.ids.append(doc_id)
+        self.documents.append(document)
+        self.metadatas.append({"id": doc_id})
+        self.vectors.append(np.asarray(vector, dtype=np.float32))
+
+    def query(self, embedding, k):
+        positions = [self.ids.index(doc_id) for doc_id in self.query_ids(embedding, k)]
+        return [self.documents[i] for i in positions], [self.metadatas[i] for i in positions]
+
+    def query_ids(self, embedding, k):
+        self.requested_k.append(k)
+        scores = np.stack(self.vectors) @ np.asarray(embedding, dtype=np.float32)
+        return [self.ids[i] for i in np.argsort(-scores)[:k]]
+
+    def all_documents(self):
+        return list(self.ids), list(self.documents), list(self.metadatas)
+
+    def count(self):
+        return len(self.ids)
+
+
+def test_hybrid_sees_documents_added_after_startup():
+    vector = ListRetriever()
+    vector.add("h1", "Show visible system status", [1, 0])
+    hybrid = HybridRetriever(vector)
+    vector.add("h2", "Provide undo and redo", [0, 1])
+
+    documents, metadatas = hybrid.search("how to undo", [0, 1], 1)
+    assert documents == ["Provide undo and redo"]
+    assert metadatas == [{"id": "h2"}]
+    assert hybrid.count() == 2
+
+
+def test_hybrid_clamps_candidates_to_corpus_size():
+    vector = ListRetriever()
+    vector.add("h1", "Show visible system status", [1, 0])
+    vector.add("h2", "Provide undo and redo", [0, 1])
+    hybrid = HybridRetriever(vector, candidate_k=20)
+
+    hybrid.search("status", [1, 0], 3)
+    assert vector.requested_k == [2]
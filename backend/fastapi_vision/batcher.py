@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Dynamic Micro-Batching for Vision Models
+Queues single-image requests and flushes them to a model as one batch when
+either the batch size limit or the latency limit is reached
+"""
+
+import asyncio
+import bisect
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        """Initialize a cumulative histogram with the given upper bucket bounds"""
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """Record a single observation"""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Export bucket counts (cumulative, Prometheus-style), count, sum and mean"""
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + [float("inf")], self.counts):
+            cumulative += count
+            buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+        return {
+            "buckets": buckets,
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0
+        }
+
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64]
+LATENCY_MS_BUCKETS = [1, 2, 5, 10, 15, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+class MicroBatcher:
+    def __init__(self,
+                 name: str,
+                 batch_fn: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = 8,
+                 max_latency_ms: float = 15.0,
+                 executor=None):
+        """
+        Initialize the micro-batcher
+
+        Args:
+            name: Name used in logs and metrics
+            batch_fn: Synchronous function mapping a list of inputs to a list of outputs (same order)
+            max_batch_size: Flush as soon as this many items are queued
+            max_latency_ms: Flush when the oldest queued item has waited this long
+            executor: Executor the batch function runs on (None = loop default)
+        """
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_latency = max(0.0, max_latency_ms) / 1000.0
+        self.executor = executor
+        self.logger = logging.getLogger(__name__)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        self.batch_size_histogram = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_histogram = Histogram(LATENCY_MS_BUCKETS)
+        self.inference_histogram = Histogram(LATENCY_MS_BUCKETS)
+        self.end_to_end_histogram = Histogram(LATENCY_MS_BUCKETS)
+
+    def start(self):
+        """Start the background flush loop on the running event loop"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Cancel the background flush loop"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its slice of the batched result"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future, time.perf_counter()))
+        return await future
+
+    async def _collect_batch(self) -> List[tuple]:
+        """Block for the first item, then gather more until the size or latency limit is hit"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_latency
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect_batch()
+            # Drop callers that went away while queued
+            batch = [entry for entry in batch if not entry[1].done()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            for _, _, enqueued in batch:
+                self.queue_wait_histogram.observe((started - enqueued) * 1000)
+            self.batch_size_histogram.observe(len(batch))
+
+            try:
+                outputs = await loop.run_in_executor(self.executor, self.batch_fn, [item for item, _, _ in batch])
+                if len(outputs) != len(batch):
+                    raise RuntimeError(f"{self.name} batch function returned {len(outputs)} results for {len(batch)} inputs")
+            except Exception as e:
+                self.logger.warning(f"{self.name} batch of {len(batch)} failed: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            finished = time.perf_counter()
+            self.inference_histogram.observe((finished - started) * 1000)
+            for (_, future, enqueued), output in zip(batch, outputs):
+                self.end_to_end_histogram.observe((finished - enqueued) * 1000)
+                if not future.done():
+                    future.set_result(output)
+
+    def stats(self) -> Dict[str, Any]:
+        """Export configuration and histograms for tuning"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_latency_ms": self.max_latency * 1000,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batch_size": self.batch_size_histogram.to_dict(),
+            "queue_wait_ms": self.queue_wait_histogram.to_dict(),
+            "inference_ms": self.inference_histogram.to_dict(),
+            "end_to_end_ms": self.end_to_end_histogram.to_dict()
+        }
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Columnar Consolidation Benchmark
+Compares consolidate_vision_data in the dict-based and compact (columnar)
+modes: build time, retained memory and serialized JSON size
+
+Usage:
+    python benchmarks/benchmark_columnar.py [--detections 100000] [--images 200]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from consolidator import DataConsolidator  # noqa: E402
+
+CLASSES = ["Button", "IconButton", "TextField", "Input", "Link", "Text", "Image", "Checkbox", "Heading"]
+
+
+def synthetic_vision_results(n_detections, n_images, seed=0):
+    rng = random.Random(seed)
+    results = []
+    for image in range(n_images):
+        detections = []
+        for _ in range(n_detections // n_images):
+            x1, y1 = rng.uniform(0, 1100), rng.uniform(0, 2300)
+            detections.append({
+                "class": rng.choice(CLASSES),
+                "confidence": rng.random(),
+                "bbox": [x1, y1, x1 + rng.uniform(20, 200), y1 + rng.uniform(10, 80)],
+            })
+        results.append({
+            "imageName": f"screen_{image}.png",
+            "imageIndex": image,
+            "classification": {"label": rng.choice(["login", "checkout", "dashboard"]), "confidence": rng.random()},
+            "detections": detections,
+        })
+    return results
+
+
+def measure(build):
+    """(result, seconds, bytes retained by the result)"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--detections", type=int, default=100000)
+    parser.add_argument("--images", type=int, default=200)
+    args = parser.parse_args()
+
+    vision_results = synthetic_vision_results(args.detections, args.images)
+    consolidator = DataConsolidator()
+    print(f"{args.detections} detections over {args.images} images")
+
+    legacy, legacy_seconds, legacy_bytes = measure(lambda: consolidator.consolidate_vision_data(vision_results))
+    compact, compact_seconds, compact_bytes = measure(
+        lambda: consolidator.consolidate_vision_data(vision_results, compact=True)
+    )
+    legacy_json = len(json.dumps(legacy))
+    compact_json = len(json.dumps({**compact, "detections": compact["detections"].to_dict()}))
+
+    print(f"dict-based: {legacy_seconds * 1000:.0f} ms, {legacy_bytes / 1e6:.1f} MB retained, {legacy_json / 1e6:.1f} MB JSON")
+    print(f"compact:    {compact_seconds * 1000:.0f} ms, {compact_bytes / 1e6:.1f} MB retained, {compact_json / 1e6:.1f} MB JSON")
+
+    started = time.perf_counter()
+    expanded = consolidator.expand_vision_data(compact)
+    print(f"expand_vision_data: {(time.perf_counter() - started) * 1000:.0f} ms")
+    assert len(expanded["all_detections"]) == len(legacy["all_detections"])
+    assert list(expanded["detections_by_type"]) == list(legacy["detections_by_type"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Incremental Consolidation Benchmark
+Streams a long tracking session through IncrementalConsolidator in chunks and
+reports throughput, peak memory and snapshot latency
+
+Usage:
+    python benchmarks/benchmark_incremental.py [--events 1000000] [--chunk-size 10000] [--images 50]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from benchmark_matching import CLASSES, jitter, random_box  # noqa: E402
+from incremental import IncrementalConsolidator  # noqa: E402
+
+
+def synthetic_images(n_images, detections_per_image, rng):
+    return [
+        {
+            "imageName": f"screen_{image}.png",
+            "classification": {"label": rng.choice(["login", "checkout", "dashboard"]), "confidence": rng.random()},
+            "detections": [
+                {"class": rng.choice(CLASSES), "bbox": random_box(rng), "confidence": rng.random()}
+                for _ in range(detections_per_image)
+            ],
+        }
+        for image in range(n_images)
+    ]
+
+
+def event_stream(n_events, images, rng):
+    """Interaction events generated lazily (70% on a detected element)"""
+    for i in range(n_events):
+        image = rng.choice(images)
+        if rng.random() < 0.7:
+            detection = rng.choice(image["detections"])
+            box, element = jitter(detection["bbox"], rng), detection["class"]
+        else:
+            box, element = random_box(rng), rng.choice(CLASSES)
+        yield {"interactionType": "click", "elementType": element, "bbox": box,
+               "imageName": image["imageName"], "interactionCount": 1, "timestamp": i}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--images", type=int, default=50)
+    parser.add_argument("--detections-per-image", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    images = synthetic_images(args.images, args.detections_per_image, rng)
+    consolidator = IncrementalConsolidator()
+    consolidator.add_vision_results(images)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    chunk = []
+    for event in event_stream(args.events, images, rng):
+        chunk.append(event)
+        if len(chunk) == args.chunk_size:
+            consolidator.add_interactions(chunk, session_id="session_0")
+            chunk = []
+    consolidator.add_interactions(chunk, session_id="session_0")
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    snapshot = consolidator.snapshot()
+    snapshot_seconds = time.perf_counter() - started
+
+    statistics = snapshot["element_interaction_mapping"]["mapping_statistics"]
+    print(f"{args.events} events, {args.images} images × {args.detections_per_image} detections")
+    print(f"ingest: {args.events / elapsed:,.0f} events/s ({elapsed:.1f} s), peak traced memory {peak / 1e6:.1f} MB")
+    print(f"snapshot: {snapshot_seconds * 1000:.0f} ms, {statistics['total_matches']} matches, "
+          f"top elements {snapshot['analysis_summary']['most_interactive_elements'][:3]}")
+
+
+if __name__ == "__main__":
+    main()
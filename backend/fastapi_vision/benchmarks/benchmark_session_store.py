@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Session Store Benchmark
+Stores synthetic sessions both as whole JSON documents and in the partitioned
+Parquet session store, then times the dashboard-style reads: one session's
+interaction counts, and one column across every session
+
+Usage:
+    python benchmarks/benchmark_session_store.py [--sessions 50] [--events 20000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from benchmark_tracking_ingest import synthetic_events  # noqa: E402
+from session_store import SessionStore  # noqa: E402
+from tracking_ingest import TrackingBatchBuilder  # noqa: E402
+
+
+def timed(run):
+    started = time.perf_counter()
+    result = run()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--events", type=int, default=20000, help="events per session")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = SessionStore(os.path.join(directory, "store"))
+        json_paths = []
+        events = list(synthetic_events(args.events))
+        for session in range(args.sessions):
+            session_id = f"session_{session}"
+            path = os.path.join(directory, f"analysis_{session_id}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"analysis_id": session_id, "tracked_data": [events]}, f)
+            json_paths.append(path)
+            builder = TrackingBatchBuilder()
+            for event in events:
+                builder.add(event)
+            store.write_interactions(session_id, builder.build())
+        print(f"{args.sessions} sessions × {args.events} events")
+
+        def json_one_session():
+            with open(json_paths[0], "r", encoding="utf-8") as f:
+                return sum(int(e["interactionCount"]) for e in json.load(f)["tracked_data"][0])
+
+        def store_one_session():
+            table = store.read("interactions", columns=["interaction_count"], sessions=["session_0"])
+            return sum(table.column("interaction_count").to_pylist())
+
+        def json_all_sessions():
+            total = 0
+            for path in json_paths:
+                with open(path, "r", encoding="utf-8") as f:
+                    total += sum(1 for e in json.load(f)["tracked_data"][0] if e["interactionType"] == "click")
+            return total
+
+        def store_all_sessions():
+            table = store.read("interactions", columns=["interaction_type"])
+            return table.column("interaction_type").to_pylist().count("click")
+
+        for label, json_run, store_run in (("one session, interaction counts", json_one_session, store_one_session),
+                                           ("all sessions, interaction types", json_all_sessions, store_all_sessions)):
+            expected, json_seconds = timed(json_run)
+            actual, store_seconds = timed(store_run)
+            assert expected == actual
+            print(f"{label}: JSON {json_seconds * 1000:.0f} ms, session store {store_seconds * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Tracking Ingestion Throughput Benchmark
+Writes a large synthetic session modelled on datasets/universal_tracking_data.json
+as a JSON array and as NDJSON, then measures events per second for streaming
+ingestion (tracking_ingest.ingest) against json.load of the whole file
+
+Usage:
+    python benchmarks/benchmark_tracking_ingest.py [--events 500000] [--batch-size 50000]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from tracking_ingest import ingest  # noqa: E402
+
+SAMPLE_FILE = os.path.join(os.path.dirname(__file__), "..", "..", "..", "datasets", "universal_tracking_data.json")
+
+
+def synthetic_events(n_events, seed=0):
+    """Events cloned from the sample file with varied sessions, timestamps and counts"""
+    with open(SAMPLE_FILE, "r", encoding="utf-8") as f:
+        templates = json.load(f)
+    rng = random.Random(seed)
+    for i in range(n_events):
+        event = dict(rng.choice(templates))
+        event["sessionId"] = i // 500
+        event["timestamp"] = f"2025-01-{15 + (i // 100000) % 14:02d}T{(i // 3600) % 24:02d}:{(i // 60) % 60:02d}:{i % 60:02d}.{i % 1000:03d}Z"
+        event["interactionCount"] = str(rng.randint(0, 9))
+        yield event
+
+
+def write_files(n_events, directory):
+    array_path, ndjson_path = os.path.join(directory, "events.json"), os.path.join(directory, "events.ndjson")
+    with open(array_path, "w", encoding="utf-8") as array_file, open(ndjson_path, "w", encoding="utf-8") as ndjson_file:
+        array_file.write("[\n")
+        for i, event in enumerate(synthetic_events(n_events)):
+            line = json.dumps(event)
+            array_file.write((",\n" if i else "") + line)
+            ndjson_file.write(line + "\n")
+        array_file.write("\n]\n")
+    return array_path, ndjson_path
+
+
+def measure(run):
+    tracemalloc.start()
+    started = time.perf_counter()
+    events = run()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return events, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=500000)
+    parser.add_argument("--batch-size", type=int, default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        array_path, ndjson_path = write_files(args.events, directory)
+        size_mb = os.path.getsize(array_path) / 1e6
+        print(f"{args.events} events, {size_mb:.0f} MB JSON array")
+
+        def load_whole_file():
+            with open(array_path, "r", encoding="utf-8") as f:
+                return len(json.load(f))
+
+        def ingest_file(path):
+            def run():
+                return sum(len(batch) for batch in ingest(path, batch_size=args.batch_size))
+            return run
+
+        for label, run in (("json.load (whole file)", load_whole_file),
+                           ("ingest JSON array", ingest_file(array_path)),
+                           ("ingest NDJSON", ingest_file(ndjson_path))):
+            events, elapsed, peak = measure(run)
+            assert events == args.events
+            print(f"{label:24s} {events / elapsed:>10,.0f} events/s  peak traced memory {peak / 1e6:6.1f} MB")
+
+        # Untraced throughput (tracemalloc slows allocation-heavy code)
+        started = time.perf_counter()
+        batches = list(ingest(array_path, batch_size=args.batch_size))
+        elapsed = time.perf_counter() - started
+        print(f"ingest JSON array, untraced: {args.events / elapsed:,.0f} events/s, "
+              f"{sum(batch.nbytes() for batch in batches) / 1e6:.1f} MB of columns, "
+              f"{len(batches[0].strings)} interned strings")
+
+
+if __name__ == "__main__":
+    main()
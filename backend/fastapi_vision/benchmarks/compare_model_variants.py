@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Accuracy vs Latency Comparison of TorchScript Variants
+Runs every exported variant of the detector and classifier over a held-out
+screenshot set and reports latency alongside agreement with the fp32 model
+(and accuracy against ground-truth labels when provided)
+
+Usage:
+    python benchmarks/compare_model_variants.py --images held_out/ [--labels labels.json]
+
+labels.json maps screenshot file names to Enrico screen labels and is only used
+for classifier accuracy; detector quality is measured against the fp32 outputs.
+"""
+
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+
+import torch
+from PIL import Image
+from torch.nn import functional as F
+from torchvision import transforms
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from model_variants import MODEL_VARIANTS, VARIANTS, variant_path, prepare_input  # noqa: E402
+
+BASE_DIR = os.path.join(os.path.dirname(__file__), "..")
+CHECKPOINT_DIR = os.path.join(BASE_DIR, "webui-main", "downloads", "checkpoints")
+DETECTION_CHECKPOINT = os.path.join(CHECKPOINT_DIR, "screenrecognition-web7k.torchscript")
+CLASSIFICATION_CHECKPOINT = os.path.join(CHECKPOINT_DIR, "screenclassification-resnet-noisystudent+web350k.torchscript")
+CLASSIFICATION_CLASS_MAP = os.path.join(BASE_DIR, "webui-main", "metadata", "screenclassification", "class_map_enrico.json")
+
+CONF_THRESH = 0.5
+IOU_THRESH = 0.5
+
+classification_transforms = transforms.Compose([
+    transforms.Resize(128),
+    transforms.ToTensor(),
+    transforms.Normalize((0.5, 0.5, 0.5), (0.5, 0.5, 0.5))
+])
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    out = fn(*args)
+    return out, (time.perf_counter() - started) * 1000
+
+
+def box_iou(a, b):
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    inter = width * height
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def detection_f1(reference, candidate):
+    """Greedy same-label matching at IOU_THRESH; returns F1 of candidate vs reference"""
+    if not reference and not candidate:
+        return 1.0
+    unmatched = list(reference)
+    true_positives = 0
+    for label, box in candidate:
+        best = max(
+            ((i, box_iou(box, ref_box)) for i, (ref_label, ref_box) in enumerate(unmatched) if ref_label == label),
+            key=lambda item: item[1], default=(None, 0.0)
+        )
+        if best[0] is not None and best[1] >= IOU_THRESH:
+            unmatched.pop(best[0])
+            true_positives += 1
+    precision = true_positives / len(candidate) if candidate else 0.0
+    recall = true_positives / len(reference) if reference else 0.0
+    return 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+
+def run_detector(model, image):
+    with torch.inference_mode():
+        pred = model([transforms.ToTensor()(image)])[1][0]
+    keep = pred["scores"] > CONF_THRESH
+    return [(int(label), box.tolist()) for label, box in zip(pred["labels"][keep], pred["boxes"][keep])]
+
+
+def run_classifier(model, image, variant):
+    with torch.inference_mode():
+        pred = model(prepare_input(classification_transforms(image).unsqueeze(0), variant))
+    return int(pred.argmax(dim=-1)), float(F.softmax(pred, dim=-1).max())
+
+
+def available_variants(name, base_path, requested):
+    """Requested variants this model supports and has been exported as (a stale unsupported file is skipped)"""
+    return [v for v in requested if v in MODEL_VARIANTS[name] and os.path.exists(variant_path(base_path, v))]
+
+
+def compare(name, base_path, variants, images, run, score):
+    print(f"\n== {name} ==")
+    reference = None
+    rows = []
+    for variant in available_variants(name, base_path, variants):
+        model = torch.jit.load(variant_path(base_path, variant)).eval()
+        run(model, images[0][1], variant)  # warm-up
+        run(model, images[0][1], variant)
+        outputs, latencies = [], []
+        for _, image in images:
+            out, ms = timed(run, model, image, variant)
+            outputs.append(out)
+            latencies.append(ms)
+        if reference is None:
+            reference = outputs  # fp32 (first available) is the reference
+        rows.append((variant, statistics.mean(latencies), percentile(latencies, 0.5), percentile(latencies, 0.95), score(reference, outputs)))
+
+    print(f"{'variant':<15}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}  quality")
+    for variant, mean, p50, p95, quality in rows:
+        print(f"{variant:<15}{mean:>10.1f}{p50:>10.1f}{p95:>10.1f}  {quality}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="directory of held-out screenshots")
+    parser.add_argument("--labels", help="JSON mapping file name -> screen label (classifier accuracy)")
+    parser.add_argument("--variants", default=",".join(VARIANTS))
+    parser.add_argument("--model", choices=["detection", "classification", "both"], default="both")
+    parser.add_argument("--limit", type=int, default=200)
+    args = parser.parse_args()
+
+    torch.set_num_threads(int(os.getenv("VISION_TORCH_THREADS", str(os.cpu_count() or 1))))
+    variants = ["fp32"] + [v for v in args.variants.split(",") if v and v != "fp32"]
+    paths = sorted(glob.glob(os.path.join(args.images, "*.png")) + glob.glob(os.path.join(args.images, "*.jpg")))[:args.limit]
+    if not paths:
+        sys.exit(f"No images found in {args.images}")
+    images = [(os.path.basename(path), Image.open(path).convert("RGB")) for path in paths]
+    print(f"Held-out set: {len(images)} images, torch threads: {torch.get_num_threads()}")
+
+    if args.model in ("detection", "both"):
+        compare(
+            "detection", DETECTION_CHECKPOINT, variants, images,
+            lambda model, image, variant: run_detector(model, image),
+            lambda ref, out: f"F1 vs fp32 = {statistics.mean(detection_f1(r, o) for r, o in zip(ref, out)):.3f}"
+        )
+
+    if args.model in ("classification", "both"):
+        labels = {}
+        if args.labels:
+            with open(CLASSIFICATION_CLASS_MAP, "r") as f:
+                label2idx = {label: int(idx) for idx, label in json.load(f)["idx2Label"].items()}
+            with open(args.labels, "r") as f:
+                labels = {name: label2idx[label] for name, label in json.load(f).items() if label in label2idx}
+
+        def classification_score(ref, out):
+            agreement = statistics.mean(r[0] == o[0] for r, o in zip(ref, out))
+            summary = f"top-1 agreement vs fp32 = {agreement:.3f}"
+            labelled = [(name, o[0]) for (name, _), o in zip(images, out) if name in labels]
+            if labelled:
+                accuracy = statistics.mean(labels[name] == pred for name, pred in labelled)
+                summary += f", accuracy = {accuracy:.3f} (n={len(labelled)})"
+            return summary
+
+        compare("classification", CLASSIFICATION_CHECKPOINT, variants, images, run_classifier, classification_score)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Columnar Detection Store
+Array-backed representation of consolidated detections: one column per field
+(class ids, confidences, an (N, 4) float32 bbox array, image ids) and the
+type / image / category groupings as index arrays. The legacy list-of-dicts
+view is materialized only on request.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+NUMBER_TYPES = (int, float, np.integer, np.floating)
+
+ELEMENT_CATEGORIES = ('buttons', 'inputs', 'links', 'headings', 'other')
+
+# Fields stored as columns; anything else on a detection is kept in a sparse per-row dict
+COLUMN_FIELDS = ('class', 'confidence', 'bbox', 'original_class', 'extracted_text', 'has_text',
+                 'image_name', 'image_index')
+
+
+def element_category(element_class: str) -> str:
+    """Enhanced element category ('buttons', 'inputs', ...) of a detection class"""
+    element_class = element_class.lower()
+    if 'button' in element_class:
+        return 'buttons'
+    if any(word in element_class for word in ['input', 'textbox', 'field']):
+        return 'inputs'
+    if 'link' in element_class:
+        return 'links'
+    if 'heading' in element_class:
+        return 'headings'
+    return 'other'
+
+
+def _group_indices(keys: np.ndarray, n_groups: int) -> List[np.ndarray]:
+    """Row indices for each key 0..n_groups-1 (rows stay in order within a group)"""
+    if n_groups == 0:
+        return []
+    order = np.argsort(keys, kind='stable')
+    counts = np.bincount(keys, minlength=n_groups)
+    return np.split(order, np.cumsum(counts)[:-1])
+
+
+def _valid_bbox(bbox: Any) -> bool:
+    if not isinstance(bbox, (list, tuple)) or len(bbox) != 4:
+        return False
+    x1, y1, x2, y2 = bbox
+    return isinstance(x1, NUMBER_TYPES) and isinstance(y1, NUMBER_TYPES) and \
+        isinstance(x2, NUMBER_TYPES) and isinstance(y2, NUMBER_TYPES)
+
+
+class ColumnarDetections:
+    def __init__(self, classes: List[Optional[str]], class_ids: np.ndarray, confidences: np.ndarray,
+                 bboxes: np.ndarray, images: List[Tuple[str, Any]], image_ids: np.ndarray,
+                 original_class_ids: Optional[np.ndarray] = None, texts: Optional[np.ndarray] = None,
+                 has_text: Optional[np.ndarray] = None, extras: Optional[Dict[int, Dict[str, Any]]] = None):
+        """
+        Initialize from columns (use ColumnarDetectionsBuilder to build from detections)
+
+        Args:
+            classes: Class vocabulary; None stands for a detection without a 'class'
+            class_ids: (N,) int32 index into classes
+            confidences: (N,) float32, NaN when missing
+            bboxes: (N, 4) float32 [x1, y1, x2, y2], NaN rows when missing or malformed
+            images: (image name, image index) of every image that reported detections
+            image_ids: (N,) int32 index into images
+            original_class_ids: (N,) int32 index into classes of the pre-OCR class, -1 when absent
+            texts: (N,) object array of OCR text, None when absent
+            has_text: (N,) int8 OCR has_text flag, -1 when absent
+            extras: Other detection fields by row, only for the rows that have any
+        """
+        n = len(class_ids)
+        self.classes = classes
+        self.class_ids = class_ids
+        self.confidences = confidences
+        self.bboxes = bboxes
+        self.images = images
+        self.image_ids = image_ids
+        self.original_class_ids = original_class_ids if original_class_ids is not None else np.full(n, -1, np.int32)
+        self.texts = texts if texts is not None else np.full(n, None, dtype=object)
+        self.has_text = has_text if has_text is not None else np.full(n, -1, np.int8)
+        self.extras = extras or {}
+        self._build_groups()
+
+    def __len__(self) -> int:
+        return len(self.class_ids)
+
+    def _build_groups(self):
+        """Type / image / category groupings as index arrays, in the legacy key order"""
+        type_names = [name if name is not None else 'Unknown' for name in self.classes]
+        type_vocabulary: Dict[str, int] = {}
+        class_to_type = np.array([type_vocabulary.setdefault(name, len(type_vocabulary)) for name in type_names],
+                                 dtype=np.int32)
+        type_rows = _group_indices(class_to_type[self.class_ids], len(type_vocabulary))
+        # Types keyed by first appearance, like the dict-based consolidation
+        self.by_type = dict(sorted(
+            ((name, type_rows[k]) for k, name in enumerate(type_vocabulary) if len(type_rows[k])),
+            key=lambda item: item[1][0]
+        ))
+
+        image_rows = _group_indices(self.image_ids, len(self.images))
+        # A repeated image name keeps the later image's detections, as before
+        self.by_image = {name: image_rows[k] for k, (name, _) in enumerate(self.images)}
+
+        class_to_category = np.array(
+            [ELEMENT_CATEGORIES.index(element_category(name or '')) for name in self.classes], dtype=np.int32
+        )
+        category_rows = _group_indices(class_to_category[self.class_ids], len(ELEMENT_CATEGORIES))
+        self.by_category = dict(zip(ELEMENT_CATEGORIES, category_rows))
+
+    @property
+    def class_names(self) -> List[str]:
+        """Per-row class name ('' when missing), e.g. for class compatibility checks"""
+        vocabulary = [name or '' for name in self.classes]
+        return [vocabulary[k] for k in self.class_ids.tolist()]
+
+    @property
+    def bbox_valid(self) -> np.ndarray:
+        return ~np.isnan(self.bboxes).any(axis=1)
+
+    def detection(self, row: int) -> Dict[str, Any]:
+        """Materialize one detection as the legacy dict"""
+        detection = {}
+        class_name = self.classes[self.class_ids[row]]
+        if class_name is not None:
+            detection['class'] = class_name
+        if not np.isnan(self.confidences[row]):
+            detection['confidence'] = float(self.confidences[row])
+        if not np.isnan(self.bboxes[row, 0]):
+            detection['bbox'] = self.bboxes[row].astype(np.float64).tolist()
+        if self.original_class_ids[row] >= 0:
+            detection['original_class'] = self.classes[self.original_class_ids[row]]
+        if self.texts[row] is not None:
+            detection['extracted_text'] = self.texts[row]
+        if self.has_text[row] >= 0:
+            detection['has_text'] = bool(self.has_text[row])
+        detection.update(self.extras.get(row, {}))
+        image_name, image_index = self.images[self.image_ids[row]]
+        detection['image_name'] = image_name
+        detection['image_index'] = image_index
+        return detection
+
+    def legacy_view(self) -> Dict[str, Any]:
+        """
+        Materialize the dict-based collections of consolidate_vision_data
+
+        Returns:
+            'all_detections', 'detections_by_type', 'detections_by_image' and
+            'enhanced_elements', sharing one dict per detection
+        """
+        all_detections = [self.detection(row) for row in range(len(self))]
+
+        def pick(rows: np.ndarray) -> List[Dict[str, Any]]:
+            return [all_detections[row] for row in rows.tolist()]
+
+        return {
+            'all_detections': all_detections,
+            'detections_by_type': {name: pick(rows) for name, rows in self.by_type.items()},
+            'detections_by_image': {name: pick(rows) for name, rows in self.by_image.items()},
+            'enhanced_elements': {category: pick(rows) for category, rows in self.by_category.items()},
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        JSON-serializable columns (groupings are rebuilt by from_dict)
+
+        Coordinates are rounded to 0.01 px and confidences to 4 decimals.
+        """
+        return {
+            'images': [list(image) for image in self.images],
+            'classes': self.classes,
+            'class_ids': self.class_ids.tolist(),
+            'confidences': [None if np.isnan(c) else c for c in np.round(self.confidences.astype(np.float64), 4).tolist()],
+            'bboxes': [None if np.isnan(box[0]) else box
+                       for box in np.round(self.bboxes.astype(np.float64), 2).tolist()],
+            'image_ids': self.image_ids.tolist(),
+            'original_class_ids': self.original_class_ids.tolist(),
+            'texts': self.texts.tolist(),
+            'has_text': self.has_text.tolist(),
+            'extras': {str(row): fields for row, fields in self.extras.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ColumnarDetections':
+        """Inverse of to_dict"""
+        n = len(data['class_ids'])
+        bboxes = np.full((n, 4), np.nan, dtype=np.float32)
+        for row, box in enumerate(data['bboxes']):
+            if box is not None:
+                bboxes[row] = box
+        texts = np.empty(n, dtype=object)
+        texts[:] = data['texts']
+        return cls(
+            classes=data['classes'],
+            class_ids=np.asarray(data['class_ids'], dtype=np.int32),
+            confidences=np.array([np.nan if c is None else c for c in data['confidences']], dtype=np.float32),
+            bboxes=bboxes,
+            images=[tuple(image) for image in data['images']],
+            image_ids=np.asarray(data['image_ids'], dtype=np.int32),
+            original_class_ids=np.asarray(data['original_class_ids'], dtype=np.int32),
+            texts=texts,
+            has_text=np.asarray(data['has_text'], dtype=np.int8),
+            extras={int(row): fields for row, fields in data['extras'].items()},
+        )
+
+
+class ColumnarDetectionsBuilder:
+    """Appends detections image by image, then freezes them into ColumnarDetections"""
+
+    def __init__(self):
+        self._class_vocabulary: Dict[Optional[str], int] = {}
+        self._text_vocabulary: Dict[str, str] = {}
+        self._images: List[Tuple[str, Any]] = []
+        self._class_ids: List[int] = []
+        self._original_class_ids: List[int] = []
+        self._confidences: List[float] = []
+        self._bboxes: List[Sequence[float]] = []
+        self._image_ids: List[int] = []
+        self._texts: List[Optional[str]] = []
+        self._has_text: List[int] = []
+        self._extras: Dict[int, Dict[str, Any]] = {}
+
+    def _class_id(self, name: Optional[str]) -> int:
+        return self._class_vocabulary.setdefault(name, len(self._class_vocabulary))
+
+    def add_image(self, image_name: str, image_index: Any, detections: Iterable[Any]) -> int:
+        """
+        Append one image's detections
+
+        Args:
+            image_name: Name the detections are grouped under
+            image_index: Index reported for the image
+            detections: Detection dicts (anything else is skipped)
+
+        Returns:
+            Number of detections added
+        """
+        image_id = len(self._images)
+        self._images.append((image_name, image_index))
+        added = 0
+        nan_box = (np.nan,) * 4
+        for detection in detections:
+            if not isinstance(detection, dict):
+                continue
+            row = len(self._class_ids)
+            self._class_ids.append(self._class_id(detection.get('class')))
+            confidence = detection.get('confidence')
+            self._confidences.append(confidence if isinstance(confidence, NUMBER_TYPES) else np.nan)
+            bbox = detection.get('bbox')
+            bbox_valid = _valid_bbox(bbox)
+            self._bboxes.append(bbox if bbox_valid else nan_box)
+            self._image_ids.append(image_id)
+            original_class = detection.get('original_class')
+            self._original_class_ids.append(self._class_id(original_class) if isinstance(original_class, str) else -1)
+            text = detection.get('extracted_text')
+            self._texts.append(self._text_vocabulary.setdefault(text, text) if isinstance(text, str) else None)
+            has_text = detection.get('has_text')
+            self._has_text.append(int(has_text) if isinstance(has_text, bool) else -1)
+
+            # Fields without a column (or values that don't fit one) stay as they were
+            extras = {key: value for key, value in detection.items() if key not in COLUMN_FIELDS}
+            if 'confidence' in detection and not isinstance(confidence, NUMBER_TYPES):
+                extras['confidence'] = confidence
+            if 'bbox' in detection and not bbox_valid:
+                extras['bbox'] = bbox
+            if 'original_class' in detection and not isinstance(original_class, str):
+                extras['original_class'] = original_class
+            if 'extracted_text' in detection and not isinstance(text, str):
+                extras['extracted_text'] = text
+            if 'has_text' in detection and not isinstance(has_text, bool):
+                extras['has_text'] = has_text
+            if extras:
+                self._extras[row] = extras
+            added += 1
+        return added
+
+    def build(self) -> ColumnarDetections:
+        texts = np.empty(len(self._texts), dtype=object)
+        texts[:] = self._texts
+        return ColumnarDetections(
+            classes=list(self._class_vocabulary),
+            class_ids=np.asarray(self._class_ids, dtype=np.int32),
+            confidences=np.asarray(self._confidences, dtype=np.float32),
+            bboxes=np.asarray(self._bboxes, dtype=np.float32).reshape(-1, 4),
+            images=self._images,
+            image_ids=np.asarray(self._image_ids, dtype=np.int32),
+            original_class_ids=np.asarray(self._original_class_ids, dtype=np.int32),
+            texts=texts,
+            has_text=np.asarray(self._has_text, dtype=np.int8),
+            extras=self._extras,
+        )
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Inference Concurrency Controls
+Bounded thread pool for blocking model/image work and per-endpoint admission
+limits that shed load with 503 instead of letting queues grow without bound
+"""
+
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+CPU_COUNT = os.cpu_count() or 1
+
+# Threads that run blocking work (decode, forward passes, OCR, encode)
+INFERENCE_WORKERS = int(os.getenv("VISION_INFERENCE_WORKERS", str(min(4, CPU_COUNT))))
+# Torch intra-op threads per worker; split the cores so workers don't oversubscribe them
+TORCH_THREADS = int(os.getenv("VISION_TORCH_THREADS", str(max(1, CPU_COUNT // INFERENCE_WORKERS))))
+
+torch.set_num_threads(TORCH_THREADS)
+try:
+    torch.set_num_interop_threads(1)
+except RuntimeError:
+    # Can only be set once, before any inter-op parallel work has started
+    pass
+
+inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+logger.info(f"Inference pool: {INFERENCE_WORKERS} workers x {TORCH_THREADS} torch threads")
+
+
+async def run_blocking(fn: Callable, *args, **kwargs) -> Any:
+    """Run a blocking function on the inference pool without stalling the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(inference_executor, functools.partial(fn, *args, **kwargs))
+
+
+class ServiceOverloaded(Exception):
+    def __init__(self, name: str, retry_after: int = 1):
+        super().__init__(f"{name} is at capacity, retry later")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    def __init__(self, name: str, max_concurrent: int, max_queued: int):
+        """
+        Limit in-flight requests for one endpoint
+
+        Args:
+            name: Endpoint name used in errors and stats
+            max_concurrent: Requests allowed to run at once
+            max_queued: Requests allowed to wait for a slot; beyond this, ServiceOverloaded is raised
+        """
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max(0, max_queued)
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls, name: str, default_concurrent: int, default_queued: int) -> "ConcurrencyLimiter":
+        """Build a limiter configured by VISION_<NAME>_MAX_CONCURRENT / VISION_<NAME>_MAX_QUEUED"""
+        prefix = f"VISION_{name.upper()}"
+        return cls(
+            name,
+            int(os.getenv(f"{prefix}_MAX_CONCURRENT", str(default_concurrent))),
+            int(os.getenv(f"{prefix}_MAX_QUEUED", str(default_queued)))
+        )
+
+    async def __aenter__(self):
+        if self.active >= self.max_concurrent and self.waiting >= self.max_queued:
+            self.rejected += 1
+            raise ServiceOverloaded(self.name)
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.active -= 1
+        self._semaphore.release()
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected
+        }
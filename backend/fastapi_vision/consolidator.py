@@ -9,23 +9,38 @@ from collections import defaultdict, Counter
 import json
 import logging
 
+from columnar import ColumnarDetectionsBuilder, element_category
+from matching import MatchingEngine, classes_compatible
+
 class DataConsolidator:
-    def __init__(self):
-        """Initialize the data consolidator"""
+    def __init__(self, iou_threshold: float = 0.3, one_to_one: bool = False):
+        """
+        Initialize the data consolidator
+
+        Args:
+            iou_threshold: Minimum IoU for a detection to match a tracked interaction
+            one_to_one: Match each interaction to at most one detection
+        """
         self.logger = logging.getLogger(__name__)
+        self.matching_engine = MatchingEngine(iou_threshold, one_to_one)
     
-    def consolidate_vision_data(self, vision_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def consolidate_vision_data(self, vision_results: List[Dict[str, Any]], compact: bool = False) -> Dict[str, Any]:
         """
         Consolidate multiple vision analysis results into a unified structure
         
         Args:
             vision_results: List of vision analysis results from multiple images
+            compact: Store detections column-wise under 'detections' (a ColumnarDetections)
+                     instead of the all_detections / detections_by_* / enhanced_elements dicts;
+                     expand_vision_data() materializes those on request
             
         Returns:
             Consolidated vision data with statistics and unified detections
         """
         if not vision_results:
             return {"error": "No vision results provided"}
+        if compact:
+            return self._consolidate_vision_columns(vision_results)
         
         consolidated = {
             "summary": {
@@ -100,24 +115,84 @@ class DataConsolidator:
                 
                 consolidated['detections_by_image'][image_name] = image_detections
         
-        # Finalize screen distribution
-        total_images = len(vision_results)
-        consolidated['overall_classification']['screen_distribution'] = {
-            screen_type: count / total_images 
-            for screen_type, count in consolidated['summary']['screen_types'].items()
-        }
-        
-        # Get secondary screens (screens with >20% presence)
-        secondary_screens = [
-            screen_type for screen_type, ratio in consolidated['overall_classification']['screen_distribution'].items()
-            if ratio > 0.2 and screen_type != consolidated['overall_classification']['primary_screen']
-        ]
-        consolidated['overall_classification']['secondary_screens'] = secondary_screens
+        self.finalize_classification(consolidated, len(vision_results))
         
         # Convert defaultdict to regular dict for JSON serialization
         consolidated['detections_by_type'] = dict(consolidated['detections_by_type'])
         
         return consolidated
+
+    def _consolidate_vision_columns(self, vision_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """consolidate_vision_data(compact=True): one column per detection field, groupings as index arrays"""
+        consolidated = {
+            "summary": {
+                "total_images": len(vision_results),
+                "total_detections": 0,
+                "detection_types": Counter(),
+                "screen_types": Counter()
+            },
+            "overall_classification": {
+                "primary_screen": None,
+                "confidence": 0.0,
+                "secondary_screens": [],
+                "screen_distribution": {}
+            },
+            "detections": None
+        }
+        builder = ColumnarDetectionsBuilder()
+
+        for i, vision_result in enumerate(vision_results):
+            image_name = vision_result.get('imageName', f'Image_{i+1}')
+            image_index = vision_result.get('imageIndex', i)
+
+            if 'classification' in vision_result:
+                classification = vision_result['classification']
+                screen_type = classification.get('label', 'Unknown')
+                confidence = classification.get('confidence', 0.0)
+                consolidated['summary']['screen_types'][screen_type] += 1
+                if confidence > consolidated['overall_classification']['confidence']:
+                    consolidated['overall_classification']['primary_screen'] = screen_type
+                    consolidated['overall_classification']['confidence'] = confidence
+
+            if 'detections' in vision_result:
+                builder.add_image(image_name, image_index, vision_result['detections'])
+
+        columns = builder.build()
+        consolidated['detections'] = columns
+        consolidated['summary']['total_detections'] = len(columns)
+        consolidated['summary']['detection_types'] = Counter({name: len(rows) for name, rows in columns.by_type.items()})
+        self.finalize_classification(consolidated, len(vision_results))
+        return consolidated
+
+    def finalize_classification(self, consolidated: Dict[str, Any], total_images: int):
+        """Screen distribution and secondary screens (screens with >20% presence)"""
+        overall = consolidated['overall_classification']
+        overall['screen_distribution'] = {
+            screen_type: count / total_images 
+            for screen_type, count in consolidated['summary']['screen_types'].items()
+        }
+        overall['secondary_screens'] = [
+            screen_type for screen_type, ratio in overall['screen_distribution'].items()
+            if ratio > 0.2 and screen_type != overall['primary_screen']
+        ]
+
+    def expand_vision_data(self, consolidated_vision: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Materialize compact consolidated vision data into the dict-based layout
+
+        Args:
+            consolidated_vision: Result of consolidate_vision_data(..., compact=True)
+
+        Returns:
+            The same data as consolidate_vision_data(..., compact=False) (boxes and
+            confidences at float32 precision)
+        """
+        columns = consolidated_vision.get('detections')
+        if columns is None:
+            return consolidated_vision
+        expanded = {key: value for key, value in consolidated_vision.items() if key != 'detections'}
+        expanded.update(columns.legacy_view())
+        return expanded
     
     def consolidate_tracked_data(self, tracked_data_list: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -206,33 +281,26 @@ class DataConsolidator:
     
     def _categorize_element(self, detection: Dict[str, Any], enhanced_elements: Dict[str, List]):
         """Categorize detected element into enhanced categories"""
-        element_class = detection.get('class', '').lower()
-        
-        if 'button' in element_class:
-            enhanced_elements['buttons'].append(detection)
-        elif any(word in element_class for word in ['input', 'textbox', 'field']):
-            enhanced_elements['inputs'].append(detection)
-        elif 'link' in element_class:
-            enhanced_elements['links'].append(detection)
-        elif 'heading' in element_class:
-            enhanced_elements['headings'].append(detection)
-        else:
-            enhanced_elements['other'].append(detection)
+        enhanced_elements[element_category(detection.get('class', ''))].append(detection)
     
     def create_unified_analysis_payload(self, 
                                       vision_results: List[Dict[str, Any]], 
-                                      tracked_data_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+                                      tracked_data_list: List[Dict[str, Any]],
+                                      compact: bool = False) -> Dict[str, Any]:
         """
         Create a unified payload combining vision and tracked data for LLM analysis
         
         Args:
             vision_results: List of vision analysis results
             tracked_data_list: List of tracked data
+            compact: Keep vision data column-wise (see consolidate_vision_data); matched
+                     elements then carry 'detection_index' and unmatched_detections
+                     holds row indices instead of detection dicts
             
         Returns:
             Unified payload for LLM analysis
         """
-        consolidated_vision = self.consolidate_vision_data(vision_results)
+        consolidated_vision = self.consolidate_vision_data(vision_results, compact=compact)
         consolidated_tracked = self.consolidate_tracked_data(tracked_data_list)
         
         # Create mapping between detected elements and tracked interactions
@@ -269,48 +337,43 @@ class DataConsolidator:
             }
         }
         
-        # Simple IoU-based matching (can be enhanced with more sophisticated algorithms)
-        for detection in consolidated_vision['all_detections']:
-            detection_bbox = detection.get('bbox', [])
-            detection_class = detection.get('class', '')
-            
-            best_match = None
-            best_iou = 0.0
-            
-            for interaction in consolidated_tracked['all_interactions']:
-                interaction_bbox = interaction.get('bbox', [])
-                interaction_element = interaction.get('elementType', '')
-                
-                # Calculate IoU if bboxes are available
-                if len(detection_bbox) == 4 and len(interaction_bbox) == 4:
-                    iou = self._calculate_iou(detection_bbox, interaction_bbox)
-                    
-                    # Check if classes are compatible
-                    if self._classes_compatible(detection_class, interaction_element) and iou > best_iou:
-                        best_iou = iou
-                        best_match = interaction
-            
-            if best_match and best_iou > 0.3:  # IoU threshold
-                mapping['matched_elements'].append({
-                    'detection': detection,
-                    'interaction': best_match,
-                    'iou_score': best_iou
-                })
-                mapping['mapping_statistics']['total_matches'] += 1
+        # IoU-based matching, per image, vectorized (see matching.py)
+        columns = consolidated_vision.get('detections')
+        all_interactions = consolidated_tracked['all_interactions']
+        if columns is not None:
+            # Compact vision data: detections are referenced by row
+            total_detections = len(columns)
+            matches = self.matching_engine.match_columns(columns, all_interactions)
+        else:
+            all_detections = consolidated_vision['all_detections']
+            total_detections = len(all_detections)
+            matches = self.matching_engine.match(all_detections, all_interactions)
+
+        matched_detections = set()
+        matched_interactions = set()
+        for detection_index, interaction_index, iou in matches:
+            if columns is not None:
+                matched_element = {'detection_index': detection_index}
             else:
-                mapping['unmatched_detections'].append(detection)
-        
-        # Find unmatched interactions
-        matched_interaction_ids = {match['interaction'].get('session_id', '') + str(match['interaction'].get('bbox', [])) 
-                                 for match in mapping['matched_elements']}
-        
-        for interaction in consolidated_tracked['all_interactions']:
-            interaction_id = interaction.get('session_id', '') + str(interaction.get('bbox', []))
-            if interaction_id not in matched_interaction_ids:
-                mapping['unmatched_interactions'].append(interaction)
+                matched_element = {'detection': all_detections[detection_index]}
+            matched_element['interaction'] = all_interactions[interaction_index]
+            matched_element['iou_score'] = iou
+            mapping['matched_elements'].append(matched_element)
+            matched_detections.add(detection_index)
+            matched_interactions.add(interaction_index)
+        mapping['mapping_statistics']['total_matches'] = len(matches)
+
+        unmatched_rows = [i for i in range(total_detections) if i not in matched_detections]
+        if columns is not None:
+            mapping['unmatched_detections'] = unmatched_rows
+        else:
+            mapping['unmatched_detections'] = [all_detections[i] for i in unmatched_rows]
+        mapping['unmatched_interactions'] = [
+            interaction for i, interaction in enumerate(all_interactions) if i not in matched_interactions
+        ]
         
         # Calculate match rate
-        total_possible_matches = len(consolidated_vision['all_detections'])
+        total_possible_matches = total_detections
         if total_possible_matches > 0:
             mapping['mapping_statistics']['match_rate'] = mapping['mapping_statistics']['total_matches'] / total_possible_matches
         
@@ -344,27 +407,7 @@ class DataConsolidator:
     
     def _classes_compatible(self, detection_class: str, interaction_element: str) -> bool:
         """Check if detection class and interaction element type are compatible"""
-        detection_lower = detection_class.lower()
-        interaction_lower = interaction_element.lower()
-        
-        # Direct matches
-        if detection_lower == interaction_lower:
-            return True
-        
-        # Button variations
-        if 'button' in detection_lower and 'button' in interaction_lower:
-            return True
-        
-        # Input variations
-        if any(word in detection_lower for word in ['input', 'textbox', 'field']) and \
-           any(word in interaction_lower for word in ['input', 'textbox', 'field']):
-            return True
-        
-        # Link variations
-        if 'link' in detection_lower and 'link' in interaction_lower:
-            return True
-        
-        return False
+        return classes_compatible(detection_class, interaction_element)
 
 # Global consolidator instance
 consolidator = None
@@ -0,0 +1,516 @@
+#!/usr/bin/env python3
+"""
+Incremental Data Consolidator
+Consolidates vision results and tracked interactions as they stream in, one
+at a time or in chunks, keeping running counters, bounded per-group samples,
+an approximate top-k of clicked elements and the best interaction per
+detection, so snapshots cost O(detections) however long the session runs
+"""
+
+import heapq
+from collections import Counter, OrderedDict, defaultdict, deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from columnar import ColumnarDetectionsBuilder
+from consolidator import DataConsolidator
+from matching import DENSE_MAX_PAIRS, box_array, classes_compatible, iou_matrix
+
+
+def interaction_weight(value: Any) -> int:
+    """interactionCount as an int ("3" -> 3), 1 when missing or unparsable"""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, int):
+        return value
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 1
+
+
+class TopKCounter:
+    """
+    Space-Saving heavy-hitter counter: exact while at most `capacity` distinct
+    keys have been seen; afterwards the least-counted key is evicted and its
+    count inherited (counts become upper bounds, the top keys stay reliable)
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = max(1, capacity)
+        self.counts: Dict[Any, int] = {}
+
+    def add(self, key: Any, weight: int = 1):
+        if key in self.counts:
+            self.counts[key] += weight
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = weight
+        else:
+            evicted = min(self.counts, key=self.counts.get)
+            self.counts[key] = self.counts.pop(evicted) + weight
+
+    def most_common(self, n: int) -> List[Tuple[Any, int]]:
+        return Counter(self.counts).most_common(n)
+
+
+class DistinctCounter:
+    """
+    K-minimum-values distinct counter: exact while at most `capacity` distinct
+    keys have been seen, then an estimate (relative error about
+    1/sqrt(capacity)) from the `capacity` smallest key hashes, in fixed memory
+    """
+
+    _MASK = (1 << 64) - 1
+
+    def __init__(self, capacity: int = 10000):
+        self.capacity = max(2, capacity)
+        self._heap: List[int] = []  # negated hashes, so the largest kept hash is on top
+        self._hashes = set()
+        self._last: Any = self  # no key seen yet
+
+    @classmethod
+    def _hash(cls, key: Any) -> int:
+        # splitmix64 finalizer: spreads Python's hash (the identity for small ints) over 64 bits
+        z = (hash(key) + 0x9E3779B97F4A7C15) & cls._MASK
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & cls._MASK
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & cls._MASK
+        return z ^ (z >> 31)
+
+    def add(self, key: Any):
+        if key == self._last:
+            # Streamed events mostly repeat the previous session id
+            return
+        self._last = key
+        value = self._hash(key)
+        if value in self._hashes:
+            return
+        if len(self._heap) < self.capacity:
+            heapq.heappush(self._heap, -value)
+            self._hashes.add(value)
+        elif value < -self._heap[0]:
+            self._hashes.discard(-heapq.heapreplace(self._heap, -value))
+            self._hashes.add(value)
+
+    def __len__(self) -> int:
+        if len(self._heap) < self.capacity:
+            return len(self._heap)
+        return round((self.capacity - 1) * 2 ** 64 / (-self._heap[0] + 1))
+
+
+class _ImageMatches:
+    """Detections of one image and the best compatible interaction seen so far for each"""
+
+    def __init__(self, rows: np.ndarray, boxes: np.ndarray, labels: np.ndarray):
+        self.rows = rows
+        self.boxes = boxes
+        self.labels = labels
+        self.best_iou = np.zeros(len(rows))
+        self.best_seq = np.full(len(rows), -1, dtype=np.int64)
+        self.best_interactions: List[Optional[Dict[str, Any]]] = [None] * len(rows)
+
+    def extend(self, other: '_ImageMatches'):
+        self.rows = np.concatenate([self.rows, other.rows])
+        self.boxes = np.concatenate([self.boxes, other.boxes])
+        self.labels = np.concatenate([self.labels, other.labels])
+        self.best_iou = np.concatenate([self.best_iou, other.best_iou])
+        self.best_seq = np.concatenate([self.best_seq, other.best_seq])
+        self.best_interactions.extend(other.best_interactions)
+
+
+class IncrementalConsolidator:
+    def __init__(self, iou_threshold: float = 0.3, sample_size: int = 100, top_k_capacity: int = 1000,
+                 max_pending: int = 10000, max_history: int = 1000, session_capacity: int = 10000,
+                 max_images: int = 1000, max_groups: int = 1000):
+        """
+        Initialize the incremental consolidator
+
+        Args:
+            iou_threshold: Minimum IoU for a detection to match a tracked interaction
+            sample_size: Interactions kept per grouping (and in all_interactions), most recent first out
+            top_k_capacity: Distinct element types tracked exactly for most_clicked_elements
+            max_pending: Interactions buffered per image until that image's vision result arrives
+                         (and interactions without an imageName, kept for images still to come)
+            max_history: Interactions kept per image already seen, matched against a later vision
+                         result with the same image name (older ones count as dropped_pending then)
+            session_capacity: Distinct streamed session ids counted exactly; beyond that the
+                              session count is an estimate
+            max_images: Image names with buffered interactions (pending or history); the least
+                        recently used name is evicted beyond that and its interactions count
+                        as dropped_pending
+            max_groups: Keys per grouping that keep a sample; the least recently used key loses
+                        its sample beyond that (its count is kept)
+
+        Memory is bounded by max_images * max(max_pending, max_history) buffered interactions,
+        3 * max_groups * sample_size sampled ones, and one small counter per distinct
+        interaction type, element type and image name (group_counts, compatibility masks)
+        """
+        self.iou_threshold = iou_threshold
+        self.sample_size = sample_size
+        self.max_pending = max_pending
+        self.max_history = max_history
+        self.max_images = max_images
+        self.max_groups = max_groups
+        self.consolidator = DataConsolidator(iou_threshold)
+
+        # Vision
+        self.total_images = 0
+        self.screen_types = Counter()
+        self.primary_screen = None
+        self.primary_confidence = 0.0
+        self.detections = ColumnarDetectionsBuilder()
+        self.total_detections = 0
+
+        # Tracked data
+        self.total_interactions = 0
+        self.sessions = 0
+        self.stream_sessions = DistinctCounter(session_capacity)
+        self.interaction_types = Counter()
+        self.element_types = Counter()
+        self.element_clicks = TopKCounter(top_k_capacity)
+        self.group_counts = {name: Counter() for name in ('by_type', 'by_element', 'by_image')}
+        self.group_samples: Dict[str, Dict[Any, Deque]] = {
+            name: OrderedDict() for name in ('by_type', 'by_element', 'by_image')
+        }
+        self.recent_interactions = self._new_sample()
+
+        # Matching
+        self._classes: Dict[str, int] = {}
+        self._compatibility: Dict[str, np.ndarray] = {}
+        self._images: Dict[Any, _ImageMatches] = {}
+        self._pending: Dict[Any, Deque[Tuple[int, Dict[str, Any]]]] = OrderedDict()
+        self._pending_any_image = self._new_pending()
+        self._history_dropped = Counter()
+        self.dropped_pending = 0
+
+    def _new_sample(self) -> Deque:
+        return deque(maxlen=self.sample_size)
+
+    def _new_pending(self) -> Deque:
+        return deque(maxlen=self.max_pending)
+
+    def _pending_for(self, image_name: Any) -> Deque:
+        """Buffered interactions of an image name, evicting the least recently used name beyond max_images"""
+        pending = self._pending.get(image_name)
+        if pending is not None:
+            self._pending.move_to_end(image_name)
+            return pending
+        while self._pending and len(self._pending) >= self.max_images:
+            evicted, dropped = self._pending.popitem(last=False)
+            self.dropped_pending += len(dropped) + self._history_dropped.pop(evicted, 0)
+        pending = self._pending[image_name] = deque(maxlen=self.max_history if image_name in self._images
+                                                    else self.max_pending)
+        return pending
+
+    def _sample_for(self, group: str, key: Any) -> Deque:
+        """Sample of a grouping key, dropping the least recently used key's sample beyond max_groups"""
+        samples = self.group_samples[group]
+        sample = samples.get(key)
+        if sample is not None:
+            samples.move_to_end(key)
+            return sample
+        while samples and len(samples) >= self.max_groups:
+            samples.popitem(last=False)
+        sample = samples[key] = self._new_sample()
+        return sample
+
+    # Vision results
+
+    def add_vision_results(self, vision_results: Iterable[Dict[str, Any]]):
+        for vision_result in vision_results:
+            self.add_vision_result(vision_result)
+
+    def add_vision_result(self, vision_result: Dict[str, Any]):
+        """Add one image's vision analysis result (same fields as consolidate_vision_data)"""
+        i = self.total_images
+        self.total_images += 1
+        image_name = vision_result.get('imageName', f'Image_{i+1}')
+        image_index = vision_result.get('imageIndex', i)
+
+        if 'classification' in vision_result:
+            classification = vision_result['classification']
+            screen_type = classification.get('label', 'Unknown')
+            confidence = classification.get('confidence', 0.0)
+            self.screen_types[screen_type] += 1
+            if confidence > self.primary_confidence:
+                self.primary_screen, self.primary_confidence = screen_type, confidence
+
+        if 'detections' not in vision_result:
+            return
+        detections = [d for d in vision_result['detections'] if isinstance(d, dict)]
+        first_row = self.total_detections
+        self.total_detections += self.detections.add_image(image_name, image_index, detections)
+
+        boxes, valid = box_array([d.get('bbox', []) for d in detections])
+        labels = np.fromiter((self._classes.setdefault(d.get('class', ''), len(self._classes)) for d in detections),
+                             dtype=np.int64, count=len(detections))
+        new = _ImageMatches(np.flatnonzero(valid) + first_row, boxes[valid], labels[valid])
+
+        # Interactions routed to this image name so far (before its first result, or to an earlier
+        # result with the same name) and those without an imageName, in arrival order
+        backlog = sorted(list(self._pending.get(image_name, ())) + list(self._pending_any_image), key=lambda p: p[0])
+        self.dropped_pending += self._history_dropped.pop(image_name, 0)
+        if backlog:
+            self._match(new, [seq for seq, _ in backlog], [interaction for _, interaction in backlog])
+
+        if image_name in self._images:
+            self._images[image_name].extend(new)
+        else:
+            self._images[image_name] = new
+            # From now on only a later result with this name needs the image's interactions
+            routed = self._pending.pop(image_name, ())
+            self._history_dropped[image_name] += max(0, len(routed) - self.max_history)
+            self._pending_for(image_name).extend(routed)
+
+    # Tracked data
+
+    def add_tracked_data(self, tracked_data: Any):
+        """Add one tracked-data entry (a single interaction or a list of them), counted as one session"""
+        i = self.sessions
+        self.sessions += 1
+        if isinstance(tracked_data, dict):
+            self._add_chunk([{**tracked_data, 'session_id': f"session_{i}"}])
+        elif isinstance(tracked_data, list):
+            self._add_chunk([
+                {**interaction, 'session_id': f"session_{i}_interaction_{j}"}
+                for j, interaction in enumerate(tracked_data) if isinstance(interaction, dict)
+            ])
+
+    def add_interaction(self, interaction: Dict[str, Any], session_id: Optional[str] = None):
+        self.add_interactions([interaction], session_id)
+
+    def add_interactions(self, interactions: Iterable[Dict[str, Any]], session_id: Optional[str] = None):
+        """
+        Add a chunk of streamed interaction events
+
+        Args:
+            interactions: Interaction dicts (anything else is skipped)
+            session_id: Session of events without their own 'session_id'; sessions are
+                        counted once per distinct id
+        """
+        chunk = []
+        for interaction in interactions:
+            if not isinstance(interaction, dict):
+                continue
+            if 'session_id' not in interaction:
+                interaction = {**interaction, 'session_id': session_id}
+            if interaction['session_id'] is not None:
+                self.stream_sessions.add(interaction['session_id'])
+            chunk.append(interaction)
+        self._add_chunk(chunk)
+
+    def add_tracking_batch(self, batch, session_id: Optional[str] = None):
+        """
+        Add the normalized events of a tracking_ingest.TrackingBatch
+
+        Args:
+            batch: TrackingBatch from tracking_ingest.ingest()
+            session_id: Session of events without a sessionId
+        """
+        self.add_interactions(
+            {**record, 'session_id': record.get('sessionId', session_id)} for record in batch.records()
+        )
+
+    def _add_chunk(self, interactions: List[Dict[str, Any]]):
+        if not interactions:
+            return
+        first_seq = self.total_interactions
+        self.total_interactions += len(interactions)
+
+        for interaction in interactions:
+            interaction_type = interaction.get('interactionType', 'Unknown')
+            element_type = interaction.get('elementType', 'Unknown')
+            image_name = interaction.get('imageName', 'Unknown')
+            self.interaction_types[interaction_type] += 1
+            self.element_types[element_type] += 1
+            self.element_clicks.add(element_type, interaction_weight(interaction.get('interactionCount', 1)))
+            for group, key in (('by_type', interaction_type), ('by_element', element_type), ('by_image', image_name)):
+                self.group_counts[group][key] += 1
+                self._sample_for(group, key).append(interaction)
+            self.recent_interactions.append(interaction)
+
+        # Route to the images they can match, and keep them for vision results still to come
+        by_image = defaultdict(list)
+        for seq, interaction in enumerate(interactions, first_seq):
+            image_name = interaction.get('imageName')
+            if not image_name:
+                self._buffer(self._pending_any_image, seq, interaction)
+                for name in self._images:
+                    by_image[name].append((seq, interaction))
+            elif image_name in self._images:
+                by_image[image_name].append((seq, interaction))
+                # Only needed if another result with this image name arrives
+                history = self._pending_for(image_name)
+                if len(history) == history.maxlen:
+                    self._history_dropped[image_name] += 1
+                history.append((seq, interaction))
+            else:
+                self._buffer(self._pending_for(image_name), seq, interaction)
+        for image_name, items in by_image.items():
+            self._match(self._images[image_name], [seq for seq, _ in items], [interaction for _, interaction in items])
+
+    def _buffer(self, pending: Deque, seq: int, interaction: Dict[str, Any]):
+        if len(pending) == pending.maxlen:
+            self.dropped_pending += 1
+        pending.append((seq, interaction))
+
+    # Matching
+
+    def _compatible_classes(self, element_type: str) -> np.ndarray:
+        """Detection classes (by id) compatible with an interaction element type"""
+        compatible = self._compatibility.get(element_type)
+        if compatible is None or len(compatible) < len(self._classes):
+            compatible = np.array([classes_compatible(c, element_type) for c in self._classes], dtype=bool)
+            self._compatibility[element_type] = compatible
+        return compatible
+
+    def _match(self, image: _ImageMatches, seqs: List[int], interactions: List[Dict[str, Any]]):
+        """Update each detection's best match with interactions given in arrival order"""
+        if not len(image.rows):
+            return
+        boxes, valid = box_array([i.get('bbox', []) for i in interactions])
+        keep = np.flatnonzero(valid)
+        if not len(keep):
+            return
+        seqs = np.asarray(seqs, dtype=np.int64)[keep]
+        boxes = boxes[keep]
+        interactions = [interactions[k] for k in keep.tolist()]
+        elements: Dict[str, int] = {}
+        element_ids = [elements.setdefault(i.get('elementType', ''), len(elements)) for i in interactions]
+        table = np.stack([self._compatible_classes(element) for element in elements], axis=1)
+        compatible = table[image.labels][:, element_ids]
+
+        step = max(1, DENSE_MAX_PAIRS // len(image.rows))
+        for start in range(0, len(interactions), step):
+            iou = iou_matrix(image.boxes, boxes[start:start + step])
+            iou[~compatible[:, start:start + step]] = 0.0
+            iou[iou <= self.iou_threshold] = 0.0
+            # argmax picks the earliest interaction on ties, like the one-shot consolidation
+            best = iou.argmax(axis=1)
+            best_iou = iou[np.arange(len(best)), best]
+            improved = np.flatnonzero(best_iou > image.best_iou)
+            image.best_iou[improved] = best_iou[improved]
+            image.best_seq[improved] = seqs[start + best[improved]]
+            for row, column in zip(improved.tolist(), best[improved].tolist()):
+                image.best_interactions[row] = interactions[start + column]
+
+    # Snapshots
+
+    def snapshot_vision(self, compact: bool = False) -> Dict[str, Any]:
+        """Vision data as consolidate_vision_data would return it for everything added so far"""
+        if not self.total_images:
+            return {"error": "No vision results provided"}
+        columns = self.detections.build()
+        consolidated = {
+            "summary": {
+                "total_images": self.total_images,
+                "total_detections": len(columns),
+                "detection_types": Counter({name: len(rows) for name, rows in columns.by_type.items()}),
+                "screen_types": Counter(self.screen_types)
+            },
+            "overall_classification": {
+                "primary_screen": self.primary_screen,
+                "confidence": self.primary_confidence,
+                "secondary_screens": [],
+                "screen_distribution": {}
+            },
+            "detections": columns
+        }
+        self.consolidator.finalize_classification(consolidated, self.total_images)
+        return consolidated if compact else self.consolidator.expand_vision_data(consolidated)
+
+    def snapshot_tracked(self) -> Dict[str, Any]:
+        """
+        Tracked data in the consolidate_tracked_data layout
+
+        Counters are exact; the interaction lists hold the most recent
+        `sample_size` interactions of each group (group_counts has the totals).
+        """
+        if not self.sessions and not len(self.stream_sessions) and not self.total_interactions:
+            return {"error": "No tracked data provided"}
+        return {
+            "summary": {
+                "total_interactions": self.total_interactions,
+                "interaction_types": Counter(self.interaction_types),
+                "element_types": Counter(self.element_types),
+                "sessions": self.sessions + len(self.stream_sessions)
+            },
+            "interactions_by_type": {key: list(sample) for key, sample in self.group_samples['by_type'].items()},
+            "interactions_by_element": {key: list(sample) for key, sample in self.group_samples['by_element'].items()},
+            "interactions_by_image": {key: list(sample) for key, sample in self.group_samples['by_image'].items()},
+            "group_counts": {group: dict(counts) for group, counts in self.group_counts.items()},
+            "user_behavior_patterns": {
+                "most_clicked_elements": [
+                    {"element": element, "count": count} for element, count in self.element_clicks.most_common(10)
+                ],
+                "interaction_sequences": [],
+                "time_spent_patterns": []
+            },
+            "all_interactions": list(self.recent_interactions)
+        }
+
+    def snapshot_mapping(self, consolidated_vision: Dict[str, Any]) -> Dict[str, Any]:
+        """Element/interaction mapping (best interaction per detection) for a vision snapshot"""
+        columns = consolidated_vision.get('detections')
+        all_detections = consolidated_vision.get('all_detections', [])
+        total_detections = len(columns) if columns is not None else len(all_detections)
+
+        matches = []
+        matched_seqs = []
+        for image in self._images.values():
+            for k in np.flatnonzero(image.best_seq >= 0).tolist():
+                matches.append((int(image.rows[k]), float(image.best_iou[k]), image.best_interactions[k]))
+                matched_seqs.append(image.best_seq[k])
+        matches.sort(key=lambda match: match[0])
+
+        matched_elements = []
+        for row, iou, interaction in matches:
+            if columns is not None:
+                matched_element = {'detection_index': row}
+            else:
+                matched_element = {'detection': all_detections[row]}
+            matched_element['interaction'] = interaction
+            matched_element['iou_score'] = iou
+            matched_elements.append(matched_element)
+
+        matched_rows = {row for row, _, _ in matches}
+        unmatched_rows = [i for i in range(total_detections) if i not in matched_rows]
+        return {
+            "matched_elements": matched_elements,
+            "unmatched_detections": unmatched_rows if columns is not None else [all_detections[i] for i in unmatched_rows],
+            "mapping_statistics": {
+                "total_matches": len(matches),
+                "match_rate": len(matches) / total_detections if total_detections else 0.0,
+                "unmatched_interactions": self.total_interactions - len(np.unique(matched_seqs)),
+                "dropped_pending_interactions": self.dropped_pending
+            }
+        }
+
+    def snapshot(self, compact: bool = False) -> Dict[str, Any]:
+        """
+        Unified payload (as create_unified_analysis_payload) for everything added so far
+
+        Args:
+            compact: Keep vision data column-wise; the mapping then refers to detections by row index
+
+        Returns:
+            Unified payload for LLM analysis; unmatched interactions are counted
+            in mapping_statistics rather than listed
+        """
+        consolidated_vision = self.snapshot_vision(compact=compact)
+        consolidated_tracked = self.snapshot_tracked()
+        mapping = self.snapshot_mapping(consolidated_vision)
+        return {
+            "vision": consolidated_vision,
+            "tracked_data": consolidated_tracked,
+            "element_interaction_mapping": mapping,
+            "analysis_summary": {
+                "total_screenshots": self.total_images,
+                "total_detected_elements": self.total_detections,
+                "total_user_interactions": self.total_interactions,
+                "primary_screen_type": self.primary_screen,
+                "most_interactive_elements": [
+                    {"element": element, "count": count} for element, count in self.element_clicks.most_common(5)
+                ]
+            }
+        }
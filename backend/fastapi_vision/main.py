@@ -1,18 +1,42 @@
-from fastapi import FastAPI, File, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, Query
+from fastapi.responses import JSONResponse, Response
 import torch
 from torchvision import transforms
 from PIL import Image, ImageDraw
 import io
+import asyncio
+import threading
+import time
 import json
 import os
 import base64
 import numpy as np
+from typing import List
 from torch.nn import functional as F
-from ocr_enhancer import get_ocr_enhancer
+from ocr_enhancer import get_ocr_enhancer, DEFAULT_OCR_MODE
+from result_cache import ResultCache, checkpoint_identity
+from model_variants import MODEL_VARIANTS, resolve_checkpoint, configured_variant, prepare_input
+from batcher import MicroBatcher
+from concurrency import (
+    ConcurrencyLimiter, ServiceOverloaded, inference_executor, run_blocking,
+    INFERENCE_WORKERS, TORCH_THREADS
+)
 
 app = FastAPI(title="Vision Model API")
 
+# Checkpoint and class map locations
+base_dir = os.path.dirname(__file__)
+checkpoint_dir = os.path.join(base_dir, "webui-main", "downloads", "checkpoints")
+# VISION_MODEL_VARIANT (or VISION_DETECTION_VARIANT / VISION_CLASSIFICATION_VARIANT) selects a CPU-optimized export
+DETECTION_MODEL_PATH, DETECTION_VARIANT = resolve_checkpoint(
+    os.path.join(checkpoint_dir, "screenrecognition-web7k.torchscript"), configured_variant("detection"),
+    MODEL_VARIANTS["detection"]
+)
+CLASSIFICATION_MODEL_PATH, CLASSIFICATION_VARIANT = resolve_checkpoint(
+    os.path.join(checkpoint_dir, "screenclassification-resnet-noisystudent+web350k.torchscript"), configured_variant("classification"),
+    MODEL_VARIANTS["classification"]
+)
+
 # Globals for model and label map
 global_model = None
 global_idx2Label = None
@@ -21,123 +45,506 @@ global_idx2Label = None
 screen_classification_model = None
 screen_classification_idx2Label = None
 
+# Warm-up and first requests may race to load the same model
+detection_model_lock = threading.Lock()
+classification_model_lock = threading.Lock()
+
 def get_model_and_labels():
     global global_model, global_idx2Label
     if global_model is None or global_idx2Label is None:
-        base_dir = os.path.dirname(__file__)
-        model_path = os.path.join(base_dir, "webui-main", "downloads", "checkpoints", "screenrecognition-web7k.torchscript")
-        class_map_path = os.path.join(base_dir, "webui-main", "metadata", "screenrecognition", "class_map.json")
-        global_model = torch.jit.load(model_path)
-        with open(class_map_path, "r") as f:
-            class_map = json.load(f)
-        global_idx2Label = class_map['idx2Label']
+        with detection_model_lock:
+            if global_model is None or global_idx2Label is None:
+                class_map_path = os.path.join(base_dir, "webui-main", "metadata", "screenrecognition", "class_map.json")
+                with open(class_map_path, "r") as f:
+                    class_map = json.load(f)
+                global_idx2Label = class_map['idx2Label']
+                global_model = torch.jit.load(DETECTION_MODEL_PATH)
     return global_model, global_idx2Label
 
 def get_screen_classification_model_and_labels():
     global screen_classification_model, screen_classification_idx2Label
     if screen_classification_model is None or screen_classification_idx2Label is None:
-        base_dir = os.path.dirname(__file__)
-        model_path = os.path.join(base_dir, "webui-main", "downloads", "checkpoints", "screenclassification-resnet-noisystudent+web350k.torchscript")
-        class_map_path = os.path.join(base_dir, "webui-main", "metadata", "screenclassification", "class_map_enrico.json")
-        screen_classification_model = torch.jit.load(model_path)
-        with open(class_map_path, "r") as f:
-            class_map = json.load(f)
-        screen_classification_idx2Label = class_map['idx2Label']
+        with classification_model_lock:
+            if screen_classification_model is None or screen_classification_idx2Label is None:
+                class_map_path = os.path.join(base_dir, "webui-main", "metadata", "screenclassification", "class_map_enrico.json")
+                with open(class_map_path, "r") as f:
+                    class_map = json.load(f)
+                screen_classification_idx2Label = class_map['idx2Label']
+                screen_classification_model = torch.jit.load(CLASSIFICATION_MODEL_PATH)
     return screen_classification_model, screen_classification_idx2Label
 
+# Confidence threshold applied to raw detector outputs
+CONF_THRESH = 0.5
+
+# Upper bound on images per detector/classifier forward pass (bounds peak memory)
+MAX_BATCH_SIZE = int(os.getenv("VISION_MAX_BATCH_SIZE", "8"))
+# How long the micro-batcher holds the first queued image waiting for more
+BATCH_MAX_LATENCY_MS = float(os.getenv("VISION_BATCH_MAX_LATENCY_MS", "15"))
+# Most uploads accepted by one /analyze_batch request (larger requests get a 413)
+MAX_BATCH_FILES = int(os.getenv("VISION_MAX_BATCH_FILES", "64"))
+
+classification_transforms = transforms.Compose([
+    transforms.Resize(128),
+    transforms.ToTensor(),
+    transforms.Normalize((0.5, 0.5, 0.5), (0.5, 0.5, 0.5))
+])
+
+def predictions_to_detections(pred: dict, idx2Label: dict, conf_thresh: float = CONF_THRESH) -> list:
+    """Convert one image's detector output into the `detections` list returned by the API"""
+    detections = []
+    for i in range(len(pred["boxes"])):
+        conf_score = pred["scores"][i].item()
+        if conf_score > conf_thresh:
+            x1, y1, x2, y2 = pred["boxes"][i].detach().cpu().numpy()
+            label_idx = int(pred["labels"][i].item())
+            label = idx2Label.get(str(label_idx), f"unknown_{label_idx}")
+            detections.append({
+                "class": label,  # Changed from "label" to "class" to match expected format
+                "confidence": conf_score,
+                "bbox": [float(x1), float(y1), float(x2), float(y2)]
+            })
+    return detections
+
+def to_detector_tensor(image_np: np.ndarray) -> torch.Tensor:
+    """Equivalent of ToTensor() over an HWC uint8 array, reading the array's memory directly"""
+    return torch.from_numpy(image_np).permute(2, 0, 1).float().div_(255)
+
+def detect_batch(images: list) -> list:
+    """Run the detector over several PIL images (or prepared CHW tensors), one forward pass per MAX_BATCH_SIZE chunk"""
+    model, idx2Label = get_model_and_labels()
+    results = []
+    with torch.inference_mode():
+        for start in range(0, len(images), MAX_BATCH_SIZE):
+            chunk = images[start:start + MAX_BATCH_SIZE]
+            img_inputs = [
+                image if isinstance(image, torch.Tensor) else transforms.ToTensor()(image)
+                for image in chunk
+            ]
+            preds = model(img_inputs)[1]
+            results.extend(predictions_to_detections(pred, idx2Label) for pred in preds)
+    return results
+
+def enhance_with_ocr(image, detections: list) -> tuple:
+    """Enhance detections with OCR (image is a PIL image or RGB array), falling back to the raw detections on failure
+
+    Returns:
+        (detections, ocr_ok); ocr_ok is False when the OCR reader is unavailable or OCR raised,
+        so the result is served but not cached
+    """
+    try:
+        ocr_enhancer = get_ocr_enhancer()
+        image_np = image if isinstance(image, np.ndarray) else np.array(image)
+        enhanced_detections = ocr_enhancer.enhance_detections(image_np, detections)
+        if ocr_enhancer.reader is None:
+            print("⚠️ OCR reader unavailable, detections carry no text")
+            return enhanced_detections, False
+        print(f"✅ Enhanced {len(enhanced_detections)} detections with OCR")
+        return enhanced_detections, True
+    except Exception as ocr_error:
+        print(f"⚠️ OCR enhancement failed: {ocr_error}")
+        # Continue with original detections if OCR fails
+        return detections, False
+
+def classify_batch(images: list) -> list:
+    """Classify several PIL images; images whose resized shapes match share one forward pass"""
+    model, idx2Label = get_screen_classification_model_and_labels()
+    img_inputs = [classification_transforms(image) for image in images]
+    results = [None] * len(images)
+
+    # Resize(128) keeps the aspect ratio, so only same-shaped tensors can be stacked
+    groups = {}
+    for i, img_input in enumerate(img_inputs):
+        groups.setdefault(tuple(img_input.shape), []).append(i)
+
+    with torch.inference_mode():
+        for indices in groups.values():
+            for start in range(0, len(indices), MAX_BATCH_SIZE):
+                chunk = indices[start:start + MAX_BATCH_SIZE]
+                pred = model(prepare_input(torch.stack([img_inputs[i] for i in chunk]), CLASSIFICATION_VARIANT))
+                conf = F.softmax(pred, dim=-1)
+                _, ind = pred.max(dim=-1)
+                for row, i in enumerate(chunk):
+                    label_idx = int(ind[row])
+                    results[i] = {
+                        "label": idx2Label[str(label_idx)],
+                        "confidence": float(conf[row][label_idx])
+                    }
+    return results
+
+def decode_image(image_bytes: bytes) -> Image.Image:
+    return Image.open(io.BytesIO(image_bytes)).convert("RGB")
+
+def decode_for_full_analysis(image_bytes: bytes) -> tuple:
+    """Decode once and derive every model input from the same RGB buffer
+
+    Returns:
+        (image, image_np, detector_tensor): the PIL image for the classifier's resize path,
+        its HWC uint8 array for OCR, and a CHW float tensor for the detector built from that array
+    """
+    image = decode_image(image_bytes)
+    image_np = np.asarray(image)
+    if not image_np.flags.writeable:
+        # torch.from_numpy needs a writeable buffer; this is the only copy of the pixels
+        image_np = image_np.copy()
+    return image, image_np, to_detector_tensor(image_np)
+
+def render_annotated_png(image: Image.Image, detections: list) -> bytes:
+    """Draw detections on a copy of the image and encode it as PNG
+
+    Raw detector boxes are drawn in red; when OCR enhancement ran, the enhanced
+    class and extracted text are drawn in blue on top.
+    """
+    annotated_image = image.copy()
+    draw = ImageDraw.Draw(annotated_image)
+    for detection in detections:
+        bbox = detection.get('bbox', [])
+        if len(bbox) != 4:
+            continue
+        x1, y1, x2, y2 = bbox
+        raw_class = detection.get('original_class', detection.get('class', 'Unknown'))
+        # Draw rectangle and label
+        draw.rectangle([x1, y1, x2, y2], outline='red', width=2)
+        draw.text((x1, y1), f"{raw_class} {detection.get('confidence', 0):.2f}", fill="red")
+
+        if 'original_class' in detection:
+            extracted_text = detection.get('extracted_text', '')
+            draw.rectangle([x1, y1, x2, y2], outline='blue', width=2)
+            label_text = f"{detection.get('class', 'Unknown')}"
+            if extracted_text:
+                label_text += f" ({extracted_text})"
+            draw.text((x1, y1-20), label_text, fill="blue")
+
+    buffered = io.BytesIO()
+    annotated_image.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+# Micro-batchers coalescing concurrent single-image requests into shared forward passes
+detection_batcher = MicroBatcher("detection", detect_batch, MAX_BATCH_SIZE, BATCH_MAX_LATENCY_MS, inference_executor)
+classification_batcher = MicroBatcher("classification", classify_batch, MAX_BATCH_SIZE, BATCH_MAX_LATENCY_MS, inference_executor)
+
+# Per-endpoint admission control; requests beyond running + queued slots get a 503
+analyze_limiter = ConcurrencyLimiter.from_env("analyze", 4, 16)
+analyze_batch_limiter = ConcurrencyLimiter.from_env("analyze_batch", 1, 2)
+classify_limiter = ConcurrencyLimiter.from_env("classify", 8, 32)
+analyze_full_limiter = ConcurrencyLimiter.from_env("analyze_full", 4, 16)
+
+# Results keyed by image content + checkpoint identity + inference parameters
+result_cache = ResultCache.from_env()
+
+def analyze_cache_key(image_bytes: bytes) -> str:
+    return ResultCache.make_key(
+        "analyze", image_bytes, checkpoint_identity(DETECTION_MODEL_PATH),
+        conf_thresh=CONF_THRESH, ocr_mode=DEFAULT_OCR_MODE
+    )
+
+def classify_cache_key(image_bytes: bytes) -> str:
+    return ResultCache.make_key("classify", image_bytes, checkpoint_identity(CLASSIFICATION_MODEL_PATH))
+
+def overloaded_response(error: ServiceOverloaded) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"error": str(error)},
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+# Dummy forward passes per model at startup; TorchScript's profiling executor optimizes after the first runs
+WARMUP_RUNS = int(os.getenv("VISION_WARMUP_RUNS", "2"))
+
+def warm_detection_model():
+    model, _ = get_model_and_labels()
+    with torch.inference_mode():
+        for _ in range(WARMUP_RUNS):
+            model([torch.rand(3, 512, 384)])
+
+def warm_classification_model():
+    model, _ = get_screen_classification_model_and_labels()
+    with torch.inference_mode():
+        for _ in range(WARMUP_RUNS):
+            model(prepare_input(torch.rand(1, 3, 128, 96), CLASSIFICATION_VARIANT))
+
+def warm_ocr_reader():
+    ocr_enhancer = get_ocr_enhancer()
+    if ocr_enhancer.reader is None:
+        raise RuntimeError("EasyOCR reader failed to initialize")
+    blank = np.full((32, 128, 3), 255, dtype=np.uint8)
+    for _ in range(WARMUP_RUNS):
+        ocr_enhancer.reader.readtext(blank)
+
+# Per-model load/warm-up state reported by /ready
+model_status = {
+    name: {"status": "pending", "load_seconds": None, "error": None}
+    for name in ("detection", "classification", "ocr")
+}
+
+def load_and_warm(name: str, warm_fn):
+    model_status[name]["status"] = "loading"
+    started = time.perf_counter()
+    try:
+        warm_fn()
+        model_status[name]["status"] = "ready"
+        print(f"✅ {name} model loaded and warmed up")
+    except Exception as e:
+        model_status[name]["status"] = "failed"
+        model_status[name]["error"] = str(e)
+        print(f"❌ Failed to load {name} model: {e}")
+    model_status[name]["load_seconds"] = round(time.perf_counter() - started, 3)
+
+async def warm_up_models():
+    await asyncio.gather(
+        run_blocking(load_and_warm, "detection", warm_detection_model),
+        run_blocking(load_and_warm, "classification", warm_classification_model),
+        run_blocking(load_and_warm, "ocr", warm_ocr_reader)
+    )
+
 @app.on_event("startup")
-def load_model():
-    get_model_and_labels()
+async def load_model():
+    # Load in the background so /health answers while the models warm up
+    asyncio.get_running_loop().create_task(warm_up_models())
+    detection_batcher.start()
+    classification_batcher.start()
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once every model is loaded and warmed up, 503 before that"""
+    is_ready = all(status["status"] == "ready" for status in model_status.values())
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={
+            "ready": is_ready,
+            "models": model_status,
+            "variants": {"detection": DETECTION_VARIANT, "classification": CLASSIFICATION_VARIANT}
+        }
+    )
+
+@app.on_event("shutdown")
+async def stop_batchers():
+    await detection_batcher.stop()
+    await classification_batcher.stop()
+    inference_executor.shutdown(wait=False)
+
+@app.get("/metrics/batching")
+async def batching_metrics():
+    """Batch-size and latency histograms for tuning VISION_MAX_BATCH_SIZE / VISION_BATCH_MAX_LATENCY_MS"""
+    return {
+        "detection": detection_batcher.stats(),
+        "classification": classification_batcher.stats()
+    }
+
+@app.get("/metrics/cache")
+async def cache_metrics():
+    return result_cache.stats()
+
+@app.get("/metrics/concurrency")
+async def concurrency_metrics():
+    return {
+        "inference_workers": INFERENCE_WORKERS,
+        "torch_threads": TORCH_THREADS,
+        "analyze": analyze_limiter.stats(),
+        "analyze_batch": analyze_batch_limiter.stats(),
+        "classify_screen": classify_limiter.stats(),
+        "analyze_full": analyze_full_limiter.stats()
+    }
+
+async def run_analysis(image_bytes: bytes) -> tuple:
+    """Detect + OCR one image, going through the cache
+
+    Returns:
+        (content, cache_status, image) where image is the decoded PIL image, or None on a cache hit
+    """
+    cache_key = analyze_cache_key(image_bytes)
+    cached = await result_cache.aget(cache_key)
+    if cached is not None:
+        return cached, "HIT", None
+
+    async with analyze_limiter:
+        image = await run_blocking(decode_image, image_bytes)
+        detections = await detection_batcher.submit(image)
+
+        # Enhance detections with OCR
+        enhanced_detections, ocr_ok = await run_blocking(enhance_with_ocr, image, detections)
+
+        content = {
+            "detections": enhanced_detections
+        }
+        if ocr_ok:
+            # Only cache complete results, not the text-less fallback after an OCR failure
+            await result_cache.aput(cache_key, content)
+        return content, "MISS", image
+
+async def annotate(image_bytes: bytes, image: Image.Image, detections: list) -> bytes:
+    if image is None:
+        image = await run_blocking(decode_image, image_bytes)
+    return await run_blocking(render_annotated_png, image, detections)
 
 @app.post("/analyze")
-async def analyze_image(file: UploadFile = File(...)):
+async def analyze_image(file: UploadFile = File(...), annotate_image: bool = Query(False, alias="annotate")):
+    """Detect UI elements and extract their text.
+
+    Pass `?annotate=true` to also get the annotated screenshot as a base64 PNG
+    in `annotated_image`; by default no drawing or encoding is done.
+    """
     try:
-        model, idx2Label = get_model_and_labels()
         image_bytes = await file.read()
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        img_input = transforms.ToTensor()(image)
-        pred = model([img_input])[1]
-        conf_thresh = 0.5
-        detections = []
-
-        # Draw on a copy of the image
-        annotated_image = image.copy()
-        draw = ImageDraw.Draw(annotated_image)
-
-        for i in range(len(pred[0]["boxes"])):
-            conf_score = pred[0]["scores"][i].item()
-            if conf_score > conf_thresh:
-                x1, y1, x2, y2 = pred[0]["boxes"][i].detach().cpu().numpy()
-                label_idx = int(pred[0]["labels"][i].item())
-                label = idx2Label.get(str(label_idx), f"unknown_{label_idx}")
-                detections.append({
-                    "class": label,  # Changed from "label" to "class" to match expected format
-                    "confidence": conf_score,
-                    "bbox": [float(x1), float(y1), float(x2), float(y2)]
-                })
-                # Draw rectangle and label
-                draw.rectangle([x1, y1, x2, y2], outline='red', width=2)
-                draw.text((x1, y1), f"{label} {conf_score:.2f}", fill="red")
-
-        # Enhance detections with OCR
-        try:
-            ocr_enhancer = get_ocr_enhancer()
-            image_np = np.array(image)
-            enhanced_detections = ocr_enhancer.enhance_detections(image_np, detections)
-            
-            # Update annotated image with enhanced labels
-            draw = ImageDraw.Draw(annotated_image)
-            for detection in enhanced_detections:
-                bbox = detection.get('bbox', [])
-                if len(bbox) == 4:
-                    x1, y1, x2, y2 = bbox
-                    enhanced_class = detection.get('class', 'Unknown')
-                    extracted_text = detection.get('extracted_text', '')
-                    draw.rectangle([x1, y1, x2, y2], outline='blue', width=2)
-                    label_text = f"{enhanced_class}"
-                    if extracted_text:
-                        label_text += f" ({extracted_text})"
-                    draw.text((x1, y1-20), label_text, fill="blue")
-            
-            detections = enhanced_detections
-            print(f"✅ Enhanced {len(detections)} detections with OCR")
-            
-        except Exception as ocr_error:
-            print(f"⚠️ OCR enhancement failed: {ocr_error}")
-            # Continue with original detections if OCR fails
-
-        # Encode annotated image as base64
-        buffered = io.BytesIO()
-        annotated_image.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-
-        return JSONResponse(content={
-            "detections": detections
-        })
+        content, cache_status, image = await run_analysis(image_bytes)
+        if annotate_image:
+            png_bytes = await annotate(image_bytes, image, content["detections"])
+            content = {**content, "annotated_image": base64.b64encode(png_bytes).decode("utf-8")}
+        return JSONResponse(content=content, headers={"X-Cache": cache_status})
+    except ServiceOverloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         print(f"Error in analyze_image: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+@app.post("/analyze/annotated")
+async def analyze_image_annotated(file: UploadFile = File(...)):
+    """Same analysis as /analyze, returned as the raw annotated PNG"""
+    try:
+        image_bytes = await file.read()
+        content, cache_status, image = await run_analysis(image_bytes)
+        png_bytes = await annotate(image_bytes, image, content["detections"])
+        return Response(
+            content=png_bytes,
+            media_type="image/png",
+            headers={"X-Cache": cache_status, "X-Detection-Count": str(len(content["detections"]))}
+        )
+    except ServiceOverloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        print(f"Error in analyze_image_annotated: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+@app.post("/analyze_batch")
+async def analyze_batch(files: List[UploadFile] = File(...)):
+    """Analyze several screenshots with batched detector forward passes.
+
+    Returns one entry per upload, in upload order, each carrying the same
+    `detections` list `/analyze` returns (or an `error` if that image failed to decode).
+    At most VISION_MAX_BATCH_FILES uploads are accepted; images are decoded and
+    analyzed MAX_BATCH_SIZE at a time so only one chunk of pixels is held in memory.
+    """
+    if len(files) > MAX_BATCH_FILES:
+        return JSONResponse(
+            status_code=413,
+            content={"error": f"Too many files: {len(files)} (at most {MAX_BATCH_FILES} per batch)"}
+        )
+    try:
+        async with analyze_batch_limiter:
+            results = []
+            analyzed = 0
+            cache_hits = 0
+            for start in range(0, len(files), MAX_BATCH_SIZE):
+                images = []
+                pending = []
+                for index, file in enumerate(files[start:start + MAX_BATCH_SIZE], start):
+                    image_bytes = await file.read()
+                    result = {"filename": file.filename, "index": index}
+                    results.append(result)
+                    cache_key = analyze_cache_key(image_bytes)
+                    cached = await result_cache.aget(cache_key)
+                    if cached is not None:
+                        result.update(cached)
+                        cache_hits += 1
+                        continue
+                    try:
+                        image = await run_blocking(decode_image, image_bytes)
+                    except Exception as decode_error:
+                        result["error"] = str(decode_error)
+                        continue
+                    images.append(image)
+                    pending.append((result, cache_key))
+
+                all_detections = await asyncio.gather(*(detection_batcher.submit(image) for image in images))
+                all_enhanced = await asyncio.gather(*(
+                    run_blocking(enhance_with_ocr, image, detections)
+                    for image, detections in zip(images, all_detections)
+                ))
+                for (result, cache_key), (enhanced_detections, ocr_ok) in zip(pending, all_enhanced):
+                    result["detections"] = enhanced_detections
+                    if ocr_ok:
+                        await result_cache.aput(cache_key, {"detections": enhanced_detections})
+                analyzed += len(images)
+
+            print(f"✅ Analyzed batch of {analyzed}/{len(files)} images ({cache_hits} cached)")
+            return JSONResponse(content={"results": results}, headers={"X-Cache-Hits": str(cache_hits)})
+    except ServiceOverloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        print(f"Error in analyze_batch: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
 @app.post("/classify_screen")
 async def classify_screen(file: UploadFile = File(...)):
     try:
-        model, idx2Label = get_screen_classification_model_and_labels()
         image_bytes = await file.read()
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        img_transforms = transforms.Compose([
-            transforms.Resize(128),
-            transforms.ToTensor(),
-            transforms.Normalize((0.5, 0.5, 0.5), (0.5, 0.5, 0.5))
-        ])
-        img_input = img_transforms(image)
-        pred = model(img_input.unsqueeze(0))
-        conf = F.softmax(pred, dim=-1)
-        _, ind = pred.max(dim=-1)
-        label = idx2Label[str(int(ind))]
-        confidence = float(conf[0][ind])
-        return JSONResponse(content={
-            "label": label,
-            "confidence": confidence
-        })
+        cache_key = classify_cache_key(image_bytes)
+        cached = await result_cache.aget(cache_key)
+        if cached is not None:
+            return JSONResponse(content=cached, headers={"X-Cache": "HIT"})
+
+        async with classify_limiter:
+            image = await run_blocking(decode_image, image_bytes)
+            classification = await classification_batcher.submit(image)
+            await result_cache.aput(cache_key, classification)
+            return JSONResponse(content=classification, headers={"X-Cache": "MISS"})
+    except ServiceOverloaded as e:
+        return overloaded_response(e)
     except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)}) 
\ No newline at end of file
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+@app.post("/analyze_full")
+async def analyze_full(file: UploadFile = File(...)):
+    """Classify the screen, detect UI elements and extract their text in one call.
+
+    Decodes the upload once and shares the RGB buffer between the classifier,
+    the detector and OCR. Returns `classification` (as /classify_screen) and
+    `detections` (as /analyze). Each half is served from the same cache entries
+    the single-purpose endpoints use.
+    """
+    try:
+        image_bytes = await file.read()
+        analyze_key = analyze_cache_key(image_bytes)
+        classify_key = classify_cache_key(image_bytes)
+        cached_analysis = await result_cache.aget(analyze_key)
+        cached_classification = await result_cache.aget(classify_key)
+        if cached_analysis is not None and cached_classification is not None:
+            return JSONResponse(
+                content={"classification": cached_classification, **cached_analysis},
+                headers={"X-Cache": "HIT"}
+            )
+
+        async with analyze_full_limiter:
+            image, image_np, detector_tensor = await run_blocking(decode_for_full_analysis, image_bytes)
+
+            async def classify():
+                if cached_classification is not None:
+                    return cached_classification
+                classification = await classification_batcher.submit(image)
+                await result_cache.aput(classify_key, classification)
+                return classification
+
+            async def detect():
+                if cached_analysis is not None:
+                    return cached_analysis
+                detections = await detection_batcher.submit(detector_tensor)
+                enhanced_detections, ocr_ok = await run_blocking(enhance_with_ocr, image_np, detections)
+                analysis = {"detections": enhanced_detections}
+                if ocr_ok:
+                    await result_cache.aput(analyze_key, analysis)
+                return analysis
+
+            classification, analysis = await asyncio.gather(classify(), detect())
+            cache_status = "PARTIAL" if cached_analysis is not None or cached_classification is not None else "MISS"
+            return JSONResponse(
+                content={"classification": classification, **analysis},
+                headers={"X-Cache": cache_status}
+            )
+    except ServiceOverloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        print(f"Error in analyze_full: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Detection ↔ Interaction Matching Engine
+Matches detected UI elements to tracked interactions by IoU, image by image,
+with class compatibility precomputed per distinct label and IoU evaluated on
+NumPy arrays (dense matrices for small images, grid-pruned candidate pairs
+for large ones)
+"""
+
+from collections import defaultdict
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from spatial_index import intersecting_pairs
+
+INPUT_WORDS = ('input', 'textbox', 'field')
+
+# Above this many detection × interaction pairs per image, candidates come from a grid index
+DENSE_MAX_PAIRS = 4_000_000
+
+# Largest block solved exactly when scipy is installed; bigger blocks use greedy assignment
+EXACT_ASSIGNMENT_MAX_SIDE = 2000
+
+
+def classes_compatible(detection_class: str, interaction_element: str) -> bool:
+    """Check if detection class and interaction element type are compatible"""
+    detection_lower = detection_class.lower()
+    interaction_lower = interaction_element.lower()
+
+    # Direct matches
+    if detection_lower == interaction_lower:
+        return True
+
+    # Button / input / link variations
+    if 'button' in detection_lower and 'button' in interaction_lower:
+        return True
+    if any(word in detection_lower for word in INPUT_WORDS) and \
+       any(word in interaction_lower for word in INPUT_WORDS):
+        return True
+    if 'link' in detection_lower and 'link' in interaction_lower:
+        return True
+
+    return False
+
+
+def _label_ids(labels: Sequence[str]) -> Tuple[np.ndarray, List[str]]:
+    """Map labels to dense ids so compatibility is checked once per distinct label pair"""
+    vocabulary: Dict[str, int] = {}
+    ids = np.fromiter((vocabulary.setdefault(label, len(vocabulary)) for label in labels), dtype=np.int64, count=len(labels))
+    return ids, list(vocabulary)
+
+
+def well_formed(boxes: np.ndarray) -> np.ndarray:
+    """Mask of (N, 4) boxes with finite coordinates and x1 <= x2, y1 <= y2"""
+    return (np.isfinite(boxes).all(axis=1) & (boxes[:, 2] >= boxes[:, 0]) & (boxes[:, 3] >= boxes[:, 1]))
+
+
+def box_array(boxes: Sequence[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Stack [x1, y1, x2, y2] boxes into an (N, 4) float64 array plus a validity mask
+
+    Boxes that are not 4-number lists, have non-finite coordinates or are
+    inverted on either axis are marked invalid (they never match).
+    """
+    array = np.zeros((len(boxes), 4), dtype=np.float64)
+    valid = np.zeros(len(boxes), dtype=bool)
+    for i, box in enumerate(boxes):
+        if isinstance(box, (list, tuple)) and len(box) == 4:
+            try:
+                array[i] = box
+            except (TypeError, ValueError):
+                continue
+            valid[i] = True
+    return array, valid & well_formed(array)
+
+
+def pairwise_iou(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
+    """IoU of aligned box pairs: boxes1[k] vs boxes2[k] (same arithmetic as the scalar version)"""
+    x1 = np.maximum(boxes1[:, 0], boxes2[:, 0])
+    y1 = np.maximum(boxes1[:, 1], boxes2[:, 1])
+    x2 = np.minimum(boxes1[:, 2], boxes2[:, 2])
+    y2 = np.minimum(boxes1[:, 3], boxes2[:, 3])
+    overlapping = (x2 > x1) & (y2 > y1)
+    intersection = np.where(overlapping, (x2 - x1) * (y2 - y1), 0.0)
+    area1 = (boxes1[:, 2] - boxes1[:, 0]) * (boxes1[:, 3] - boxes1[:, 1])
+    area2 = (boxes2[:, 2] - boxes2[:, 0]) * (boxes2[:, 3] - boxes2[:, 1])
+    union = area1 + area2 - intersection
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(overlapping & (union > 0), intersection / union, 0.0)
+
+
+def iou_matrix(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
+    """IoU of every box in boxes1 (N, 4) against every box in boxes2 (M, 4) -> (N, M)"""
+    x1 = np.maximum(boxes1[:, None, 0], boxes2[None, :, 0])
+    y1 = np.maximum(boxes1[:, None, 1], boxes2[None, :, 1])
+    x2 = np.minimum(boxes1[:, None, 2], boxes2[None, :, 2])
+    y2 = np.minimum(boxes1[:, None, 3], boxes2[None, :, 3])
+    overlapping = (x2 > x1) & (y2 > y1)
+    intersection = np.where(overlapping, (x2 - x1) * (y2 - y1), 0.0)
+    area1 = (boxes1[:, 2] - boxes1[:, 0]) * (boxes1[:, 3] - boxes1[:, 1])
+    area2 = (boxes2[:, 2] - boxes2[:, 0]) * (boxes2[:, 3] - boxes2[:, 1])
+    union = area1[:, None] + area2[None, :] - intersection
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(overlapping & (union > 0), intersection / union, 0.0)
+
+
+class MatchingEngine:
+    def __init__(self, iou_threshold: float = 0.3, one_to_one: bool = False):
+        """
+        Initialize the matching engine
+
+        Args:
+            iou_threshold: Minimum IoU (exclusive) for a detection/interaction pair to match
+            one_to_one: Each interaction matches at most one detection (maximum-IoU assignment);
+                        otherwise every detection takes its best interaction, which may be shared
+        """
+        self.iou_threshold = iou_threshold
+        self.one_to_one = one_to_one
+
+    def match(self, detections: List[Dict[str, Any]], interactions: List[Dict[str, Any]]) -> List[Tuple[int, int, float]]:
+        """
+        Match detections to interactions
+
+        Detections are compared only with interactions of the same image
+        (detection 'image_name' vs interaction 'imageName'); interactions
+        without an imageName are candidates on every image (one-to-one
+        assignment is solved per image, so such an interaction can be
+        assigned once in each image).
+
+        Args:
+            detections: Consolidated detections ('bbox', 'class', 'image_name')
+            interactions: Tracked interactions ('bbox', 'elementType', 'imageName')
+
+        Returns:
+            (detection index, interaction index, IoU) triples sorted by detection index
+        """
+        if not detections or not interactions:
+            return []
+        det_boxes, det_valid = box_array([d.get('bbox', []) for d in detections])
+        det_labels, det_vocabulary = _label_ids([d.get('class', '') for d in detections])
+        det_images, image_names = _label_ids([d.get('image_name') for d in detections])
+        return self._match(det_boxes, det_valid, det_labels, det_vocabulary, det_images, image_names, interactions)
+
+    def match_columns(self, columns, interactions: List[Dict[str, Any]]) -> List[Tuple[int, int, float]]:
+        """
+        Same as match, for detections held as a ColumnarDetections (rows are the detection indices)
+
+        Boxes are the stored float32 coordinates, so IoUs can differ from the
+        dict path in the last few digits.
+        """
+        if not len(columns) or not interactions:
+            return []
+        return self._match(
+            columns.bboxes.astype(np.float64), columns.bbox_valid, columns.class_ids,
+            [name or '' for name in columns.classes], columns.image_ids,
+            [name for name, _ in columns.images], interactions
+        )
+
+    def _match(self, det_boxes: np.ndarray, det_valid: np.ndarray, det_labels: np.ndarray, det_vocabulary: List[str],
+               det_images: np.ndarray, image_names: List[Any],
+               interactions: List[Dict[str, Any]]) -> List[Tuple[int, int, float]]:
+        """Match detections given as arrays (labels and images as ids into their vocabularies)"""
+        det_valid = det_valid & well_formed(det_boxes)
+        int_boxes, int_valid = box_array([i.get('bbox', []) for i in interactions])
+        int_labels, int_vocabulary = _label_ids([i.get('elementType', '') for i in interactions])
+        compatible = np.array(
+            [[classes_compatible(a, b) for b in int_vocabulary] for a in det_vocabulary], dtype=bool
+        ).reshape(len(det_vocabulary), len(int_vocabulary))
+
+        # Partition by image
+        detections_by_image = defaultdict(list)
+        valid_rows = np.flatnonzero(det_valid)
+        for i, image_id in zip(valid_rows.tolist(), det_images[valid_rows].tolist()):
+            detections_by_image[image_names[image_id]].append(i)
+        interactions_by_image = defaultdict(list)
+        any_image = []
+        for i in np.flatnonzero(int_valid):
+            image_name = interactions[i].get('imageName')
+            (interactions_by_image[image_name] if image_name else any_image).append(i)
+
+        matches = []
+        for image_name, det_rows in detections_by_image.items():
+            int_rows = interactions_by_image.get(image_name, [])
+            if any_image:
+                int_rows = sorted(int_rows + any_image)
+            if not int_rows:
+                continue
+            det_rows, int_rows = np.asarray(det_rows), np.asarray(int_rows)
+            local_det_labels, local_int_labels = det_labels[det_rows], int_labels[int_rows]
+            if len(det_rows) * len(int_rows) <= DENSE_MAX_PAIRS:
+                di, ii, iou = self._dense_pairs(
+                    det_boxes[det_rows], int_boxes[int_rows], compatible[np.ix_(local_det_labels, local_int_labels)]
+                )
+            else:
+                di, ii, iou = self._grid_pairs(
+                    det_boxes[det_rows], int_boxes[int_rows], compatible, local_det_labels, local_int_labels
+                )
+            if self.one_to_one:
+                di, ii, iou = self._assign_one_to_one(di, ii, iou, len(det_rows), len(int_rows))
+            else:
+                di, ii, iou = self._best_per_detection(di, ii, iou)
+            matches.extend(zip(det_rows[di].tolist(), int_rows[ii].tolist(), iou.tolist()))
+
+        matches.sort()
+        return matches
+
+    def _dense_pairs(self, det_boxes: np.ndarray, int_boxes: np.ndarray,
+                     compatibility: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Compatible pairs above the IoU threshold from a full IoU matrix, as local index arrays"""
+        iou = iou_matrix(det_boxes, int_boxes)
+        iou[~compatibility] = 0.0
+        di, ii = np.nonzero(iou > self.iou_threshold)
+        return di, ii, iou[di, ii]
+
+    def _grid_pairs(self, det_boxes: np.ndarray, int_boxes: np.ndarray, compatible: np.ndarray,
+                    det_labels: np.ndarray, int_labels: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Same as _dense_pairs, but only boxes that intersect (found via a grid join) are evaluated"""
+        di, ii = intersecting_pairs(det_boxes, int_boxes)
+        keep = compatible[det_labels[di], int_labels[ii]]
+        di, ii = di[keep], ii[keep]
+        iou = pairwise_iou(det_boxes[di], int_boxes[ii])
+        keep = iou > self.iou_threshold
+        return di[keep], ii[keep], iou[keep]
+
+    @staticmethod
+    def _best_per_detection(di: np.ndarray, ii: np.ndarray, iou: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Highest-IoU interaction per detection; ties go to the earliest interaction"""
+        if len(di) == 0:
+            return di, ii, iou
+        order = np.lexsort((ii, -iou, di))
+        di, ii, iou = di[order], ii[order], iou[order]
+        first = np.ones(len(di), dtype=bool)
+        first[1:] = di[1:] != di[:-1]
+        return di[first], ii[first], iou[first]
+
+    @staticmethod
+    def _assign_one_to_one(di: np.ndarray, ii: np.ndarray, iou: np.ndarray,
+                           n_detections: int, n_interactions: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Maximum total IoU assignment (scipy when available and small enough, greedy otherwise)"""
+        if len(di) == 0:
+            return di, ii, iou
+        rows, row_index = np.unique(di, return_inverse=True)
+        cols, col_index = np.unique(ii, return_inverse=True)
+        if max(len(rows), len(cols)) <= EXACT_ASSIGNMENT_MAX_SIDE:
+            try:
+                from scipy.optimize import linear_sum_assignment
+            except ImportError:
+                linear_sum_assignment = None
+            if linear_sum_assignment is not None:
+                weights = np.zeros((len(rows), len(cols)))
+                weights[row_index, col_index] = iou
+                r, c = linear_sum_assignment(weights, maximize=True)
+                keep = weights[r, c] > 0
+                r, c = r[keep], c[keep]
+                return rows[r], cols[c], weights[r, c]
+
+        # Greedy: take pairs in descending IoU, skipping used detections/interactions
+        order = np.lexsort((ii, di, -iou))
+        used_det = np.zeros(n_detections, dtype=bool)
+        used_int = np.zeros(n_interactions, dtype=bool)
+        selected = []
+        for k in order:
+            if not used_det[di[k]] and not used_int[ii[k]]:
+                used_det[di[k]] = used_int[ii[k]] = True
+                selected.append(k)
+        selected = np.asarray(selected, dtype=np.int64)
+        return di[selected], ii[selected], iou[selected]
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+TorchScript Checkpoint Variants
+Resolves which exported variant of a checkpoint to load. Variants are produced
+by the export_torchscript.py scripts under packages/third_party/webui-main-crawler/scripts
+"""
+
+import logging
+import os
+
+import torch
+
+# Variant name -> file suffix inserted before ".torchscript"
+#   fp32             - plain scripted/traced export (default)
+#   optimized        - torch.jit.freeze + optimize_for_inference
+#   channels_last    - frozen/optimized with NHWC weights; expects channels-last inputs
+#   int8_dynamic     - dynamic int8 quantization of Linear layers
+#   int8_static      - FX static int8 quantization calibrated on sample screenshots (classifier only)
+VARIANTS = ("fp32", "optimized", "channels_last", "int8_dynamic", "int8_static")
+
+# Variants each model can be exported as. The detector takes a list of 3D tensors and
+# batches them to NCHW internally, so channels_last inputs cannot be arranged for it.
+MODEL_VARIANTS = {
+    "detection": ("fp32", "optimized", "int8_dynamic"),
+    "classification": VARIANTS,
+}
+
+
+def variant_path(base_path: str, variant: str) -> str:
+    """Checkpoint path for a variant, e.g. model.torchscript -> model.int8_dynamic.torchscript"""
+    if variant == "fp32":
+        return base_path
+    root, ext = os.path.splitext(base_path)
+    return f"{root}.{variant}{ext}"
+
+
+def resolve_checkpoint(base_path: str, variant: str, supported: tuple = VARIANTS) -> tuple:
+    """
+    Pick the checkpoint file for the requested variant
+
+    Args:
+        base_path: Path of the plain fp32 export
+        variant: One of VARIANTS
+        supported: Variants this model can use (see MODEL_VARIANTS)
+
+    Returns:
+        (path, variant) actually used; falls back to fp32 when the variant is unknown,
+        unsupported for this model or not exported
+    """
+    variant = (variant or "fp32").lower()
+    if variant not in VARIANTS:
+        logging.warning(f"Unknown model variant '{variant}', using fp32")
+        return base_path, "fp32"
+    if variant not in supported:
+        logging.warning(f"Variant '{variant}' is not supported for {os.path.basename(base_path)}, using fp32")
+        return base_path, "fp32"
+    path = variant_path(base_path, variant)
+    if not os.path.exists(path):
+        if variant != "fp32":
+            logging.warning(f"Variant checkpoint {path} not found, using fp32")
+        return base_path, "fp32"
+    return path, variant
+
+
+def configured_variant(model_name: str) -> str:
+    """Variant from VISION_<MODEL>_VARIANT, falling back to VISION_MODEL_VARIANT"""
+    return os.getenv(f"VISION_{model_name.upper()}_VARIANT", os.getenv("VISION_MODEL_VARIANT", "fp32")).lower()
+
+
+def prepare_input(tensor: torch.Tensor, variant: str) -> torch.Tensor:
+    """Match the input memory format the variant was exported with"""
+    if variant == "channels_last" and tensor.dim() == 4:
+        return tensor.contiguous(memory_format=torch.channels_last)
+    return tensor
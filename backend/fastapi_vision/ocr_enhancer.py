@@ -11,10 +11,42 @@ from PIL import Image
 import io
 from typing import List, Dict, Any, Tuple
 import logging
+import os
+import threading
+from spatial_index import GridIndex, intersection_area
+
+# OCR strategies:
+#   "bbox" - run EasyOCR (detector + recognizer) on every detection crop
+#   "full" - run EasyOCR once over the whole screenshot and assign text boxes to detections
+#   "recognize" - skip text detection for short (single-line) crops and send them all to the
+#                 recognizer in batches; taller crops still go through the "bbox" path
+OCR_MODES = ("bbox", "full", "recognize")
+DEFAULT_OCR_MODE = os.getenv("OCR_MODE", "bbox").lower()
+
+# Crops narrower/shorter than this cannot be fed to the recognizer
+MIN_RECOGNIZE_SIDE = 4
 
 class OCREnhancer:
-    def __init__(self):
-        """Initialize EasyOCR reader"""
+    def __init__(self, mode: str = None, min_text_coverage: float = None):
+        """
+        Initialize EasyOCR reader
+
+        Args:
+            mode: Default OCR strategy (see OCR_MODES); falls back to the OCR_MODE env var
+            min_text_coverage: In "full" mode, fraction of a text box that must lie inside a
+                detection for its text to be assigned to it (OCR_MIN_TEXT_COVERAGE)
+        """
+        # "recognize" mode knobs: crops up to this height are treated as a single text line,
+        # and the recognizer processes this many crops per batch
+        self.recognize_max_height = int(os.getenv("OCR_RECOGNIZE_MAX_HEIGHT", "80"))
+        self.recognize_batch_size = int(os.getenv("OCR_RECOGNIZE_BATCH_SIZE", "16"))
+        self.mode = (mode or DEFAULT_OCR_MODE).lower()
+        if self.mode not in OCR_MODES:
+            logging.warning(f"Unknown OCR mode '{self.mode}', falling back to 'bbox'")
+            self.mode = "bbox"
+        self.min_text_coverage = float(
+            min_text_coverage if min_text_coverage is not None else os.getenv("OCR_MIN_TEXT_COVERAGE", "0.5")
+        )
         try:
             self.reader = easyocr.Reader(['en'])  # English only for now
             logging.info("✅ EasyOCR initialized successfully")
@@ -64,6 +96,120 @@ class OCREnhancer:
             logging.warning(f"OCR extraction failed for bbox {bbox}: {e}")
             return ""
     
+    def extract_text_from_bboxes_batched(self, image: np.ndarray, bboxes: List[List[float]]) -> List[str]:
+        """
+        Recognize text in many single-line crops with one batched recognizer call
+
+        Skips EasyOCR's text-detection stage: every bbox is treated as one text line
+        and all crops are recognized together in batches of `recognize_batch_size`.
+        
+        Args:
+            image: numpy array of the image
+            bboxes: [x1, y1, x2, y2] coordinates, one per crop
+            
+        Returns:
+            Extracted text per bbox, in input order
+        """
+        texts = [""] * len(bboxes)
+        if self.reader is None or not bboxes:
+            return texts
+
+        height, width = image.shape[:2]
+        horizontal_list = []
+        owners = {}
+        for i, bbox in enumerate(bboxes):
+            if len(bbox) != 4:
+                continue
+            x1, y1, x2, y2 = map(int, bbox)
+            x1, x2 = max(0, min(x1, width)), max(0, min(x2, width))
+            y1, y2 = max(0, min(y1, height)), max(0, min(y2, height))
+            if x2 - x1 < MIN_RECOGNIZE_SIDE or y2 - y1 < MIN_RECOGNIZE_SIDE:
+                continue
+            # EasyOCR horizontal boxes are [x_min, x_max, y_min, y_max]
+            key = (x1, x2, y1, y2)
+            if key not in owners:
+                owners[key] = []
+                horizontal_list.append(list(key))
+            owners[key].append(i)
+
+        if not horizontal_list:
+            return texts
+
+        try:
+            grey = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+            results = self.reader.recognize(
+                grey,
+                horizontal_list=horizontal_list,
+                free_list=[],
+                batch_size=self.recognize_batch_size,
+                detail=1,
+                paragraph=False
+            )
+            # The recognizer reorders crops, so map results back through their box corners
+            for box, text, _ in results:
+                (x_min, y_min), _, (x_max, y_max), _ = box
+                for i in owners.get((int(x_min), int(x_max), int(y_min), int(y_max)), []):
+                    texts[i] = text.strip()
+        except Exception as e:
+            logging.warning(f"Batched OCR recognition failed for {len(horizontal_list)} crops: {e}")
+
+        return texts
+
+    def extract_text_boxes(self, image: np.ndarray) -> List[Tuple[List[float], str]]:
+        """
+        Run OCR once over the whole image
+
+        Args:
+            image: numpy array of the image
+
+        Returns:
+            List of ([x1, y1, x2, y2], text) tuples in EasyOCR's reading order
+        """
+        if self.reader is None:
+            return []
+
+        try:
+            text_boxes = []
+            for points, text, _ in self.reader.readtext(image):
+                xs = [float(point[0]) for point in points]
+                ys = [float(point[1]) for point in points]
+                text_boxes.append(([min(xs), min(ys), max(xs), max(ys)], text))
+            return text_boxes
+        except Exception as e:
+            logging.warning(f"Full-image OCR failed: {e}")
+            return []
+
+    def assign_text_to_detections(self, text_boxes: List[Tuple[List[float], str]], detections: List[Dict[str, Any]]) -> List[str]:
+        """
+        Assign full-image OCR text boxes to detections by containment
+
+        A text box is assigned to every detection that covers at least
+        `min_text_coverage` of its area, so nested elements (a button inside a
+        card) both see the text, as they would with per-bbox OCR.
+
+        Args:
+            text_boxes: Output of extract_text_boxes
+            detections: List of detection dictionaries from Vision API
+
+        Returns:
+            Extracted text per detection, in detection order
+        """
+        index = GridIndex.build([box for box, _ in text_boxes])
+        texts = []
+        for detection in detections:
+            bbox = detection.get('bbox', []) if isinstance(detection, dict) else []
+            if len(bbox) != 4:
+                texts.append("")
+                continue
+            matched = []
+            for i in sorted(index.query(bbox)):
+                box, text = text_boxes[i]
+                area = (box[2] - box[0]) * (box[3] - box[1])
+                if area > 0 and intersection_area(box, bbox) / area >= self.min_text_coverage:
+                    matched.append(text)
+            texts.append(" ".join(matched).strip())
+        return texts
+
     def enhance_element_classification(self, element_class: str, text: str, bbox: List[float]) -> str:
         """
         Enhance element classification based on extracted text and context
@@ -163,28 +309,51 @@ class OCREnhancer:
         # Default: return original class if no enhancement possible
         return element_class
     
-    def enhance_detections(self, image: np.ndarray, detections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def enhance_detections(self, image: np.ndarray, detections: List[Dict[str, Any]], mode: str = None) -> List[Dict[str, Any]]:
         """
         Enhance all detections with OCR and improved classifications
         
         Args:
             image: numpy array of the image
             detections: List of detection dictionaries from Vision API
+            mode: OCR strategy for this call (see OCR_MODES); defaults to self.mode
             
         Returns:
             Enhanced detections with specific classifications and extracted text
         """
         enhanced_detections = []
+        detections = [detection for detection in detections if isinstance(detection, dict)]
+        mode = (mode or self.mode).lower()
+
+        if mode == "full":
+            texts = self.assign_text_to_detections(self.extract_text_boxes(image), detections)
+        elif mode == "recognize":
+            # Single-line crops go to the recognizer in one batch; taller ones keep the bbox path
+            bboxes = [detection.get('bbox', []) for detection in detections]
+            single_line = [
+                i for i, bbox in enumerate(bboxes)
+                if len(bbox) == 4 and bbox[3] - bbox[1] <= self.recognize_max_height
+            ]
+            batched_texts = self.extract_text_from_bboxes_batched(image, [bboxes[i] for i in single_line])
+            texts = [None] * len(detections)
+            for i, text in zip(single_line, batched_texts):
+                texts[i] = text
+            texts = [
+                text if text is not None else self.extract_text_from_bbox(image, bboxes[i])
+                for i, text in enumerate(texts)
+            ]
+        else:
+            texts = None
         
-        for detection in detections:
-            if not isinstance(detection, dict):
-                continue
-                
+        for i, detection in enumerate(detections):
             bbox = detection.get('bbox', [])
             original_class = detection.get('class', 'Unknown')
             
             # Extract text from the bounding box
-            extracted_text = self.extract_text_from_bbox(image, bbox)
+            if texts is not None:
+                extracted_text = texts[i]
+            else:
+                extracted_text = self.extract_text_from_bbox(image, bbox)
             
             # Enhance classification based on text
             enhanced_class = self.enhance_element_classification(original_class, extracted_text, bbox)
@@ -204,10 +373,13 @@ class OCREnhancer:
 
 # Global OCR enhancer instance
 ocr_enhancer = None
+ocr_enhancer_lock = threading.Lock()
 
 def get_ocr_enhancer() -> OCREnhancer:
     """Get or create global OCR enhancer instance"""
     global ocr_enhancer
     if ocr_enhancer is None:
-        ocr_enhancer = OCREnhancer()
+        with ocr_enhancer_lock:
+            if ocr_enhancer is None:
+                ocr_enhancer = OCREnhancer()
     return ocr_enhancer 
\ No newline at end of file
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed Result Cache
+Caches vision results keyed by a hash of the image bytes, the model checkpoint
+identity and the inference parameters, with an in-memory LRU tier and an
+optional size-bounded on-disk tier
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+
+@lru_cache(maxsize=None)
+def checkpoint_identity(path: str) -> str:
+    """Identify a checkpoint file by name, size and modification time (cheap, no full read)"""
+    try:
+        stat = os.stat(path)
+        return f"{os.path.basename(path)}:{stat.st_size}:{int(stat.st_mtime)}"
+    except OSError:
+        return os.path.basename(path)
+
+
+class ResultCache:
+    def __init__(self, max_entries: int = 1024, disk_dir: Optional[str] = None, disk_max_bytes: int = 512 * 1024 * 1024):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Entries kept in the memory LRU tier (0 disables it)
+            disk_dir: Directory for the on-disk tier (None disables it)
+            disk_max_bytes: Total size the disk tier may use before evicting oldest entries
+        """
+        self.logger = logging.getLogger(__name__)
+        self.max_entries = max(0, max_entries)
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._disk_bytes = sum(
+                entry.stat().st_size for entry in os.scandir(self.disk_dir) if entry.name.endswith(".json")
+            )
+
+    @classmethod
+    def from_env(cls) -> "ResultCache":
+        """Build a cache configured by VISION_CACHE_* env vars; disk tier lives under DATA_DIR"""
+        disk_dir = None
+        if os.getenv("VISION_CACHE_DISK", "false").lower() in ("1", "true", "yes"):
+            disk_dir = os.path.join(os.getenv("DATA_DIR", "data"), "vision_cache")
+        return cls(
+            max_entries=int(os.getenv("VISION_CACHE_MAX_ENTRIES", "1024")),
+            disk_dir=disk_dir,
+            disk_max_bytes=int(float(os.getenv("VISION_CACHE_DISK_MAX_MB", "512")) * 1024 * 1024)
+        )
+
+    @staticmethod
+    def make_key(namespace: str, image_bytes: bytes, model_identity: str, **params) -> str:
+        """Build a cache key from the image content, the model identity and inference parameters"""
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        param_str = json.dumps(params, sort_keys=True)
+        scope = hashlib.sha256(f"{namespace}|{model_identity}|{param_str}".encode("utf-8")).hexdigest()[:16]
+        return f"{namespace}-{scope}-{digest}"
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Any]:
+        """Look a key up in memory, then on disk (promoting disk hits to memory)"""
+        value = self._get_memory(key)
+        if value is None:
+            value = self._get_disk(key)
+        return value
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """get for async callers: memory hits are served inline, disk reads run in a worker thread"""
+        value = self._get_memory(key)
+        if value is None:
+            value = await asyncio.to_thread(self._get_disk, key) if self.disk_dir else self._get_disk(key)
+        return value
+
+    def put(self, key: str, value: Any):
+        """Store a JSON-serializable value in both tiers"""
+        self._put_memory(key, value)
+        if self.disk_dir:
+            self._put_disk(key, value)
+
+    async def aput(self, key: str, value: Any):
+        """put for async callers: the disk write and any eviction scan run in a worker thread"""
+        self._put_memory(key, value)
+        if self.disk_dir:
+            await asyncio.to_thread(self._put_disk, key, value)
+
+    def _get_memory(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return self._memory[key]
+        return None
+
+    def _get_disk(self, key: str) -> Optional[Any]:
+        """Disk tier lookup (blocking file IO); counts a miss when the key is not found"""
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    value = json.load(f)
+                os.utime(path)  # mark as recently used for eviction
+                with self._lock:
+                    self.counters["disk_hits"] += 1
+                self._put_memory(key, value)
+                return value
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                self.logger.warning(f"Dropping unreadable cache entry {path}: {e}")
+                self._remove_disk(path)
+
+        with self._lock:
+            self.counters["misses"] += 1
+        return None
+
+    def _put_disk(self, key: str, value: Any):
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            payload = json.dumps(value).encode("utf-8")
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+            existing = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            with self._lock:
+                self._disk_bytes += len(payload) - existing
+            self._evict_disk()
+        except Exception as e:
+            self.logger.warning(f"Failed to write cache entry {path}: {e}")
+
+    def _put_memory(self, key: str, value: Any):
+        if self.max_entries == 0:
+            return
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def _remove_disk(self, path: str):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            with self._lock:
+                self._disk_bytes -= size
+        except OSError:
+            pass
+
+    def _evict_disk(self):
+        """Remove least recently used files until the disk tier fits its budget"""
+        if self._disk_bytes <= self.disk_max_bytes:
+            return
+        entries = sorted(
+            (entry for entry in os.scandir(self.disk_dir) if entry.name.endswith(".json")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in entries:
+            if self._disk_bytes <= self.disk_max_bytes:
+                break
+            self._remove_disk(entry.path)
+            with self._lock:
+                self.counters["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+            lookups = hits + self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_max_entries": self.max_entries,
+                "disk_enabled": bool(self.disk_dir),
+                "disk_bytes": self._disk_bytes,
+                "disk_max_bytes": self.disk_max_bytes
+            }
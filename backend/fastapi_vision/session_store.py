@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Columnar Session Store
+Persists consolidated detections and tracked interactions as Parquet files
+partitioned by session and by day (hive layout), so dashboards and
+re-analysis read only the sessions, days and columns they need: partition
+filters prune whole directories and column filters are pushed down to the
+Parquet row groups.
+
+Layout:
+    <root>/detections/session_id=<id>/day=<YYYY-MM-DD>/part-*.parquet
+    <root>/interactions/session_id=<id>/day=<YYYY-MM-DD>/part-*.parquet
+
+Requirements:
+    pyarrow (listed in requirements.txt)
+
+Usage (convert existing JSON analysis results):
+    python session_store.py ../springboot/ux_beta/uploads/analysis-results/ [--store data/session_store]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from columnar import ColumnarDetections, ColumnarDetectionsBuilder
+from tracking_ingest import MISSING_TIMESTAMP, TrackingBatch, TrackingBatchBuilder
+
+TABLES = ('detections', 'interactions')
+PARTITION_COLUMNS = ('session_id', 'day')
+
+# analysis_<uuid>_<YYYY-MM-DD_HH-MM-SS>.json, as written by the Spring Boot file storage service
+_RESULT_FILE_RE = re.compile(r"^analysis_(?P<id>.+)_(?P<date>\d{4}-\d{2}-\d{2})_\d{2}-\d{2}-\d{2}\.json$")
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.dataset  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError("The session store requires the pyarrow package") from e
+
+
+def today() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+
+def _strings(values: Sequence[Any], codes: np.ndarray):
+    """Arrow string array of values[code] (null where code < 0)"""
+    import pyarrow as pa
+
+    dictionary = pa.array([None if v is None else str(v) for v in values], type=pa.string())
+    return dictionary.take(pa.array(codes, mask=codes < 0))
+
+
+def _extras(extras: Dict[int, Dict[str, Any]], n: int):
+    """Fields without a column, as one JSON string per row (null when none)"""
+    import pyarrow as pa
+
+    column = [None] * n
+    for row, fields in extras.items():
+        column[row] = json.dumps(fields, ensure_ascii=False, default=str)
+    return pa.array(column, type=pa.string())
+
+
+def detections_table(columns: ColumnarDetections):
+    """Arrow table (without partition columns) for a ColumnarDetections"""
+    import pyarrow as pa
+
+    image_names = [name for name, _ in columns.images]
+    image_indices = np.array(
+        [index if isinstance(index, int) else -1 for _, index in columns.images], dtype=np.int32
+    )
+    boxes = columns.bboxes
+    return pa.table({
+        'image_name': _strings(image_names, columns.image_ids),
+        'image_index': pa.array(image_indices[columns.image_ids] if len(columns) else np.empty(0, np.int32)),
+        'class': _strings(columns.classes, columns.class_ids),
+        'confidence': pa.array(columns.confidences, from_pandas=True),
+        'x1': pa.array(boxes[:, 0], from_pandas=True),
+        'y1': pa.array(boxes[:, 1], from_pandas=True),
+        'x2': pa.array(boxes[:, 2], from_pandas=True),
+        'y2': pa.array(boxes[:, 3], from_pandas=True),
+        'original_class': _strings(columns.classes, columns.original_class_ids),
+        'extracted_text': pa.array(columns.texts.tolist(), type=pa.string()),
+        'has_text': pa.array(columns.has_text == 1, mask=columns.has_text < 0),
+        'extra': _extras(columns.extras, len(columns)),
+    })
+
+
+def interactions_table(batch: TrackingBatch):
+    """Arrow table (without partition columns) for a TrackingBatch, plus each row's UTC day"""
+    import pyarrow as pa
+
+    data = batch.columns
+    strings = batch.strings.values
+    timestamps = data['timestamp']
+    missing = timestamps == MISSING_TIMESTAMP
+    links = pa.ListArray.from_arrays(
+        pa.array(batch.link_offsets.astype(np.int32)),
+        _strings(strings, batch.link_ids),
+        mask=pa.array(~data['has_links'])
+    )
+    boxes = data['bbox']
+    table = pa.table({
+        'event_session_id': _strings(batch.keys.values, data['sessionId']),
+        'timestamp': pa.array(np.where(missing, 0, timestamps), type=pa.timestamp('ms', tz='UTC'), mask=missing),
+        'interaction_type': _strings(strings, data['interactionType']),
+        'element_type': _strings(strings, data['elementType']),
+        'image_name': _strings(strings, data['imageName']),
+        'section_id': _strings(strings, data['sectionId']),
+        'title': pa.array(data['title'].tolist(), type=pa.string()),
+        'text_snippet': pa.array(data['textSnippet'].tolist(), type=pa.string()),
+        'links': links,
+        'interaction_count': pa.array(data['interactionCount'], mask=data['interactionCount'] < 0),
+        'time_spent': pa.array(data['timeSpent'], from_pandas=True),
+        'scroll_depth': pa.array(data['scrollDepth'], from_pandas=True),
+        'x1': pa.array(boxes[:, 0], from_pandas=True),
+        'y1': pa.array(boxes[:, 1], from_pandas=True),
+        'x2': pa.array(boxes[:, 2], from_pandas=True),
+        'y2': pa.array(boxes[:, 3], from_pandas=True),
+        'extra': _extras(batch.extras, len(batch)),
+    })
+    days = np.where(missing, 0, timestamps).astype('datetime64[ms]').astype('datetime64[D]').astype(str)
+    return table, np.where(missing, None, days)
+
+
+class SessionStore:
+    def __init__(self, root: str):
+        """
+        Initialize the store
+
+        Args:
+            root: Directory holding one partitioned dataset per table
+        """
+        _require_pyarrow()
+        self.root = Path(root)
+
+    def _write(self, table_name: str, table, session_id: str, days: Union[str, Sequence[str]],
+               source: Optional[str] = None):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        # Files of a source are named part-<source key>-<write id>-<i>.parquet
+        prefix = f"part-{hashlib.sha1(source.encode('utf-8')).hexdigest()[:16]}-" if source is not None else "part-"
+        write_id = uuid.uuid4().hex
+        written = 0
+        if table.num_rows:
+            day_column = [days] * table.num_rows if isinstance(days, str) else list(days)
+            table = table.append_column('session_id', pa.array([str(session_id)] * table.num_rows, type=pa.string()))
+            table = table.append_column('day', pa.array(day_column, type=pa.string()))
+            ds.write_dataset(
+                table,
+                self.root / table_name,
+                format='parquet',
+                partitioning=ds.partitioning(pa.schema([('session_id', pa.string()), ('day', pa.string())]), flavor='hive'),
+                # New files next to existing ones: writes append, they never rewrite a partition
+                basename_template=f"{prefix}{write_id}-{{i}}.parquet",
+                existing_data_behavior='overwrite_or_ignore',
+            )
+            written = table.num_rows
+        if source is not None and (self.root / table_name).exists():
+            # Replace what earlier writes of the same source stored, once the new files are in place
+            for path in (self.root / table_name).rglob(f"{prefix}*.parquet"):
+                if not path.name.startswith(f"{prefix}{write_id}-"):
+                    path.unlink()
+        return written
+
+    def write_detections(self, session_id: str, detections: Union[ColumnarDetections, Dict[str, Any]],
+                         day: Optional[str] = None, source: Optional[str] = None) -> int:
+        """
+        Append a session's consolidated detections
+
+        Args:
+            session_id: Analysis / session id (partition key)
+            detections: ColumnarDetections, or consolidated vision data (compact or not)
+            day: Partition day (YYYY-MM-DD), today (UTC) by default
+            source: Where the rows come from (e.g. a result file path); rows an earlier
+                    write stored for the same source are replaced instead of duplicated
+
+        Returns:
+            Rows written
+        """
+        if isinstance(detections, dict):
+            detections = _vision_columns(detections)
+        return self._write('detections', detections_table(detections), session_id, day or today(), source)
+
+    def write_interactions(self, session_id: str, interactions: Union[TrackingBatch, Iterable[Dict[str, Any]]],
+                           day: Optional[str] = None, source: Optional[str] = None) -> int:
+        """
+        Append a session's tracked interactions, partitioned by each event's UTC day
+
+        Args:
+            session_id: Analysis / session id (partition key)
+            interactions: TrackingBatch (tracking_ingest) or interaction dicts
+            day: Partition day for events without a timestamp, today (UTC) by default
+            source: Where the rows come from (e.g. a result file path); rows an earlier
+                    write stored for the same source are replaced instead of duplicated
+
+        Returns:
+            Rows written
+        """
+        if not isinstance(interactions, TrackingBatch):
+            builder = TrackingBatchBuilder()
+            for interaction in interactions:
+                builder.add(interaction)
+            interactions = builder.build()
+        table, days = interactions_table(interactions)
+        fallback = day or today()
+        return self._write('interactions', table, session_id, [d if d is not None else fallback for d in days],
+                           source)
+
+    def dataset(self, table_name: str):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        if table_name not in TABLES:
+            raise ValueError(f"Unknown table {table_name!r}; expected one of {TABLES}")
+        partitioning = ds.partitioning(pa.schema([('session_id', pa.string()), ('day', pa.string())]), flavor='hive')
+        return ds.dataset(self.root / table_name, format='parquet', partitioning=partitioning)
+
+    def read(self, table_name: str, columns: Optional[List[str]] = None, sessions: Optional[Iterable[str]] = None,
+             start_day: Optional[str] = None, end_day: Optional[str] = None, filter=None):
+        """
+        Read a table with partition pruning, predicate pushdown and column projection
+
+        Args:
+            table_name: 'detections' or 'interactions'
+            columns: Columns to load (all by default); partition columns may be included
+            sessions: Only these session ids
+            start_day: First day (YYYY-MM-DD, inclusive)
+            end_day: Last day (YYYY-MM-DD, inclusive)
+            filter: Extra pyarrow.dataset expression, e.g. ds.field('confidence') > 0.5
+
+        Returns:
+            pyarrow.Table
+        """
+        import pyarrow.dataset as ds
+
+        if not (self.root / table_name).exists():
+            raise FileNotFoundError(f"No {table_name} stored under {self.root}")
+        expression = None
+        conditions = []
+        if sessions is not None:
+            conditions.append(ds.field('session_id').isin([str(s) for s in sessions]))
+        if start_day:
+            conditions.append(ds.field('day') >= start_day)
+        if end_day:
+            conditions.append(ds.field('day') <= end_day)
+        if filter is not None:
+            conditions.append(filter)
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return self.dataset(table_name).to_table(columns=columns, filter=expression)
+
+    def sessions(self, table_name: str) -> List[str]:
+        """Session ids stored for a table (from the directory names only)"""
+        directory = self.root / table_name
+        if not directory.exists():
+            return []
+        from urllib.parse import unquote
+
+        return sorted(unquote(p.name.split('=', 1)[1]) for p in directory.glob('session_id=*') if p.is_dir())
+
+
+def _vision_columns(vision: Any) -> ColumnarDetections:
+    """ColumnarDetections from consolidated vision data (compact, to_dict or dict-based) or raw vision results"""
+    if isinstance(vision, dict):
+        detections = vision.get('detections')
+        if isinstance(detections, ColumnarDetections):
+            return detections
+        if isinstance(detections, dict):
+            return ColumnarDetections.from_dict(detections)
+        builder = ColumnarDetectionsBuilder()
+        if isinstance(detections, list):
+            # A single /analyze result
+            builder.add_image(vision.get('imageName', 'Image_1'), vision.get('imageIndex', 0), detections)
+            return builder.build()
+        # Dict-based consolidation: regroup all_detections by image, in order of appearance
+        images: Dict[Tuple[Any, Any], List[Dict[str, Any]]] = {}
+        for detection in vision.get('all_detections', []):
+            if isinstance(detection, dict):
+                key = (detection.get('image_name'), detection.get('image_index'))
+                images.setdefault(key, []).append(detection)
+        for (image_name, image_index), detections in images.items():
+            builder.add_image(image_name, image_index, detections)
+        return builder.build()
+    builder = ColumnarDetectionsBuilder()
+    for i, vision_result in enumerate(vision or []):
+        if isinstance(vision_result, dict) and 'detections' in vision_result:
+            builder.add_image(vision_result.get('imageName', f'Image_{i+1}'), vision_result.get('imageIndex', i),
+                              vision_result['detections'])
+    return builder.build()
+
+
+def _tracked_interactions(tracked: Any) -> Iterator[Dict[str, Any]]:
+    """Interactions from consolidated tracked data or a raw tracked_data list (entries or per-session lists)"""
+    if isinstance(tracked, dict):
+        entries = tracked.get('all_interactions', [])
+    else:
+        entries = tracked or []
+    for entry in entries:
+        if isinstance(entry, dict):
+            yield entry
+        elif isinstance(entry, list):
+            yield from (interaction for interaction in entry if isinstance(interaction, dict))
+
+
+def convert_result_file(store: SessionStore, path: Path) -> Tuple[int, int]:
+    """
+    Store the detections and interactions of one JSON analysis result
+
+    Understands unified payloads (create_unified_analysis_payload), LLM query
+    requests ({"vision": [...], "tracked_data": [...]}) and single /analyze
+    results. The session is the file's analysis_id (or the id in its name),
+    the day is taken from the file name, falling back to its modification time.
+    Converting the same file again replaces its rows rather than adding a copy.
+
+    Returns:
+        (detections written, interactions written)
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        return 0, 0
+
+    match = _RESULT_FILE_RE.match(path.name)
+    session_id = str(data.get('analysis_id') or (match.group('id') if match else path.stem))
+    day = match.group('date') if match else \
+        datetime.fromtimestamp(path.stat().st_mtime, tz=timezone.utc).strftime('%Y-%m-%d')
+
+    source = str(path.resolve())
+    detections = interactions = 0
+    vision = data.get('vision', data if 'detections' in data else None)
+    if vision is not None:
+        detections = store.write_detections(session_id, _vision_columns(vision), day, source)
+    if 'tracked_data' in data:
+        interactions = store.write_interactions(session_id, _tracked_interactions(data['tracked_data']), day, source)
+    return detections, interactions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sources', nargs='+', help='JSON result files or directories')
+    parser.add_argument('--store', default=os.path.join(os.getenv('DATA_DIR', 'data'), 'session_store'))
+    args = parser.parse_args()
+
+    store = SessionStore(args.store)
+    files = []
+    for source in args.sources:
+        path = Path(source)
+        if path.is_dir():
+            files.extend(sorted(path.rglob('*.json')))
+        elif path.is_file():
+            files.append(path)
+        else:
+            sys.exit(f"Source not found: {source}")
+
+    totals = {'files': 0, 'skipped': 0, 'detections': 0, 'interactions': 0}
+    for path in files:
+        try:
+            detections, interactions = convert_result_file(store, path)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Skipping {path}: {e}")
+            totals['skipped'] += 1
+            continue
+        if detections or interactions:
+            totals['files'] += 1
+        else:
+            totals['skipped'] += 1
+        totals['detections'] += detections
+        totals['interactions'] += interactions
+
+    print(f"✅ Converted into {args.store}: " + ", ".join(f"{key}: {value}" for key, value in totals.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Spatial Index for Bounding Boxes
+Uniform grid that returns candidate boxes overlapping a query box without
+scanning every box, plus a vectorized grid join for matching two box sets
+"""
+
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+import numpy as np
+
+
+class GridIndex:
+    def __init__(self, cell_size: float = 64.0):
+        """
+        Initialize an empty grid index
+
+        Args:
+            cell_size: Side length of a grid cell in pixels
+        """
+        self.cell_size = max(1.0, float(cell_size))
+        self.cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self.boxes: Dict[int, Sequence[float]] = {}
+
+    @classmethod
+    def build(cls, boxes: Sequence[Sequence[float]], cell_size: float = None) -> "GridIndex":
+        """
+        Build an index over [x1, y1, x2, y2] boxes, keyed by their position in the list
+
+        Args:
+            boxes: Boxes to index; malformed entries are skipped
+            cell_size: Grid cell size; defaults to the median box side so most boxes span few cells
+        """
+        valid = [(i, box) for i, box in enumerate(boxes) if len(box) == 4]
+        if cell_size is None:
+            sides = sorted(max(box[2] - box[0], box[3] - box[1]) for _, box in valid)
+            cell_size = sides[len(sides) // 2] if sides else 64.0
+        index = cls(cell_size)
+        for i, box in valid:
+            index.insert(i, box)
+        return index
+
+    def _cell_range(self, bbox: Sequence[float]) -> Iterable[Tuple[int, int]]:
+        x1, y1, x2, y2 = bbox
+        cx1, cy1 = math.floor(x1 / self.cell_size), math.floor(y1 / self.cell_size)
+        cx2, cy2 = math.floor(x2 / self.cell_size), math.floor(y2 / self.cell_size)
+        for cx in range(cx1, cx2 + 1):
+            for cy in range(cy1, cy2 + 1):
+                yield cx, cy
+
+    def insert(self, item_id: int, bbox: Sequence[float]):
+        """Add a box to every cell it touches"""
+        self.boxes[item_id] = bbox
+        for cell in self._cell_range(bbox):
+            self.cells[cell].append(item_id)
+
+    def query(self, bbox: Sequence[float]) -> Set[int]:
+        """Return ids of indexed boxes that intersect the query box"""
+        if len(bbox) != 4:
+            return set()
+        x1, y1, x2, y2 = bbox
+        candidates = set()
+        for cell in self._cell_range(bbox):
+            candidates.update(self.cells.get(cell, ()))
+        return {
+            item_id for item_id in candidates
+            if self.boxes[item_id][0] < x2 and self.boxes[item_id][2] > x1
+            and self.boxes[item_id][1] < y2 and self.boxes[item_id][3] > y1
+        }
+
+
+def intersection_area(bbox1: Sequence[float], bbox2: Sequence[float]) -> float:
+    """Area of the overlap between two [x1, y1, x2, y2] boxes"""
+    width = min(bbox1[2], bbox2[2]) - max(bbox1[0], bbox2[0])
+    height = min(bbox1[3], bbox2[3]) - max(bbox1[1], bbox2[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    return width * height
+
+
+def _explode_cells(boxes: np.ndarray, cell_size: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """One (box id, cell x, cell y) row per grid cell each box touches (inverted boxes touch none)"""
+    cx1 = np.floor(boxes[:, 0] / cell_size).astype(np.int64)
+    cy1 = np.floor(boxes[:, 1] / cell_size).astype(np.int64)
+    cx2 = np.floor(boxes[:, 2] / cell_size).astype(np.int64)
+    cy2 = np.floor(boxes[:, 3] / cell_size).astype(np.int64)
+    heights = np.maximum(cy2 - cy1 + 1, 0)
+    counts = np.maximum(cx2 - cx1 + 1, 0) * heights
+    ids = np.repeat(np.arange(len(boxes)), counts)
+    local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return ids, cx1[ids] + local // heights[ids], cy1[ids] + local % heights[ids], counts
+
+
+def intersecting_pairs(boxes1: np.ndarray, boxes2: np.ndarray, cell_size: float = None,
+                       chunk_size: int = 1024) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized grid join: every (i, j) with boxes1[i] and boxes2[j] overlapping
+
+    Both box sets are bucketed into grid cells with NumPy, candidates are the
+    pairs sharing a cell, and each pair is kept once (in the cell holding the
+    top-left corner of the overlap) and only if the boxes really intersect.
+
+    Args:
+        boxes1: (N, 4) array of [x1, y1, x2, y2] boxes
+        boxes2: (M, 4) array of [x1, y1, x2, y2] boxes
+        cell_size: Grid cell size; defaults to the median box side of boxes2
+        chunk_size: Rows of boxes1 joined at a time, bounding peak memory
+
+    Returns:
+        (indices into boxes1, indices into boxes2) of the overlapping pairs
+    """
+    empty = np.empty(0, dtype=np.int64)
+    # Boxes with non-finite coordinates have no grid cells; they intersect nothing
+    rows1 = np.flatnonzero(np.isfinite(boxes1).all(axis=1))
+    rows2 = np.flatnonzero(np.isfinite(boxes2).all(axis=1))
+    if len(rows1) < len(boxes1) or len(rows2) < len(boxes2):
+        a, b = intersecting_pairs(boxes1[rows1], boxes2[rows2], cell_size, chunk_size)
+        return rows1[a], rows2[b]
+    if len(boxes1) == 0 or len(boxes2) == 0:
+        return empty, empty
+    if cell_size is None:
+        sides = np.maximum(boxes2[:, 2] - boxes2[:, 0], boxes2[:, 3] - boxes2[:, 1])
+        cell_size = float(np.median(sides)) or 64.0
+    cell_size = max(1.0, cell_size)
+
+    ids2, cx2, cy2, _ = _explode_cells(boxes2, cell_size)
+    # Cells as single sortable keys (offset so negative coordinates stay ordered)
+    offset = min(cx2.min(), cy2.min(), np.floor(boxes1[:, :2].min() / cell_size)) - 1
+    width = int(max(cx2.max(), cy2.max(), np.floor(boxes1[:, 2:].max() / cell_size)) - offset) + 2
+    keys2 = (cx2 - offset) * width + (cy2 - offset)
+    order = np.argsort(keys2, kind='stable')
+    keys2, ids2 = keys2[order], ids2[order]
+
+    x1_2, y1_2, x2_2, y2_2 = (np.ascontiguousarray(boxes2[:, k]) for k in range(4))
+    rows, cols = [], []
+    for start in range(0, len(boxes1), chunk_size):
+        chunk = boxes1[start:start + chunk_size]
+        x1_1, y1_1, x2_1, y2_1 = (np.ascontiguousarray(chunk[:, k]) for k in range(4))
+        ids1, cx1, cy1, _ = _explode_cells(chunk, cell_size)
+        keys1 = (cx1 - offset) * width + (cy1 - offset)
+        lo = np.searchsorted(keys2, keys1, side='left')
+        hi = np.searchsorted(keys2, keys1, side='right')
+        lengths = hi - lo
+        total = lengths.sum()
+        if total == 0:
+            continue
+        a = np.repeat(ids1, lengths)
+        cell_x, cell_y = np.repeat(cx1, lengths), np.repeat(cy1, lengths)
+        b = ids2[np.repeat(lo - (np.cumsum(lengths) - lengths), lengths) + np.arange(total)]
+
+        # Test x on gathered columns first, then y on the survivors only (gathers dominate the cost)
+        x1 = np.maximum(x1_1[a], x1_2[b])
+        keep = (x1 < np.minimum(x2_1[a], x2_2[b])) & (np.floor(x1 / cell_size) == cell_x)
+        a, b, cell_y = a[keep], b[keep], cell_y[keep]
+        y1 = np.maximum(y1_1[a], y1_2[b])
+        keep = (y1 < np.minimum(y2_1[a], y2_2[b])) & (np.floor(y1 / cell_size) == cell_y)
+        rows.append(a[keep] + start)
+        cols.append(b[keep])
+
+    if not rows:
+        return empty, empty
+    return np.concatenate(rows), np.concatenate(cols)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Service modules import each other as top-level modules (as in main.py and the benchmarks)
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
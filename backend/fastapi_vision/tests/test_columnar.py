@@ -0,0 +1,62 @@
+import json
+
+from columnar import ColumnarDetections, ColumnarDetectionsBuilder, element_category
+from consolidator import DataConsolidator
+
+# Coordinates and confidences exactly representable in float32, so round trips compare equal
+DETECTIONS = [
+    {'class': 'Button', 'confidence': 0.75, 'bbox': [0.5, 1.0, 20.0, 10.25], 'extracted_text': 'Sign in', 'has_text': True},
+    {'class': 'Input', 'confidence': 0.5, 'bbox': [0, 20, 100, 30], 'original_class': 'TextField'},
+    {'confidence': 0.25, 'bbox': 'not a box', 'score_details': {'nms': 1}},
+    {'class': 'Image', 'bbox': [1, 2, 3]},
+]
+
+
+def build():
+    builder = ColumnarDetectionsBuilder()
+    builder.add_image('home.png', 0, DETECTIONS[:2])
+    builder.add_image('about.png', 1, DETECTIONS[2:])
+    return builder.build()
+
+
+def expected(row):
+    image = ('home.png', 0) if row < 2 else ('about.png', 1)
+    detection = {key: value for key, value in DETECTIONS[row].items()}
+    if isinstance(detection.get('bbox'), list) and len(detection['bbox']) == 4:
+        detection['bbox'] = [float(v) for v in detection['bbox']]
+    return {**detection, 'image_name': image[0], 'image_index': image[1]}
+
+
+def test_detections_round_trip_including_malformed_fields():
+    columns = build()
+    assert len(columns) == 4
+    assert [columns.detection(row) for row in range(4)] == [expected(row) for row in range(4)]
+    assert columns.bbox_valid.tolist() == [True, True, False, False]
+
+
+def test_to_dict_survives_json():
+    columns = build()
+    restored = ColumnarDetections.from_dict(json.loads(json.dumps(columns.to_dict())))
+    assert [restored.detection(row) for row in range(4)] == [columns.detection(row) for row in range(4)]
+    assert {name: rows.tolist() for name, rows in restored.by_image.items()} == {'home.png': [0, 1], 'about.png': [2, 3]}
+
+
+def test_compact_consolidation_expands_to_the_dict_layout():
+    vision_results = [
+        {'imageName': 'home.png', 'detections': DETECTIONS[:2], 'classification': {'label': 'Login', 'confidence': 0.9}},
+        {'imageName': 'about.png', 'detections': DETECTIONS[2:], 'classification': {'label': 'About', 'confidence': 0.5}},
+    ]
+    consolidator = DataConsolidator()
+    compact = consolidator.consolidate_vision_data(vision_results, compact=True)
+    legacy = consolidator.consolidate_vision_data(vision_results)
+    expanded = consolidator.expand_vision_data(compact)
+
+    for key in ('all_detections', 'detections_by_type', 'detections_by_image', 'enhanced_elements'):
+        assert expanded[key] == legacy[key], key
+    assert expanded['summary'] == legacy['summary']
+    assert expanded['overall_classification'] == legacy['overall_classification']
+
+
+def test_element_category():
+    assert element_category('IconButton') == element_category('Button')
+    assert element_category('TextField') != element_category('Button')
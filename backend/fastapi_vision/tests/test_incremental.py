@@ -0,0 +1,108 @@
+import random
+
+import pytest
+
+from consolidator import DataConsolidator
+from incremental import DistinctCounter, IncrementalConsolidator, TopKCounter
+
+
+def vision_results(rng, image_names):
+    results = []
+    for index, name in enumerate(image_names):
+        detections = []
+        for _ in range(rng.randint(1, 8)):
+            x, y = rng.randint(0, 300), rng.randint(0, 300)
+            detections.append({'class': rng.choice(['Button', 'Input', 'Text']), 'confidence': 0.9,
+                               'bbox': [x, y, x + rng.randint(10, 60), y + rng.randint(10, 40)]})
+        results.append({'imageName': name, 'imageIndex': index, 'detections': detections,
+                        'classification': {'label': 'Login', 'confidence': 0.8}})
+    return results
+
+
+def interactions(rng, image_names, n):
+    events = []
+    for k in range(n):
+        x, y = rng.randint(0, 300), rng.randint(0, 300)
+        event = {'id': k, 'elementType': rng.choice(['button', 'textbox', 'text']), 'interactionType': 'click',
+                 'bbox': [x, y, x + rng.randint(10, 60), y + rng.randint(10, 40)]}
+        name = rng.choice(image_names + [None])
+        if name:
+            event['imageName'] = name
+        events.append(event)
+    return events
+
+
+def matches(mapping):
+    return [(m['detection_index'], m['interaction']['id'], round(m['iou_score'], 9))
+            for m in mapping['matched_elements']]
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("order", ["vision_first", "events_first", "interleaved"])
+def test_matches_equal_one_shot_with_repeated_image_names(seed, order):
+    rng = random.Random(seed)
+    names = ['home.png', 'login.png', 'home.png', 'cart.png', 'login.png']
+    results = vision_results(rng, names)
+    events = interactions(rng, sorted(set(names)) + ['missing.png'], 400)
+    expected = DataConsolidator().create_unified_analysis_payload(results, [events], compact=True)
+
+    incremental = IncrementalConsolidator()
+    if order == "vision_first":
+        incremental.add_vision_results(results)
+        incremental.add_interactions(events, session_id="s")
+    elif order == "events_first":
+        incremental.add_interactions(events, session_id="s")
+        incremental.add_vision_results(results)
+    else:
+        step = len(events) // len(results) + 1
+        for k, result in enumerate(results):
+            incremental.add_interactions(events[k * step:(k + 1) * step], session_id="s")
+            incremental.add_vision_result(result)
+    snapshot = incremental.snapshot(compact=True)
+
+    assert matches(snapshot['element_interaction_mapping']) == matches(expected['element_interaction_mapping'])
+    assert snapshot['element_interaction_mapping']['unmatched_detections'] == \
+        expected['element_interaction_mapping']['unmatched_detections']
+    assert snapshot['vision']['overall_classification'] == expected['vision']['overall_classification']
+
+
+def test_distinct_counter_is_exact_below_capacity_and_bounded_above():
+    counter = DistinctCounter(capacity=1000)
+    for key in list(range(500)) * 3:
+        counter.add(key)
+    assert len(counter) == 500
+
+    for key in range(100000):
+        counter.add(f"session_{key}")
+    assert len(counter._heap) == 1000
+    assert abs(len(counter) - 100500) / 100500 < 0.15
+
+
+def test_stream_sessions_are_counted_once():
+    incremental = IncrementalConsolidator(session_capacity=10)
+    for k in range(30):
+        incremental.add_interaction({'elementType': 'button'}, session_id=f"s{k % 3}")
+    assert incremental.snapshot_tracked()['summary']['sessions'] == 3
+
+
+def test_pending_image_names_and_group_samples_are_bounded():
+    incremental = IncrementalConsolidator(max_pending=5, max_images=3, max_groups=4, sample_size=2)
+    for k in range(20):
+        for _ in range(2):
+            incremental.add_interaction({'elementType': f"type_{k}", 'imageName': f"image_{k}.png"}, session_id="s")
+
+    assert list(incremental._pending) == ['image_17.png', 'image_18.png', 'image_19.png']
+    assert incremental.dropped_pending == 17 * 2
+    assert all(len(samples) <= 4 for samples in incremental.group_samples.values())
+    assert incremental.group_counts['by_image']['image_0.png'] == 2
+
+    # A name still buffered matches its late vision result
+    incremental.add_vision_result({'imageName': 'image_19.png', 'detections': []})
+    assert incremental.dropped_pending == 17 * 2
+
+
+def test_top_k_counter_keeps_heavy_hitters():
+    counter = TopKCounter(capacity=3)
+    for key in ['a'] * 50 + ['b'] * 30 + list('cdefgh'):
+        counter.add(key)
+    assert [key for key, _ in counter.most_common(2)] == ['a', 'b']
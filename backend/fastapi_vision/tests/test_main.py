@@ -0,0 +1,84 @@
+import io
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("torchvision")
+pytest.importorskip("easyocr")
+testclient = pytest.importorskip("fastapi.testclient")
+from PIL import Image  # noqa: E402
+
+import main  # noqa: E402
+from result_cache import ResultCache  # noqa: E402
+
+
+def png(width):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, 10), "white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def submit(image):
+        # One fake detection whose width identifies the image
+        return [{"class": "Button", "confidence": 0.9, "bbox": [0, 0, float(image.width), 10.0]}]
+
+    def enhance(image, detections):
+        return [{**detection, "extracted_text": ""} for detection in detections], True
+
+    monkeypatch.setattr(main.detection_batcher, "submit", submit)
+    monkeypatch.setattr(main, "enhance_with_ocr", enhance)
+    monkeypatch.setattr(main, "result_cache", ResultCache(max_entries=0))
+    monkeypatch.setattr(main, "MAX_BATCH_SIZE", 2)
+    # No `with`: startup (model loading and warm-up) is not run
+    return testclient.TestClient(main.app)
+
+
+def test_results_keep_upload_order_around_a_bad_image(client):
+    widths = [11, 12, 13, None, 15, 16, 17]
+    files = [
+        ("files", (f"image_{k}.png", png(width) if width else b"not an image", "image/png"))
+        for k, width in enumerate(widths)
+    ]
+    response = client.post("/analyze_batch", files=files)
+    assert response.status_code == 200
+    results = response.json()["results"]
+
+    assert [result["index"] for result in results] == list(range(len(widths)))
+    assert [result["filename"] for result in results] == [f"image_{k}.png" for k in range(len(widths))]
+    assert "error" in results[3] and "detections" not in results[3]
+    for result, width in zip(results, widths):
+        if width is not None:
+            assert result["detections"][0]["bbox"][2] == width
+
+
+def test_too_many_files_are_rejected(client, monkeypatch):
+    monkeypatch.setattr(main, "MAX_BATCH_FILES", 2)
+    files = [("files", (f"image_{k}.png", png(10), "image/png")) for k in range(3)]
+    response = client.post("/analyze_batch", files=files)
+    assert response.status_code == 413
+
+
+class FakeEnhancer:
+    def __init__(self, reader):
+        self.reader = reader
+
+    def enhance_detections(self, image, detections):
+        # Like OCREnhancer: always a new list, with empty text when there is no reader
+        return [{**detection, "extracted_text": "Go" if self.reader else ""} for detection in detections]
+
+
+@pytest.mark.parametrize("reader, cached", [(object(), True), (None, False)])
+def test_analyze_caches_only_results_with_ocr(monkeypatch, reader, cached):
+    async def submit(image):
+        return [{"class": "Button", "confidence": 0.9, "bbox": [0.0, 0.0, 5.0, 5.0]}]
+
+    monkeypatch.setattr(main.detection_batcher, "submit", submit)
+    monkeypatch.setattr(main, "get_ocr_enhancer", lambda: FakeEnhancer(reader))
+    monkeypatch.setattr(main, "result_cache", ResultCache(max_entries=8))
+    client = testclient.TestClient(main.app)
+
+    files = {"file": ("a.png", png(20), "image/png")}
+    assert client.post("/analyze", files=files).headers["X-Cache"] == "MISS"
+    assert client.post("/analyze", files=files).headers["X-Cache"] == ("HIT" if cached else "MISS")
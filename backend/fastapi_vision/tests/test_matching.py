@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+import matching
+from matching import MatchingEngine, box_array
+from spatial_index import intersecting_pairs
+
+
+def brute_force_pairs(boxes1, boxes2):
+    return sorted(
+        (i, j) for i, a in enumerate(boxes1) for j, b in enumerate(boxes2)
+        if max(a[0], b[0]) < min(a[2], b[2]) and max(a[1], b[1]) < min(a[3], b[3])
+    )
+
+
+def test_intersecting_pairs_matches_brute_force():
+    rng = np.random.default_rng(0)
+    corners = rng.uniform(-50, 500, size=(300, 2))
+    boxes1 = np.hstack([corners, corners + rng.uniform(1, 80, size=(300, 2))])
+    corners = rng.uniform(-50, 500, size=(200, 2))
+    boxes2 = np.hstack([corners, corners + rng.uniform(1, 80, size=(200, 2))])
+    rows, cols = intersecting_pairs(boxes1, boxes2, chunk_size=64)
+    assert sorted(zip(rows.tolist(), cols.tolist())) == brute_force_pairs(boxes1, boxes2)
+
+
+@pytest.mark.parametrize("bad_box", [[200, 10, 0, 50], [0, 50, 10, 10], [0, 0, np.inf, 5], [-np.inf, 0, 5, 5],
+                                     [0, np.nan, 5, 5]])
+def test_intersecting_pairs_skips_malformed_boxes(bad_box):
+    boxes1 = np.array([[0, 0, 10, 10], bad_box, [5, 5, 20, 20]], dtype=np.float64)
+    boxes2 = np.array([[0, 0, 10, 10], bad_box], dtype=np.float64)
+    rows, cols = intersecting_pairs(boxes1, boxes2)
+    assert sorted(zip(rows.tolist(), cols.tolist())) == [(0, 0), (2, 0)]
+
+
+def test_box_array_rejects_inverted_and_non_finite_boxes():
+    _, valid = box_array([[0, 0, 10, 10], [200, 10, 0, 50], [0, 0, float('inf'), 5], [1, 2, 3], None,
+                          [0, 0, 'x', 5], (1, 1, 1, 1)])
+    assert valid.tolist() == [True, False, False, False, False, False, True]
+
+
+def detections_and_interactions(bad_box):
+    detections = [
+        {'bbox': [0, 0, 100, 40], 'class': 'Button', 'image_name': 'home.png'},
+        {'bbox': bad_box, 'class': 'Button', 'image_name': 'home.png'},
+        {'bbox': [0, 100, 200, 130], 'class': 'Input', 'image_name': 'home.png'},
+    ]
+    interactions = [
+        {'bbox': [2, 2, 98, 38], 'elementType': 'button', 'imageName': 'home.png'},
+        {'bbox': bad_box, 'elementType': 'button', 'imageName': 'home.png'},
+        {'bbox': [0, 100, 190, 130], 'elementType': 'textbox', 'imageName': 'home.png'},
+        {'bbox': [0, 0, 100, 40], 'elementType': 'button', 'imageName': 'other.png'},
+    ]
+    return detections, interactions
+
+
+@pytest.mark.parametrize("bad_box", [[200, 10, 0, 50], [0, 0, float('inf'), 5]])
+def test_dense_and_grid_paths_agree_on_malformed_boxes(monkeypatch, bad_box):
+    detections, interactions = detections_and_interactions(bad_box)
+    engine = MatchingEngine()
+    dense = engine.match(detections, interactions)
+    monkeypatch.setattr(matching, 'DENSE_MAX_PAIRS', 0)
+    grid = engine.match(detections, interactions)
+    assert [(d, i) for d, i, _ in dense] == [(0, 0), (2, 2)]
+    assert grid == dense
+
+
+def test_one_to_one_assigns_each_interaction_once():
+    detections = [
+        {'bbox': [0, 0, 100, 40], 'class': 'Button', 'image_name': 'a'},
+        {'bbox': [0, 0, 100, 42], 'class': 'Button', 'image_name': 'a'},
+    ]
+    interactions = [{'bbox': [0, 0, 100, 40], 'elementType': 'button', 'imageName': 'a'}]
+    assert [(d, i) for d, i, _ in MatchingEngine().match(detections, interactions)] == [(0, 0), (1, 0)]
+    assert [(d, i) for d, i, _ in MatchingEngine(one_to_one=True).match(detections, interactions)] == [(0, 0)]
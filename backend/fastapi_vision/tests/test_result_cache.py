@@ -0,0 +1,37 @@
+import asyncio
+import os
+
+from result_cache import ResultCache
+
+
+def test_disk_tier_round_trip_through_async_methods(tmp_path):
+    cache = ResultCache(max_entries=0, disk_dir=str(tmp_path))
+
+    async def run():
+        assert await cache.aget("a") is None
+        await cache.aput("a", {"detections": [1, 2]})
+        return await cache.aget("a")
+
+    assert asyncio.run(run()) == {"detections": [1, 2]}
+    assert os.listdir(tmp_path) == ["a.json"]
+    assert cache.counters["disk_hits"] == 1 and cache.counters["misses"] == 1
+
+
+def test_disk_tier_evicts_to_budget(tmp_path):
+    cache = ResultCache(max_entries=0, disk_dir=str(tmp_path), disk_max_bytes=100)
+
+    async def run():
+        for i in range(10):
+            await cache.aput(f"k{i}", "x" * 40)
+
+    asyncio.run(run())
+    assert cache.stats()["disk_bytes"] <= 100
+    assert sum(entry.stat().st_size for entry in os.scandir(tmp_path)) == cache.stats()["disk_bytes"]
+
+
+def test_memory_hits_skip_the_disk(tmp_path):
+    cache = ResultCache(max_entries=4, disk_dir=str(tmp_path))
+    cache.put("a", [1])
+    os.remove(tmp_path / "a.json")
+    assert asyncio.run(cache.aget("a")) == [1]
+    assert cache.counters["memory_hits"] == 1
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from session_store import SessionStore, convert_result_file  # noqa: E402
+
+RESULT = {
+    "analysis_id": "abc",
+    "vision": [{"imageName": "home.png", "imageIndex": 0, "detections": [
+        {"class": "Button", "confidence": 0.9, "bbox": [0, 0, 10, 10], "extracted_text": "Go"},
+    ]}],
+    "tracked_data": [[
+        {"sessionId": 1, "timestamp": "2025-01-15T10:00:00.000Z", "interactionType": "click",
+         "elementType": "button", "interactionCount": "2"},
+        {"sessionId": 1, "timestamp": "2025-01-16T09:00:00.000Z", "interactionType": "scroll",
+         "elementType": "page", "interactionCount": 1},
+    ]],
+}
+
+
+@pytest.fixture
+def result_file(tmp_path):
+    path = tmp_path / "analysis_abc_2025-01-15_10-00-00.json"
+    path.write_text(json.dumps(RESULT), encoding="utf-8")
+    return path
+
+
+def test_convert_reads_back_by_session_and_day(tmp_path, result_file):
+    store = SessionStore(str(tmp_path / "store"))
+    assert convert_result_file(store, result_file) == (1, 2)
+
+    detections = store.read("detections", sessions=["abc"])
+    assert detections.column("class").to_pylist() == ["Button"]
+    assert detections.column("day").to_pylist() == ["2025-01-15"]
+    interactions = store.read("interactions", columns=["interaction_count"], start_day="2025-01-16")
+    assert interactions.column("interaction_count").to_pylist() == [1]
+    assert store.sessions("interactions") == ["abc"]
+
+
+def test_converting_twice_does_not_duplicate_rows(tmp_path, result_file):
+    store = SessionStore(str(tmp_path / "store"))
+    convert_result_file(store, result_file)
+    convert_result_file(store, result_file)
+    assert store.read("detections").num_rows == 1
+    assert store.read("interactions").num_rows == 2
+
+
+def test_plain_writes_append(tmp_path):
+    store = SessionStore(str(tmp_path / "store"))
+    events = RESULT["tracked_data"][0]
+    store.write_interactions("s", events)
+    store.write_interactions("s", events)
+    assert store.read("interactions").num_rows == 4
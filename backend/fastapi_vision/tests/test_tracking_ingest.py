@@ -0,0 +1,83 @@
+import io
+import json
+
+import pytest
+
+import tracking_ingest
+from tracking_ingest import TrackingBatchBuilder, TrackingSchemaError, format_timestamp, ingest, iter_events, parse_timestamp
+
+EVENTS = [
+    {"sessionId": 7, "timestamp": "2025-01-15T10:05:42.761Z", "interactionType": "click",
+     "elementType": "button", "interactionCount": "3", "links": ["/a", "/b", "/a"], "bbox": [0, 0, 10, "5"]},
+    {"sessionId": "s2", "timestamp": 1736935542, "interactionType": "scroll", "scrollDepth": "0.5",
+     "custom": {"k": 1}},
+]
+
+
+def records(text):
+    return [record for batch in ingest(io.StringIO(text), batch_size=1) for record in batch.records()]
+
+
+def test_array_and_ndjson_normalize_the_same():
+    expected = [
+        {"sessionId": 7, "interactionType": "click", "elementType": "button", "interactionCount": 3,
+         "timestamp": "2025-01-15T10:05:42.761Z", "links": ["/a", "/b"], "bbox": [0.0, 0.0, 10.0, 5.0]},
+        {"sessionId": "s2", "interactionType": "scroll", "scrollDepth": 0.5,
+         "timestamp": "2025-01-15T10:05:42.000Z", "custom": {"k": 1}},
+    ]
+    assert records(json.dumps(EVENTS)) == expected
+    assert records("\n".join(json.dumps(event) for event in EVENTS) + "\n") == expected
+
+
+def test_byte_order_mark_is_skipped():
+    assert len(records("﻿" + json.dumps(EVENTS))) == 2
+    assert len(records("﻿" + json.dumps(EVENTS[0]) + "\n")) == 1
+
+
+def test_large_counts_do_not_overflow():
+    batch = next(ingest(io.StringIO(json.dumps([{"interactionCount": 2 ** 40}, {"interactionCount": 2 ** 70}]))))
+    assert [record.get("interactionCount") for record in batch.records()] == [2 ** 40, None]
+
+
+def test_malformed_array_fails_without_reading_to_eof(monkeypatch):
+    monkeypatch.setattr(tracking_ingest, "READ_CHUNK_SIZE", 16)
+    reads = []
+
+    class CountingStream(io.StringIO):
+        def read(self, size=-1):
+            reads.append(size)
+            return super().read(size)
+
+    stream = CountingStream('[{"a": 1}, {"b": tru' + " " * 10000 + "]")
+    with pytest.raises(TrackingSchemaError):
+        list(tracking_ingest._iter_json_array(stream, max_event_chars=64))
+    assert len(reads) < 20
+
+
+def test_strict_mode_raises_and_lenient_mode_counts():
+    bad = json.dumps([{"interactionCount": "many"}])
+    with pytest.raises(TrackingSchemaError):
+        list(ingest(io.StringIO(bad), strict=True))
+    builder = tracking_ingest.TrackingBatchBuilder()
+    list(ingest(io.StringIO(bad), builder=builder))
+    assert builder.errors == {"interactionCount": 1}
+
+
+@pytest.mark.parametrize("text", ["2025-01-15T10:05:42.761Z", "2025-01-15T10:05:42.761+00:00", "2025-01-15T10:05:42.761"])
+def test_timestamps_round_trip(text):
+    assert format_timestamp(parse_timestamp(text)) == "2025-01-15T10:05:42.761Z"
+
+
+def test_iter_events_empty_stream():
+    assert list(iter_events(io.StringIO("  \n"))) == []
+
+
+def test_free_text_is_not_interned_in_the_shared_pool():
+    events = [{'sessionId': 's', 'interactionType': 'click', 'title': f"Title {k}", 'textSnippet': f"Text {k}"}
+              for k in range(100)]
+    builder = TrackingBatchBuilder()
+    batches = list(ingest(io.StringIO(json.dumps(events)), batch_size=10, builder=builder))
+
+    assert builder.strings.values == ['click']
+    assert [record['title'] for batch in batches for record in batch.records()] == [f"Title {k}" for k in range(100)]
+    assert batches[0].strings_of('textSnippet')[:2] == ['Text 0', 'Text 1']
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Tracking Data Ingestion
+Streams tracked-interaction files (a JSON array such as
+datasets/universal_tracking_data.json, or NDJSON with one event per line)
+without loading the whole file, validates and normalizes each field once
+(string numbers -> numbers, ISO timestamps -> epoch milliseconds, per-item
+links de-duplicated) and interns repeated strings (URLs, section ids,
+interaction types, ...) into compact column batches. Free text (titles, text
+snippets) is kept per batch instead, so the shared pools only grow with the
+number of distinct low-cardinality values
+
+Batches feed the consolidators through records(), which yields plain
+normalized dicts (interactionCount as an int, ...) in the shape the LLM
+prompt builder also expects.
+"""
+
+import json
+import sys
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+READ_CHUNK_SIZE = 1 << 16
+# Largest single event a JSON array may hold; malformed input fails here instead of buffering to EOF
+MAX_EVENT_CHARS = 1 << 24
+INT_MAX = np.iinfo(np.int64).max
+MISSING_TIMESTAMP = np.iinfo(np.int64).min
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Field -> kind; key/string kinds are interned, text is stored per batch, numeric kinds are coerced from strings
+SCHEMA = {
+    'sessionId': 'key',
+    'sectionId': 'string',
+    'title': 'text',
+    'textSnippet': 'text',
+    'interactionType': 'string',
+    'elementType': 'string',
+    'imageName': 'string',
+    'links': 'links',
+    'interactionCount': 'int',
+    'timestamp': 'timestamp',
+    'timeSpent': 'float',
+    'scrollDepth': 'float',
+    'bbox': 'bbox',
+}
+STRING_FIELDS = tuple(field for field, kind in SCHEMA.items() if kind in ('key', 'string'))
+TEXT_FIELDS = tuple(field for field, kind in SCHEMA.items() if kind == 'text')
+INT_FIELDS = tuple(field for field, kind in SCHEMA.items() if kind == 'int')
+FLOAT_FIELDS = tuple(field for field, kind in SCHEMA.items() if kind == 'float')
+
+
+class TrackingSchemaError(ValueError):
+    """A tracked event failed validation (raised only in strict mode)"""
+
+
+class StringPool:
+    """Interns strings (and other hashable keys) to dense ids shared by every batch of an ingest"""
+
+    def __init__(self):
+        self.ids: Dict[Any, int] = {}
+        self.values: List[Any] = []
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def intern(self, value: Any) -> int:
+        value_id = self.ids.get(value)
+        if value_id is None:
+            value_id = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+
+def parse_timestamp(value: Any) -> int:
+    """Epoch milliseconds from an ISO 8601 string or an epoch number (seconds or milliseconds)"""
+    if isinstance(value, bool):
+        raise ValueError(f"invalid timestamp {value!r}")
+    if isinstance(value, (int, float)):
+        # Epoch seconds until ~2286 are below 1e10; larger values are already milliseconds
+        return int(value * 1000) if abs(value) < 1e10 else int(value)
+    if isinstance(value, str):
+        text = value.strip()
+        if text.endswith(('Z', 'z')):
+            text = text[:-1] + '+00:00'
+        parsed = datetime.fromisoformat(text)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return (parsed - EPOCH) // timedelta(milliseconds=1)
+    raise ValueError(f"invalid timestamp {value!r}")
+
+
+def format_timestamp(milliseconds: int) -> str:
+    """Inverse of parse_timestamp for UTC: 2025-01-15T10:05:42.761Z"""
+    moment = datetime.fromtimestamp(milliseconds / 1000, tz=timezone.utc)
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.') + f"{milliseconds % 1000:03d}Z"
+
+
+def _to_number(value: Any, kind: str) -> Union[int, float]:
+    if isinstance(value, bool) or value is None:
+        raise ValueError(f"invalid {kind} {value!r}")
+    if kind == 'int':
+        if isinstance(value, int):
+            number = value
+        else:
+            number = float(value)
+            if not number.is_integer():
+                raise ValueError(f"invalid int {value!r}")
+            number = int(number)
+        if number > INT_MAX:
+            raise ValueError(f"int out of range {value!r}")
+        return number
+    return float(value)
+
+
+def _iter_json_array(stream: IO[str], max_event_chars: int = MAX_EVENT_CHARS) -> Iterator[Any]:
+    """Items of a top-level JSON array, decoded one at a time from fixed-size reads"""
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+    started = False
+    while True:
+        # Skip whitespace and separators
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if not started and position < len(buffer):
+            if buffer[position] != '[':
+                raise TrackingSchemaError("expected a JSON array")
+            started = True
+            position += 1
+            continue
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        if position < len(buffer):
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+                # A number at the end of the buffer may continue in the next read
+                if end < len(buffer) or eof:
+                    yield item
+                    position = end
+                    continue
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+        if eof:
+            if not started:
+                return
+            raise TrackingSchemaError("unterminated JSON array")
+        if len(buffer) - position > max_event_chars:
+            raise TrackingSchemaError(f"no complete JSON element within {max_event_chars} characters")
+        chunk = stream.read(READ_CHUNK_SIZE)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def _iter_ndjson(stream: IO[str], first_line: str = '') -> Iterator[Any]:
+    if first_line.strip():
+        yield json.loads(first_line)
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+class _Prefixed:
+    """Text stream with a few already-consumed characters pushed back"""
+
+    def __init__(self, prefix: str, stream: IO[str]):
+        self.prefix = prefix
+        self.stream = stream
+
+    def read(self, size: int = -1) -> str:
+        if self.prefix:
+            prefix, self.prefix = self.prefix, ''
+            return prefix + self.stream.read(max(0, size - len(prefix)) if size >= 0 else -1)
+        return self.stream.read(size)
+
+
+def iter_events(stream: IO[str]) -> Iterator[Any]:
+    """Stream events from a JSON array or NDJSON text stream (format detected from the first character)"""
+    char = stream.read(1)
+    # Skip leading whitespace and a UTF-8 byte order mark (files saved by Windows editors)
+    while char and (char.isspace() or char == '\ufeff'):
+        char = stream.read(1)
+    if char == '[':
+        # Put the consumed bracket back in front of the rest of the stream
+        return _iter_json_array(_Prefixed('[', stream))
+    return _iter_ndjson(stream, char + stream.readline() if char else '')
+
+
+class TrackingBatch:
+    """Typed columns for a run of tracked events; string columns hold ids into shared StringPools, text columns the text"""
+
+    def __init__(self, columns: Dict[str, np.ndarray], link_offsets: np.ndarray, link_ids: np.ndarray,
+                 strings: StringPool, keys: StringPool, extras: Dict[int, Dict[str, Any]]):
+        self.columns = columns
+        self.link_offsets = link_offsets
+        self.link_ids = link_ids
+        self.strings = strings
+        self.keys = keys
+        self.extras = extras
+
+    def __len__(self) -> int:
+        return len(self.columns['timestamp'])
+
+    def links(self, row: int) -> List[str]:
+        values = self.strings.values
+        return [values[k] for k in self.link_ids[self.link_offsets[row]:self.link_offsets[row + 1]].tolist()]
+
+    def strings_of(self, field: str) -> List[Optional[Any]]:
+        """Decoded values of an interned or text column (None where missing)"""
+        if SCHEMA[field] == 'text':
+            return self.columns[field].tolist()
+        pool = self.keys if SCHEMA[field] == 'key' else self.strings
+        values = pool.values
+        return [values[k] if k >= 0 else None for k in self.columns[field].tolist()]
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """Normalized event dicts (fields that were missing or invalid are left out)"""
+        decoded = {field: self.strings_of(field) for field in STRING_FIELDS + TEXT_FIELDS}
+        numbers = {field: self.columns[field].tolist() for field in INT_FIELDS + FLOAT_FIELDS}
+        timestamps = self.columns['timestamp'].tolist()
+        boxes = self.columns['bbox']
+        has_box = ~np.isnan(boxes[:, 0])
+        has_links = self.columns['has_links'].tolist()
+        for row in range(len(self)):
+            record = {}
+            for field in STRING_FIELDS + TEXT_FIELDS:
+                value = decoded[field][row]
+                if value is not None:
+                    record[field] = value
+            for field in INT_FIELDS:
+                if numbers[field][row] != -1:
+                    record[field] = numbers[field][row]
+            for field in FLOAT_FIELDS:
+                if numbers[field][row] == numbers[field][row]:  # not NaN
+                    record[field] = numbers[field][row]
+            if timestamps[row] != MISSING_TIMESTAMP:
+                record['timestamp'] = format_timestamp(timestamps[row])
+            if has_links[row]:
+                record['links'] = self.links(row)
+            if has_box[row]:
+                record['bbox'] = boxes[row].tolist()
+            record.update(self.extras.get(row, {}))
+            yield record
+
+    def nbytes(self) -> int:
+        """Bytes held by the columns of this batch, text included (shared string pools excluded)"""
+        text_bytes = sum(sys.getsizeof(value) for field in TEXT_FIELDS for value in self.columns[field].tolist()
+                         if value is not None)
+        return (sum(column.nbytes for column in self.columns.values()) + text_bytes
+                + self.link_offsets.nbytes + self.link_ids.nbytes)
+
+
+class TrackingBatchBuilder:
+    def __init__(self, strings: Optional[StringPool] = None, keys: Optional[StringPool] = None,
+                 strict: bool = False):
+        """
+        Initialize the builder
+
+        Args:
+            strings: Pool for low-cardinality string fields and links (shared across batches of one ingest)
+            keys: Pool for sessionId values, which may be numbers or strings
+            strict: Raise TrackingSchemaError on the first invalid field instead of dropping it
+        """
+        self.strings = strings if strings is not None else StringPool()
+        self.keys = keys if keys is not None else StringPool()
+        self.strict = strict
+        self.errors = Counter()
+        self._minutes: Dict[str, int] = {}
+        self._reset()
+
+    def _reset(self):
+        self._strings = {field: [] for field in STRING_FIELDS}
+        self._texts: Dict[str, List[Optional[str]]] = {field: [] for field in TEXT_FIELDS}
+        self._numbers = {field: [] for field in INT_FIELDS + FLOAT_FIELDS}
+        self._timestamps: List[int] = []
+        self._bboxes: List[Tuple[float, ...]] = []
+        self._has_links: List[bool] = []
+        self._link_offsets: List[int] = [0]
+        self._link_ids: List[int] = []
+        self._extras: Dict[int, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._timestamps)
+
+    def _invalid(self, field: str, value: Any, error: Exception):
+        if self.strict:
+            raise TrackingSchemaError(f"event {len(self)}: invalid {field} {value!r}: {error}") from error
+        self.errors[field] += 1
+
+    def add(self, event: Any) -> bool:
+        """Validate, normalize and append one event; returns False if it isn't an object"""
+        if not isinstance(event, dict):
+            self._invalid('event', event, TypeError("expected an object"))
+            return False
+        row = len(self)
+
+        string_ids = self.strings.ids
+        for field in STRING_FIELDS:
+            value = event.get(field)
+            column = self._strings[field]
+            if value is None:
+                column.append(-1)
+            elif type(value) is str and field != 'sessionId':
+                value_id = string_ids.get(value)
+                column.append(value_id if value_id is not None else self.strings.intern(value))
+            elif SCHEMA[field] == 'key' and isinstance(value, (str, int)) and not isinstance(value, bool):
+                column.append(self.keys.intern(value))
+            elif isinstance(value, str):
+                column.append(self.strings.intern(value))
+            else:
+                self._invalid(field, value, TypeError("expected a string"))
+                column.append(-1)
+
+        for field in TEXT_FIELDS:
+            value = event.get(field)
+            if value is not None and not isinstance(value, str):
+                self._invalid(field, value, TypeError("expected a string"))
+                value = None
+            self._texts[field].append(value)
+
+        for fields, kind, missing in ((INT_FIELDS, 'int', -1), (FLOAT_FIELDS, 'float', np.nan)):
+            for field in fields:
+                value = event.get(field)
+                if value is None:
+                    self._numbers[field].append(missing)
+                    continue
+                try:
+                    number = _to_number(value, kind)
+                    if kind == 'int' and number < 0:
+                        raise ValueError("negative count")
+                    self._numbers[field].append(number)
+                except (TypeError, ValueError) as error:
+                    self._invalid(field, value, error)
+                    self._numbers[field].append(missing)
+
+        value = event.get('timestamp')
+        timestamp = MISSING_TIMESTAMP
+        if value is not None:
+            try:
+                timestamp = self._parse_timestamp(value)
+            except (TypeError, ValueError, OverflowError) as error:
+                self._invalid('timestamp', value, error)
+        self._timestamps.append(timestamp)
+
+        value = event.get('bbox')
+        bbox = (np.nan,) * 4
+        if value is not None:
+            try:
+                if not isinstance(value, (list, tuple)) or len(value) != 4:
+                    raise ValueError("expected [x1, y1, x2, y2]")
+                bbox = tuple(_to_number(v, 'float') for v in value)
+            except (TypeError, ValueError) as error:
+                self._invalid('bbox', value, error)
+        self._bboxes.append(bbox)
+
+        value = event.get('links')
+        has_links = False
+        if value is not None:
+            if isinstance(value, list) and all(isinstance(link, str) for link in value):
+                # Items repeat their links; keep each once, in first-seen order
+                self._link_ids.extend(self.strings.intern(link) for link in dict.fromkeys(value))
+                has_links = True
+            else:
+                self._invalid('links', value, TypeError("expected a list of strings"))
+        self._has_links.append(has_links)
+        self._link_offsets.append(len(self._link_ids))
+
+        if not SCHEMA.keys() >= event.keys():
+            self._extras[row] = {key: value for key, value in event.items() if key not in SCHEMA}
+        return True
+
+    def _parse_timestamp(self, value: Any) -> int:
+        """parse_timestamp with the common YYYY-MM-DDTHH:MM:SS[.fff]Z form parsed from a per-minute cache"""
+        if type(value) is str and len(value) >= 20 and value[-1] == 'Z' and value[16] == ':' and value[10] == 'T':
+            minute = value[:16]
+            base = self._minutes.get(minute)
+            if base is None:
+                base = self._minutes[minute] = parse_timestamp(minute + 'Z')
+            seconds = value[17:-1]
+            if seconds[:2].isdigit() and (len(seconds) == 2 or seconds[2] == '.' and seconds[3:].isdigit()):
+                return base + int(seconds[:2]) * 1000 + int((seconds[3:] + '000')[:3])
+        return parse_timestamp(value)
+
+    def build(self) -> TrackingBatch:
+        """Freeze the appended events into a TrackingBatch and start a new one"""
+        columns = {field: np.asarray(values, dtype=np.int32) for field, values in self._strings.items()}
+        for field, values in self._texts.items():
+            columns[field] = np.empty(len(values), dtype=object)
+            columns[field][:] = values
+        columns.update({field: np.asarray(self._numbers[field], dtype=np.int64) for field in INT_FIELDS})
+        columns.update({field: np.asarray(self._numbers[field], dtype=np.float64) for field in FLOAT_FIELDS})
+        columns['timestamp'] = np.asarray(self._timestamps, dtype=np.int64)
+        columns['bbox'] = np.asarray(self._bboxes, dtype=np.float64).reshape(-1, 4)
+        columns['has_links'] = np.asarray(self._has_links, dtype=bool)
+        batch = TrackingBatch(
+            columns,
+            np.asarray(self._link_offsets, dtype=np.int64),
+            np.asarray(self._link_ids, dtype=np.int32),
+            self.strings, self.keys, self._extras
+        )
+        self._reset()
+        return batch
+
+
+def ingest(source: Union[str, IO[str]], batch_size: int = 50000, strict: bool = False,
+           builder: Optional[TrackingBatchBuilder] = None) -> Iterator[TrackingBatch]:
+    """
+    Stream a tracking file as TrackingBatches of at most batch_size events
+
+    Args:
+        source: Path or text stream holding a JSON array or NDJSON
+        batch_size: Events per batch (bounds memory alongside the shared string pools)
+        strict: Raise TrackingSchemaError on invalid fields instead of counting them in builder.errors
+        builder: Reuse a builder (and its string pools / error counts) across several files
+
+    Returns:
+        Iterator of TrackingBatch
+    """
+    if builder is None:
+        builder = TrackingBatchBuilder(strict=strict)
+    if isinstance(source, str):
+        with open(source, 'r', encoding='utf-8') as stream:
+            yield from _ingest_stream(stream, batch_size, builder)
+    else:
+        yield from _ingest_stream(source, batch_size, builder)
+
+
+def _ingest_stream(stream: IO[str], batch_size: int, builder: TrackingBatchBuilder) -> Iterator[TrackingBatch]:
+    for event in iter_events(stream):
+        builder.add(event)
+        if len(builder) >= batch_size:
+            yield builder.build()
+    if len(builder):
+        yield builder.build()
+
+
+def load_tracking_records(source: Union[str, IO[str]], strict: bool = False) -> List[Dict[str, Any]]:
+    """All normalized events of a tracking file, e.g. as one tracked-data entry for DataConsolidator"""
+    return [record for batch in ingest(source, strict=strict) for record in batch.records()]
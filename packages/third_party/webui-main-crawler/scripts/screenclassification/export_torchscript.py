@@ -1,19 +1,95 @@
 import sys
 sys.path.append("../../models/screenclassification")
 
+import argparse
 from tqdm import tqdm
 import glob
 import torch
+from PIL import Image
+from torchvision import transforms
 from ui_models import *
 
+# Variants (see backend/fastapi_vision/model_variants.py for how the service selects them):
+#   fp32           plain traced model (original export)
+#   optimized      frozen + optimize_for_inference
+#   channels_last  NHWC weights and example input, then frozen + optimized
+#   int8_dynamic   dynamic int8 quantization of Linear layers (the classifier head)
+#   int8_static    FX static int8 quantization of convs + linears, calibrated on --calibration-dir
+VARIANTS = ["fp32", "optimized", "channels_last", "int8_dynamic", "int8_static"]
+
+parser = argparse.ArgumentParser(description="Export screen classification checkpoints to TorchScript")
+parser.add_argument("--variants", default="fp32", help=f"comma-separated subset of {','.join(VARIANTS)}")
+parser.add_argument("--calibration-dir", default=None, help="screenshots used to calibrate int8_static")
+parser.add_argument("--calibration-images", type=int, default=64)
+args = parser.parse_args()
+
+variants = [v.strip() for v in args.variants.split(",") if v.strip()]
+for v in variants:
+    if v not in VARIANTS:
+        parser.error(f"unknown variant {v}")
+
+example_input = torch.rand(1, 3, 256, 256)
+test_input = torch.rand(1, 3, 384, 512)
+
+
+def output_path(checkpoint, variant):
+    suffix = ".torchscript" if variant == "fp32" else f".{variant}.torchscript"
+    return checkpoint.replace(".ckpt", suffix)
+
+
+def freeze_and_optimize(s):
+    return torch.jit.optimize_for_inference(torch.jit.freeze(s.eval()))
+
+
+def calibration_batches():
+    # Same preprocessing the vision service applies before classification
+    img_transforms = transforms.Compose([
+        transforms.Resize(128),
+        transforms.ToTensor(),
+        transforms.Normalize((0.5, 0.5, 0.5), (0.5, 0.5, 0.5))
+    ])
+    paths = sorted(glob.glob(f"{args.calibration_dir}/*.png") + glob.glob(f"{args.calibration_dir}/*.jpg"))
+    for path in paths[:args.calibration_images]:
+        yield img_transforms(Image.open(path).convert("RGB")).unsqueeze(0)
+
+
+def export_variant(m, variant):
+    if variant == "fp32":
+        return m.to_torchscript(method="trace", example_inputs=[example_input])
+    if variant == "optimized":
+        return freeze_and_optimize(torch.jit.trace(m, example_input))
+    if variant == "channels_last":
+        m_cl = m.to(memory_format=torch.channels_last)
+        return freeze_and_optimize(torch.jit.trace(m_cl, example_input.contiguous(memory_format=torch.channels_last)))
+    if variant == "int8_dynamic":
+        q = torch.ao.quantization.quantize_dynamic(m, {torch.nn.Linear}, dtype=torch.qint8)
+        return torch.jit.freeze(torch.jit.trace(q, example_input).eval())
+    if variant == "int8_static":
+        if args.calibration_dir is None:
+            raise ValueError("int8_static needs --calibration-dir")
+        from torch.ao.quantization import get_default_qconfig_mapping
+        from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+        prepared = prepare_fx(m, get_default_qconfig_mapping("x86"), (example_input,))
+        with torch.no_grad():
+            for batch in calibration_batches():
+                prepared(batch)
+        return torch.jit.freeze(torch.jit.trace(convert_fx(prepared), example_input).eval())
+    raise ValueError(variant)
+
+
 checkpoints = glob.glob("../../downloads/checkpoints/screenclassification*ckpt")
 for checkpoint in tqdm(checkpoints):
-    m = UIScreenClassifier.load_from_checkpoint(checkpoint).eval()
-    s = m.to_torchscript(method="trace", example_inputs=[torch.rand(1, 3, 256, 256)])
-
-    test_input = torch.rand(1, 3, 384, 512)
-    o1 = m(test_input)
-    o2 = s(test_input)
+    for variant in variants:
+        m = UIScreenClassifier.load_from_checkpoint(checkpoint).eval()
+        o1 = m(test_input)
+        try:
+            s = export_variant(m, variant)
+        except Exception as e:
+            # Not every layer supports every variant; skip rather than abort the whole export
+            print(f"{checkpoint} [{variant}]: export failed: {e}")
+            continue
 
-    print(torch.allclose(o1, o2))
-    torch.jit.save(s, checkpoint.replace(".ckpt", ".torchscript"))
\ No newline at end of file
+        o2 = s(test_input.contiguous(memory_format=torch.channels_last) if variant == "channels_last" else test_input)
+        # Quantized variants are not expected to match exactly; report top-1 agreement instead
+        print(variant, torch.allclose(o1, o2, atol=1e-4), bool((o1.argmax(-1) == o2.argmax(-1)).all()))
+        torch.jit.save(s, output_path(checkpoint, variant))
@@ -1,19 +1,66 @@
 import sys
 sys.path.append("../../models/screenrecognition")
 
+import argparse
 from tqdm import tqdm
 import glob
 import torch
 from ui_models import *
 
+# Variants (see backend/fastapi_vision/model_variants.py for how the service selects them):
+#   fp32           plain scripted model (original export)
+#   optimized      frozen + optimize_for_inference
+#   int8_dynamic   dynamic int8 quantization of Linear layers (box head)
+# Static int8 is not offered: the detector's list-of-tensors input and data-dependent
+# control flow (anchor generation, NMS) do not survive FX tracing. channels_last is not
+# offered either: the model batches its list of 3D inputs into an NCHW tensor internally,
+# so NHWC weights only add layout conversions.
+VARIANTS = ["fp32", "optimized", "int8_dynamic"]
+
+parser = argparse.ArgumentParser(description="Export screen recognition checkpoints to TorchScript")
+parser.add_argument("--variants", default="fp32", help=f"comma-separated subset of {','.join(VARIANTS)}")
+args = parser.parse_args()
+
+variants = [v.strip() for v in args.variants.split(",") if v.strip()]
+for v in variants:
+    if v not in VARIANTS:
+        parser.error(f"unknown variant {v}")
+
+
+def output_path(checkpoint, variant):
+    suffix = ".torchscript" if variant == "fp32" else f".{variant}.torchscript"
+    return checkpoint.replace(".ckpt", suffix)
+
+
+def freeze_and_optimize(s):
+    return torch.jit.optimize_for_inference(torch.jit.freeze(s.eval()))
+
+
+def export_variant(model, variant):
+    if variant == "fp32":
+        return torch.jit.script(model, torch.rand(1, 3, 256, 256))
+    if variant == "optimized":
+        return freeze_and_optimize(torch.jit.script(model))
+    if variant == "int8_dynamic":
+        q = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return torch.jit.freeze(torch.jit.script(q).eval())
+    raise ValueError(variant)
+
+
 checkpoints = glob.glob("../../downloads/checkpoints/screenrecognition*ckpt")
 for checkpoint in tqdm(checkpoints):
-    m = UIElementDetector.load_from_checkpoint(checkpoint).eval()
-    s = torch.jit.script(m.model, torch.rand(1, 3, 256, 256))
+    for variant in variants:
+        m = UIElementDetector.load_from_checkpoint(checkpoint).eval()
 
-    test_input = [torch.rand(3, 384, 512)]
-    o1 = m.model(test_input)
-    o2 = s(test_input)
+        test_input = [torch.rand(3, 384, 512)]
+        o1 = m.model(test_input)
+        try:
+            s = export_variant(m.model, variant)
+        except Exception as e:
+            # Not every layer supports every variant; skip rather than abort the whole export
+            print(f"{checkpoint} [{variant}]: export failed: {e}")
+            continue
+        o2 = s(test_input)
 
-    print(torch.allclose(o1[0]['boxes'], o2[1][0]['boxes']))
-    torch.jit.save(s, checkpoint.replace(".ckpt", ".torchscript"))
\ No newline at end of file
+        print(variant, o1[0]['boxes'].shape == o2[1][0]['boxes'].shape and torch.allclose(o1[0]['boxes'], o2[1][0]['boxes'], atol=1e-3))
+        torch.jit.save(s, output_path(checkpoint, variant))